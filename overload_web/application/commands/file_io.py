@@ -1,8 +1,12 @@
 """Application service commands for file handling."""
 
+import functools
+import hashlib
+import io
 import logging
 import uuid
-from typing import Any, Sequence
+from contextlib import contextmanager
+from typing import Any, BinaryIO, Iterator, Sequence
 
 from overload_web.application import ports
 from overload_web.domain.models import files
@@ -10,6 +14,17 @@ from overload_web.domain.models import files
 logger = logging.getLogger(__name__)
 
 
+@contextmanager
+def load_mapped(storage: ports.FileStorage, reference: str) -> Iterator[Any]:
+    """Memory-map a file from storage and close the mapping when done with it."""
+    content = storage.load(reference, mapped=True)
+    try:
+        yield content
+    finally:
+        if hasattr(content, "close"):
+            content.close()
+
+
 class ListVendorFiles:
     @staticmethod
     def execute(dir: str, loader: ports.FileLoader) -> list[str]:
@@ -68,14 +83,21 @@ class UploadFileToWorkflow:
     def execute(
         workflow_id: str,
         filename: str,
-        content: bytes,
+        content: bytes | BinaryIO,
         source: str,
         storage: ports.FileStorage,
         repo: ports.SqlRepositoryProtocol,
-    ) -> Sequence[dict[str, Any]]:
+        indexer: ports.MarcRecordIndexer | None = None,
+        counter: ports.RecordCounter | None = None,
+    ) -> dict[str, Any]:
         """
         Uploads a file for a workflow.
 
+        The file is streamed to storage in chunks. Each chunk is hashed and, if a
+        `counter` is provided, the records it contains are counted as it is written.
+        A file with the same content as a file already in the workflow is not added
+        to the workflow a second time. Instead, the file it duplicates is returned
+        as `duplicate_of` so that the upload can be reported as a duplicate.
 
         Args:
             workflow_id:
@@ -83,7 +105,8 @@ class UploadFileToWorkflow:
             filename:
                 The name of the file as a str.
             content:
-                The content of the file as a bytes object
+                The content of the file as a bytes object or a binary file-like
+                object such as an upload's spooled file.
             source:
                 The source of the file (ie. either `local` or `ftp`)
             storage:
@@ -92,22 +115,60 @@ class UploadFileToWorkflow:
             repo:
                 Concrete implementation of the `SqlRepositoryProtocol` for
                 handling vendor files.
+            indexer:
+                Optional concrete implementation of the `MarcRecordIndexer`
+                used to index the records in the file when it is uploaded. The
+                index is saved to storage alongside the file.
+            counter:
+                Optional concrete implementation of the `RecordCounter` used to
+                count the records in the file as it is uploaded.
 
         Returns:
-            The list of files for workflow as a list of `VendorFile` objects.
+            A dictionary containing the workflow's files as `files` and, if the
+            uploaded file was a duplicate, the file already in the workflow with the
+            same content as `duplicate_of`.
         """
         file_id = str(uuid.uuid4())
-        reference = storage.save(id=file_id, filename=filename, content=content)
+        stream = io.BytesIO(content) if isinstance(content, bytes) else content
+        digest = hashlib.sha256()
+        consumers = [digest, counter] if counter else [digest]
+        reference, size = storage.save_stream(
+            id=file_id, filename=filename, stream=stream, consumers=consumers
+        )
+        workflow_files = repo.list_by_id(workflow_id)
+        duplicate_of = next(
+            (i for i in workflow_files if i.get("sha256") == digest.hexdigest()), None
+        )
+        if duplicate_of is not None:
+            storage.delete(reference)
+            logger.info(
+                f"File already added to workflow {workflow_id}: {filename} is a "
+                f"duplicate of {duplicate_of['id']}."
+            )
+            return {"files": workflow_files, "duplicate_of": duplicate_of}
+        index = None
+        if indexer and isinstance(content, bytes):
+            index = indexer.index(content)
+        elif indexer and size:
+            with load_mapped(storage, reference) as mapped:
+                index = indexer.index(mapped)
+        elif indexer:
+            index = indexer.index(b"")
         file = files.IncomingFile(
             id=file_id,
             workflow_id=workflow_id,
             filename=filename,
             source=source,
             reference=reference,
+            sha256=digest.hexdigest(),
+            size=size,
+            record_count=counter.count if counter else None,
         )
+        if index is not None:
+            storage.save_index(reference, index)
         repo.save(file)
         logger.info(f"File added to workflow {workflow_id}: {file}.")
-        return repo.list_by_id(workflow_id)
+        return {"files": repo.list_by_id(workflow_id), "duplicate_of": None}
 
 
 class LoadAllWorkflowFiles:
@@ -118,6 +179,8 @@ class LoadAllWorkflowFiles:
         """
         Loads all files for a workflow.
 
+        Files are not read when they are loaded. Each file's content is
+        memory-mapped from storage the first time it is read.
 
         Args:
             workflow_id:
@@ -134,7 +197,8 @@ class LoadAllWorkflowFiles:
         file_list = repo.list_by_id(workflow_id)
         vendor_files = [
             files.VendorFile(
-                file_name=i["filename"], content=storage.load(i["reference"])
+                file_name=i["filename"],
+                opener=functools.partial(storage.load, i["reference"], mapped=True),
             )
             for i in file_list
         ]
@@ -142,6 +206,80 @@ class LoadAllWorkflowFiles:
         return vendor_files
 
 
+class LoadWorkflowRecords:
+    @staticmethod
+    def execute(
+        file_id: str,
+        key: str,
+        value: str | int,
+        storage: ports.FileStorage,
+        repo: ports.SqlRepositoryProtocol,
+        indexer: ports.MarcRecordIndexer | None = None,
+    ) -> list[bytes]:
+        """
+        Load individual records from a workflow file using the file's record index.
+
+        Only the records matching the `key`/`value` pair are sliced from the file;
+        no records are parsed. Files uploaded without an index are indexed when
+        they are loaded if an `indexer` is provided and the index is saved to
+        storage for later loads.
+
+        Args:
+            file_id:
+                The id of the file from which to load records.
+            key:
+                The key used to identify records. One of `record` (the position
+                of the record in the file), `control_number`, `isbn`, or `barcode`.
+            value:
+                The value of the key for the records to load.
+            storage:
+                Concrete implementation of the `FileStorage` for
+                handling vendor files.
+            repo:
+                Concrete implementation of the `SqlRepositoryProtocol` for
+                handling vendor files.
+            indexer:
+                Optional concrete implementation of the `MarcRecordIndexer` used
+                when the file does not have an index.
+
+        Returns:
+            The matching records as a list of bytes objects.
+
+        Raises:
+            ValueError: if the key is not valid, the file does not exist, or the
+            file could not be indexed.
+        """
+        if key not in ["record", "control_number", "isbn", "barcode"]:
+            raise ValueError(
+                f"Invalid key: '{key}'. Available keys are: 'record', "
+                "'control_number', 'isbn', and 'barcode'."
+            )
+        file = repo.get(file_id)
+        if not file:
+            raise ValueError(f"File not found: {file_id}")
+        with load_mapped(storage, file["reference"]) as content:
+            index = storage.load_index(file["reference"])
+            if index is None and indexer is not None:
+                index = indexer.index(content)
+                if index is not None:
+                    storage.save_index(file["reference"], index)
+            if index is None:
+                raise ValueError(f"Unable to index records in file: {file['filename']}")
+            if key == "record":
+                positions = (
+                    [int(value)] if 0 <= int(value) < len(index["records"]) else []
+                )
+            else:
+                positions = index[key].get(str(value), [])
+            records = []
+            with memoryview(content) as view:
+                for position in positions:
+                    offset, length = index["records"][position]
+                    records.append(bytes(view[offset : offset + length]))
+        logger.info(f"Loaded {len(records)} record(s) from {file['filename']}.")
+        return records
+
+
 class DeleteFileFromWorkflow:
     @staticmethod
     def execute(
@@ -0,0 +1,169 @@
+"""Application service commands for running process vendor file jobs."""
+
+import logging
+import uuid
+from functools import partial
+from typing import Any, Callable, Sequence
+
+from overload_web.application import ports
+from overload_web.domain.models import reporting
+
+logger = logging.getLogger(__name__)
+
+INTERRUPTED_ERROR = "The job was interrupted because the application was restarted."
+
+
+class SubmitProcessingJob:
+    @staticmethod
+    def execute(
+        record_type: str,
+        task: Callable[..., dict[str, Any]],
+        runner: ports.JobRunner,
+        repo: ports.SqlRepositoryProtocol,
+        cleanup: Sequence[Callable[[], None]] = (),
+        progress: Callable[[str], ports.ProgressReporter] | None = None,
+    ) -> dict[str, Any]:
+        """
+        Queue a job that runs a `Process*Records` command in the background.
+
+        Args:
+            record_type:
+                The record type for the operation as a string.
+            task:
+                The command to run. It is called with the keyword argument `repo`
+                and must return the saved `ProcessedFileBatch` as a dictionary.
+            runner:
+                Concrete implementation of the `JobRunner` protocol.
+            repo:
+                Concrete implementation of the `SqlRepositoryProtocol` for
+                handling jobs.
+            cleanup:
+                Callables that release resources used by the task (eg. loaded
+                files). They are called once the job has finished.
+            progress:
+                An optional callable that creates a `ports.ProgressReporter` for
+                a job from the job's ID.
+
+        Returns:
+            The queued job as a dictionary.
+        """
+        job = repo.save(
+            reporting.ProcessingJob(id=str(uuid.uuid4()), record_type=record_type)
+        )
+        runner.submit(
+            partial(
+                RunProcessingJob.execute,
+                job_id=job["id"],
+                task=task,
+                cleanup=cleanup,
+                progress=progress(job["id"]) if progress else None,
+            )
+        )
+        logger.info(f"Queued {record_type} processing job: {job['id']}")
+        return job
+
+
+class RunProcessingJob:
+    @staticmethod
+    def execute(
+        job_id: str,
+        task: Callable[..., dict[str, Any]],
+        jobs: ports.SqlRepositoryProtocol,
+        batches: ports.SqlRepositoryProtocol,
+        cleanup: Sequence[Callable[[], None]] = (),
+        progress: ports.ProgressReporter | None = None,
+    ) -> None:
+        """
+        Run a queued job and record its outcome.
+
+        Errors raised by the task are logged and saved on the job rather than
+        raised, since there is no request waiting for the job to finish.
+
+        Args:
+            job_id:
+                The ID of the job.
+            task:
+                The command to run. It is called with the keyword argument `repo`
+                and, if a `progress` reporter is provided, `progress`.
+            jobs:
+                Concrete implementation of the `SqlRepositoryProtocol` for
+                handling jobs.
+            batches:
+                Concrete implementation of the `SqlRepositoryProtocol` for
+                handling processed batches.
+            cleanup:
+                Callables that release resources used by the task.
+            progress:
+                An optional `ports.ProgressReporter` passed to the task and told
+                the outcome of the job.
+        """
+        jobs.update(job_id, {"status": "running"})
+        kwargs: dict[str, Any] = {"repo": batches}
+        if progress is not None:
+            kwargs["progress"] = progress
+        try:
+            batch = task(**kwargs)
+        except Exception as exc:
+            logger.exception(f"Processing job {job_id} failed.")
+            jobs.update(job_id, {"status": "failed", "error": str(exc)})
+            if progress is not None:
+                progress.advance("errors")
+                progress.finish("failed")
+        else:
+            jobs.update(job_id, {"status": "complete", "batch_id": batch["id"]})
+            logger.info(f"Processing job {job_id} complete: batch {batch['id']}")
+            if progress is not None:
+                progress.finish("complete")
+        finally:
+            for release in cleanup:
+                release()
+
+
+class FailInterruptedProcessingJobs:
+    @staticmethod
+    def execute(repo: ports.JobRepositoryProtocol) -> list[str]:
+        """
+        Mark jobs left `queued` or `running` by a previous run of the app as failed.
+
+        Jobs run in worker threads of the process that submitted them, so a job
+        that has not finished when the app starts will never finish. This should
+        be run when the app starts, before any jobs are submitted.
+
+        Args:
+            repo:
+                Concrete implementation of the `JobRepositoryProtocol` for
+                handling jobs.
+
+        Returns:
+            The IDs of the jobs that were marked as failed.
+        """
+        failed = []
+        for job in repo.list_by_status(["queued", "running"]):
+            repo.update(job["id"], {"status": "failed", "error": INTERRUPTED_ERROR})
+            failed.append(job["id"])
+        if failed:
+            logger.warning(
+                f"Marked {len(failed)} interrupted processing jobs as failed: {failed}"
+            )
+        return failed
+
+
+class GetProcessingJob:
+    @staticmethod
+    def execute(
+        job_id: str, repo: ports.SqlRepositoryProtocol
+    ) -> dict[str, Any] | None:
+        """
+        Get the status of a job.
+
+        Args:
+            job_id:
+                The ID of the job.
+            repo:
+                Concrete implementation of the `SqlRepositoryProtocol` for
+                handling jobs.
+
+        Returns:
+            The job as a dictionary or `None` if the job does not exist.
+        """
+        return repo.get(job_id)
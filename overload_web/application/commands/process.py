@@ -3,11 +3,12 @@
 import datetime
 import itertools
 import logging
-from typing import Any
+from functools import partial
+from typing import Any, Iterator, Mapping
 
 from overload_web.application import ports
 from overload_web.application.services import bib_processing, marc, match_service
-from overload_web.domain.models import reporting
+from overload_web.domain.models import bibs, files, reporting
 
 logger = logging.getLogger(__name__)
 
@@ -17,17 +18,62 @@ def extract_nested_list(list_items: list[Any]) -> list[str]:
     return list(itertools.chain.from_iterable(list_items))
 
 
+def parse_order_files(
+    batches: Mapping[str, Any],
+    marc_engine: ports.MarcEnginePort,
+    vendor: str | None,
+    executor: ports.TaskExecutor | None = None,
+) -> Iterator[tuple[list[bibs.DomainBib], int]]:
+    """
+    Parse each file of order-level records in a batch.
+
+    Each file is returned as its parsed records and the number of records in it
+    that could not be parsed.
+
+    Files are parsed one at a time as the iterator is consumed unless an
+    `executor` is passed, in which case all files are parsed in parallel. Records
+    parsed by the executor are returned as compact MARC binary.
+
+    Files in a `VendorFileBatch` that are loaded from storage are passed to the
+    executor by their `opener` so that each worker reads its own file rather than
+    being sent a copy of it. Other files are passed as `bytes`.
+    """
+    if executor is None:
+        return (
+            marc.BibFileProcessor.parse_file(data, engine=marc_engine, vendor=vendor)
+            for data in batches.values()
+        )
+    return executor.map(
+        partial(
+            marc.BibFileProcessor.parse_file,
+            engine=marc_engine,
+            vendor=vendor,
+            compact=True,
+        ),
+        [
+            batches.source(name)
+            if isinstance(batches, files.VendorFileBatch)
+            else bytes(batches[name])
+            for name in batches
+        ],
+    )
+
+
 class ProcessAcquisitionsRecords:
     """Parses, matches, and analyzes order-level MARC records for acquisitions."""
 
     @staticmethod
     def execute(
-        batches: dict[str, bytes],
+        batches: Mapping[str, Any],
         fetcher: ports.BibFetcher,
         marc_engine: ports.MarcEnginePort,
         matchpoints: dict[str, str],
         repo: ports.SqlRepositoryProtocol,
         template_data: dict[str, Any],
+        max_workers: int = 1,
+        progress: ports.ProgressReporter | None = None,
+        executor: ports.TaskExecutor | None = None,
+        output: ports.FileStorage | None = None,
     ) -> dict[str, Any]:
         """
         Process order-level MARC records.
@@ -38,7 +84,9 @@ class ProcessAcquisitionsRecords:
 
         Args:
             batches:
-                a dictionary containing pairs of file names and associated binary data
+                a mapping of file names to their binary data (eg. `bytes` or a
+                memory-mapped file). Each file's data is only looked up when the
+                file is processed.
             fetcher:
                 a `ports.BibFetcher` object used by the command.
             marc_engine:
@@ -49,6 +97,21 @@ class ProcessAcquisitionsRecords:
                 a `ports.SqlRepositoryProtocol` object used by the command.
             template_data:
                 Order template data as a dictionary.
+            max_workers:
+                The maximum number of concurrent Sierra queries used when
+                matching records.
+            progress:
+                An optional `ports.ProgressReporter` that is told how many
+                records have been parsed, matched, updated, and written.
+            executor:
+                An optional `ports.TaskExecutor` (eg. a `ProcessPoolExecutor`)
+                used to parse and update files in parallel. Records are matched
+                in this process while files are parsed and updated by the
+                executor.
+            output:
+                An optional `ports.FileStorage` to which the processed files are
+                written one record at a time. If it is not provided the processed
+                records are kept in memory and saved with the batch.
         Returns:
             A dictionary representing the processed files that were saved as a
             `ProcessedFileBatch` object in the db.
@@ -57,27 +120,72 @@ class ProcessAcquisitionsRecords:
         out_batches = []
         file_names = []
         report_data = []
-        matcher = match_service.BibMatcher(fetcher)
+        pending = []
+        matcher = match_service.BibMatcher(fetcher, max_workers=max_workers)
         vendor = template_data.get("vendor", "UNKNOWN")
-        for file_name, data in batches.items():
+        parsed = parse_order_files(
+            batches=batches, marc_engine=marc_engine, vendor=vendor, executor=executor
+        )
+        for file_name, (records, parse_errors) in zip(batches.keys(), parsed):
             file_names.append(file_name)
-            records = marc.BibParser.parse_marc_data(
-                data=data, engine=marc_engine, vendor=vendor
-            )
+            if progress is not None:
+                progress.advance("parsed", len(records))
+                progress.advance("errors", parse_errors)
             original_barcodes = extract_nested_list([i.barcodes for i in records])
             bib_processing.validate_unique_barcodes(original_barcodes)
-            for bib in records:
-                matches = matcher.match_order_record(bib, matchpoints=matchpoints)
-                analysis = bib.analyze_matches(candidates=matches)
-                bib.apply_match(analysis)
-                marc.BibUpdater.update_acquisition_record(
-                    bib, engine=marc_engine, template_data=template_data
-                )
+            all_matches = matcher.match_order_records(records, matchpoints=matchpoints)
+            matched = []
+            for bib, matches in zip(records, all_matches):
+                try:
+                    analysis = bib.analyze_matches(candidates=matches)
+                    bib.apply_match(analysis)
+                except Exception:
+                    logger.exception(f"Unable to match record: {bib}")
+                    if progress is not None:
+                        progress.advance("errors")
+                    continue
                 report_data.append(analysis.to_dict())
-            processed = reporting.ProcessedFile(
-                file_name=file_name, records=marc_engine.write(records)
+                matched.append(bib)
+            if progress is not None:
+                progress.advance("matched", len(matched))
+            if executor is not None:
+                future = executor.submit(
+                    marc.BibFileProcessor.update_file,
+                    matched,
+                    engine=marc_engine,
+                    template_data=template_data,
+                    file_name=file_name,
+                    output=output,
+                )
+                pending.append((len(matched), future))
+                continue
+            updated = []
+            for bib in matched:
+                try:
+                    marc.BibUpdater.update_acquisition_record(
+                        bib, engine=marc_engine, template_data=template_data
+                    )
+                except Exception:
+                    logger.exception(f"Unable to update record: {bib}")
+                    if progress is not None:
+                        progress.advance("errors")
+                    continue
+                updated.append(bib)
+                if progress is not None:
+                    progress.advance("updated")
+            processed = marc.BibFileProcessor.write_file(
+                updated, engine=marc_engine, file_name=file_name, output=output
             )
             out_batches.append(processed)
+            if progress is not None:
+                progress.advance("written", len(updated))
+        for count, future in pending:
+            processed, update_errors = future.result()
+            out_batches.append(processed)
+            if progress is not None:
+                progress.advance("updated", count - update_errors)
+                progress.advance("written", count - update_errors)
+                progress.advance("errors", update_errors)
         report = bib_processing.create_order_records_report(
             analysis=report_data, file_names=file_names
         )
@@ -90,10 +198,14 @@ class ProcessCatalogingRecords:
 
     @staticmethod
     def execute(
-        batches: dict[str, bytes],
+        batches: Mapping[str, Any],
         marc_engine: ports.MarcEnginePort,
         fetcher: ports.BibFetcher,
         repo: ports.SqlRepositoryProtocol,
+        max_workers: int = 1,
+        chunk_size: int = 500,
+        progress: ports.ProgressReporter | None = None,
+        output: ports.FileStorage | None = None,
     ) -> dict[str, Any]:
         """
         Process a file of full MARC records.
@@ -102,34 +214,89 @@ class ProcessCatalogingRecords:
         all bibs that were returned as matches, updates the records with required
         fields, and outputs the updated records and the match analysis.
 
+        Records are read from each file and processed in chunks of `chunk_size` so
+        that only one chunk of parsed records is held in memory at a time. Once a
+        record has been updated it is kept as MARC binary until it is deduplicated
+        and written.
+
         Args:
             batches:
-                a dictionary containing pairs of file names and associated binary data
+                a mapping of file names to their binary data (eg. `bytes` or a
+                memory-mapped file). Each file's data is only looked up when the
+                file is processed.
             marc_engine:
                 a `ports.MarcEnginePort` object used by the command.
             fetcher:
                 a `ports.BibFetcher` object used by the command.
             repo:
                 a `ports.SqlRepositoryProtocol` object used by the command.
+            max_workers:
+                The maximum number of concurrent Sierra queries used when
+                matching records.
+            chunk_size:
+                The number of records to parse, match, and update at a time.
+            progress:
+                An optional `ports.ProgressReporter` that is told how many
+                records have been parsed, matched, updated, and written.
+            output:
+                An optional `ports.FileStorage` to which the processed files are
+                written one record at a time. If it is not provided the processed
+                records are kept in memory and saved with the batch.
         Returns:
             A dictionary representing the processed files that were saved as a
             `ProcessedFileBatch` object in the db.
+
+        Raises:
+            ValueError: if a barcode appears in more than one item.
         """
         file_names = list(batches.keys())
-        content = list(batches.values())
-        data = marc.MarcFileMerger.combine_marc_files(data=content, engine=marc_engine)
-        records = marc.BibParser.parse_marc_data(data=data, engine=marc_engine)
-        original_barcodes = extract_nested_list([i.barcodes for i in records])
-        bib_processing.validate_unique_barcodes(original_barcodes)
+        on_error = partial(progress.advance, "errors") if progress else None
+        parsed = itertools.chain.from_iterable(
+            marc.BibParser.iter_marc_data(
+                data=data, engine=marc_engine, on_error=on_error
+            )
+            for data in batches.values()
+        )
+        records = []
         report_data = []
-        matcher = match_service.BibMatcher(fetcher)
-        for bib in records:
-            matches = matcher.match_full_record(bib)
-            analysis = bib.analyze_matches(candidates=matches)
-            bib.apply_match(analysis)
-            marc.BibUpdater.update_cataloging_record(bib, engine=marc_engine)
-            report_data.append(analysis.to_dict())
-        processed_barcodes = extract_nested_list([i.barcodes for i in records])
+        original_barcodes: list[str] = []
+        processed_barcodes: list[str] = []
+        seen_barcodes: set[str] = set()
+        matcher = match_service.BibMatcher(fetcher, max_workers=max_workers)
+        for chunk in itertools.batched(parsed, chunk_size):
+            if progress is not None:
+                progress.advance("parsed", len(chunk))
+            chunk_barcodes = extract_nested_list([i.barcodes for i in chunk])
+            bib_processing.validate_unique_barcodes(chunk_barcodes, seen=seen_barcodes)
+            original_barcodes.extend(chunk_barcodes)
+            all_matches = matcher.match_full_records(chunk)
+            matched = []
+            for bib, matches in zip(chunk, all_matches):
+                try:
+                    analysis = bib.analyze_matches(candidates=matches)
+                    bib.apply_match(analysis)
+                except Exception:
+                    logger.exception(f"Unable to match record: {bib}")
+                    if progress is not None:
+                        progress.advance("errors")
+                    continue
+                matched.append((bib, analysis))
+            if progress is not None:
+                progress.advance("matched", len(matched))
+            for bib, analysis in matched:
+                try:
+                    marc.BibUpdater.update_cataloging_record(bib, engine=marc_engine)
+                except Exception:
+                    logger.exception(f"Unable to update record: {bib}")
+                    if progress is not None:
+                        progress.advance("errors")
+                    continue
+                report_data.append(analysis.to_dict())
+                processed_barcodes.extend(bib.barcodes)
+                bib.compact()
+                records.append(bib)
+                if progress is not None:
+                    progress.advance("updated")
         missing_barcodes = bib_processing.validate_preserved_barcodes(
             processed_barcodes=processed_barcodes, original_barcodes=original_barcodes
         )
@@ -143,11 +310,13 @@ class ProcessCatalogingRecords:
             file_names=file_names,
         )
         files = [
-            reporting.ProcessedFile(
-                file_name=f"{file_name}-{k}.mrc", records=marc_engine.write(v)
+            marc.BibFileProcessor.write_file(
+                v, engine=marc_engine, file_name=f"{file_name}-{k}.mrc", output=output
             )
             for k, v in deduplicated.items()
         ]
+        if progress is not None:
+            progress.advance("written", sum(len(i) for i in deduplicated.values()))
         processed_batch = reporting.ProcessedFileBatch(files=files, report=report)
         return repo.save(processed_batch)
 
@@ -157,12 +326,16 @@ class ProcessSelectionRecords:
 
     @staticmethod
     def execute(
-        batches: dict[str, bytes],
+        batches: Mapping[str, Any],
         fetcher: ports.BibFetcher,
         marc_engine: ports.MarcEnginePort,
         matchpoints: dict[str, str],
         repo: ports.SqlRepositoryProtocol,
         template_data: dict[str, Any],
+        max_workers: int = 1,
+        progress: ports.ProgressReporter | None = None,
+        executor: ports.TaskExecutor | None = None,
+        output: ports.FileStorage | None = None,
     ) -> dict[str, Any]:
         """
         Process order-level MARC records.
@@ -173,7 +346,9 @@ class ProcessSelectionRecords:
 
         Args:
             batches:
-                a dictionary containing pairs of file names and associated binary data
+                a mapping of file names to their binary data (eg. `bytes` or a
+                memory-mapped file). Each file's data is only looked up when the
+                file is processed.
             fetcher:
                 a `ports.BibFetcher` object used by the command.
             marc_engine:
@@ -184,6 +359,21 @@ class ProcessSelectionRecords:
                 a `ports.SqlRepositoryProtocol` object used by the command.
             template_data:
                 Order template data as a dictionary.
+            max_workers:
+                The maximum number of concurrent Sierra queries used when
+                matching records.
+            progress:
+                An optional `ports.ProgressReporter` that is told how many
+                records have been parsed, matched, updated, and written.
+            executor:
+                An optional `ports.TaskExecutor` (eg. a `ProcessPoolExecutor`)
+                used to parse and update files in parallel. Records are matched
+                in this process while files are parsed and updated by the
+                executor.
+            output:
+                An optional `ports.FileStorage` to which the processed files are
+                written one record at a time. If it is not provided the processed
+                records are kept in memory and saved with the batch.
         Returns:
             A dictionary representing the processed files that were saved as a
             `ProcessedFileBatch` object in the db.
@@ -192,27 +382,72 @@ class ProcessSelectionRecords:
         out_batches = []
         file_names = []
         report_data = []
-        matcher = match_service.BibMatcher(fetcher)
+        pending = []
+        matcher = match_service.BibMatcher(fetcher, max_workers=max_workers)
         vendor = template_data.get("vendor", "UNKNOWN")
-        for file_name, data in batches.items():
+        parsed = parse_order_files(
+            batches=batches, marc_engine=marc_engine, vendor=vendor, executor=executor
+        )
+        for file_name, (records, parse_errors) in zip(batches.keys(), parsed):
             file_names.append(file_name)
-            records = marc.BibParser.parse_marc_data(
-                data=data, engine=marc_engine, vendor=vendor
-            )
+            if progress is not None:
+                progress.advance("parsed", len(records))
+                progress.advance("errors", parse_errors)
             original_barcodes = extract_nested_list([i.barcodes for i in records])
             bib_processing.validate_unique_barcodes(original_barcodes)
-            for bib in records:
-                matches = matcher.match_order_record(bib, matchpoints=matchpoints)
-                analysis = bib.analyze_matches(candidates=matches)
-                bib.apply_match(analysis)
-                marc.BibUpdater.update_selection_record(
-                    bib, engine=marc_engine, template_data=template_data
-                )
+            all_matches = matcher.match_order_records(records, matchpoints=matchpoints)
+            matched = []
+            for bib, matches in zip(records, all_matches):
+                try:
+                    analysis = bib.analyze_matches(candidates=matches)
+                    bib.apply_match(analysis)
+                except Exception:
+                    logger.exception(f"Unable to match record: {bib}")
+                    if progress is not None:
+                        progress.advance("errors")
+                    continue
                 report_data.append(analysis.to_dict())
-            processed = reporting.ProcessedFile(
-                file_name=file_name, records=marc_engine.write(records)
+                matched.append(bib)
+            if progress is not None:
+                progress.advance("matched", len(matched))
+            if executor is not None:
+                future = executor.submit(
+                    marc.BibFileProcessor.update_file,
+                    matched,
+                    engine=marc_engine,
+                    template_data=template_data,
+                    file_name=file_name,
+                    output=output,
+                )
+                pending.append((len(matched), future))
+                continue
+            updated = []
+            for bib in matched:
+                try:
+                    marc.BibUpdater.update_selection_record(
+                        bib, engine=marc_engine, template_data=template_data
+                    )
+                except Exception:
+                    logger.exception(f"Unable to update record: {bib}")
+                    if progress is not None:
+                        progress.advance("errors")
+                    continue
+                updated.append(bib)
+                if progress is not None:
+                    progress.advance("updated")
+            processed = marc.BibFileProcessor.write_file(
+                updated, engine=marc_engine, file_name=file_name, output=output
             )
             out_batches.append(processed)
+            if progress is not None:
+                progress.advance("written", len(updated))
+        for count, future in pending:
+            processed, update_errors = future.result()
+            out_batches.append(processed)
+            if progress is not None:
+                progress.advance("updated", count - update_errors)
+                progress.advance("written", count - update_errors)
+                progress.advance("errors", update_errors)
         report = bib_processing.create_order_records_report(
             analysis=report_data, file_names=file_names
         )
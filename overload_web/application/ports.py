@@ -3,7 +3,17 @@
 from __future__ import annotations
 
 import logging
-from typing import Any, Iterator, Protocol, Sequence, TypeVar, runtime_checkable
+from typing import (
+    Any,
+    BinaryIO,
+    Callable,
+    Iterable,
+    Iterator,
+    Protocol,
+    Sequence,
+    TypeVar,
+    runtime_checkable,
+)
 
 logger = logging.getLogger(__name__)
 
@@ -41,19 +51,66 @@ class BibFetcher(Protocol[S]):
         a list of `BaseSierraResponse` objects representing candidate matches.
     """
 
+    def get_bibs_by_ids(
+        self, values: Sequence[str | int], key: str
+    ) -> dict[str, list[S]]: ...  # pragma: no branch
+
+    """
+    Retrieve candidate bib records for multiple values of a single identifier.
+
+    Args:
+        values: The identifier values to search by (eg. ["9781234567890"]).
+        key: The field name corresponding to the identifiers (eg. "isbn").
+
+    Returns:
+        a dictionary mapping each value (as a string) to a list of
+        `BaseSierraResponse` objects representing candidate matches.
+    """
+
+
+@runtime_checkable
+class ConcurrentBibFetcher(BibFetcher[S], Protocol[S]):
+    """
+    Protocol for a `BibFetcher` that can run many queries concurrently itself.
+
+    Implementations may use an event loop rather than a pool of worker threads to
+    keep a large number of queries in flight at once.
+    """
+
+    def get_bibs_by_ids_many(
+        self, queries: Sequence[tuple[Sequence[str | int], str]]
+    ) -> list[dict[str, list[S]]]: ...  # pragma: no branch
+
+    """
+    Retrieve candidate bib records for several multi-value queries at once.
+
+    Args:
+        queries: A sequence of `(values, key)` tuples (eg. `(["978..."], "isbn")`).
+
+    Returns:
+        a list containing a dictionary mapping each value to its candidates for
+        each query, in the same order as `queries`.
+    """
+
 
 @runtime_checkable
 class FileStorage(Protocol):
-    def load(self, reference: str) -> bytes: ...  # pragma: no branch
+    def load(
+        self, reference: str, mapped: bool = False
+    ) -> Any: ...  # pragma: no branch
 
     """
     Load a file.
 
     Args:
         reference: the path to the file
+        mapped:
+            whether to memory-map the file rather than read it into memory, if
+            supported by the storage.
 
     Returns:
-        the content of the specified file as a `bytes` object
+        the content of the specified file as a `bytes` object or, if `mapped` is
+        True, a read-only buffer such as an `mmap.mmap` object.
     """
 
     def save(
@@ -72,6 +129,76 @@ class FileStorage(Protocol):
         the path where the file was saved as a string
     """
 
+    def save_stream(
+        self, id: str, filename: str, stream: BinaryIO, consumers: Sequence[Any] = ()
+    ) -> tuple[str, int]: ...  # pragma: no branch
+
+    """
+    Save a file to a location on storage by copying it from a stream in chunks.
+
+    Args:
+        id: the workflow_id for the file.
+        filename: the name of the file.
+        stream: a binary file-like object containing the content of the file.
+        consumers:
+            objects with an `update` method (eg. a `hashlib` hash) that are passed
+            each chunk of the file as it is saved.
+
+    Returns:
+        the path where the file was saved as a string and the size of the file
+    """
+
+    def delete(self, reference: str) -> None: ...  # pragma: no branch
+
+    """
+    Delete a file and its record index from storage.
+
+    Args:
+        reference: the path to the file
+    """
+
+    def open_sink(
+        self, id: str, filename: str
+    ) -> tuple[str, BinaryIO]: ...  # pragma: no branch
+
+    """
+    Open a new file on storage for writing.
+
+    Args:
+        id: the id for the file.
+        filename: the name of the file.
+
+    Returns:
+        the path to the file as a string and the file opened for writing. The
+        caller is responsible for closing the file.
+    """
+
+    def save_index(
+        self, reference: str, index: dict[str, Any]
+    ) -> None: ...  # pragma: no branch
+
+    """
+    Save the record index of a file alongside the file.
+
+    Args:
+        reference: the path to the file that was indexed
+        index: the record index of the file
+    """
+
+    def load_index(
+        self, reference: str
+    ) -> dict[str, Any] | None: ...  # pragma: no branch
+
+    """
+    Load the record index of a file.
+
+    Args:
+        reference: the path to the file whose index is to be loaded
+
+    Returns:
+        the record index of the file or `None` if the file has not been indexed
+    """
+
 
 @runtime_checkable
 class FileLoader(Protocol):
@@ -132,6 +259,33 @@ class FileWriter(Protocol):
     """
 
 
+@runtime_checkable
+class JobRunner(Protocol):
+    """
+    A protocol for a service that runs processing jobs in the background.
+
+    Implementations may run jobs in a pool of worker threads or processes or hand
+    them off to an external queue.
+    """
+
+    def submit(self, task: Callable[..., None]) -> Any: ...  # pragma: no branch
+
+    """
+    Schedule a task to run in the background.
+
+    The task is called with the keyword arguments `jobs` and `batches`, which
+    are `SqlRepositoryProtocol` objects for jobs and processed batches. They are
+    bound to a database session owned by the worker rather than by the request
+    that submitted the task.
+
+    Args:
+        task: the callable to run
+
+    Returns:
+        an object representing the pending result of the task (eg. a `Future`)
+    """
+
+
 @runtime_checkable
 class MarcEnginePort(Protocol[U, V]):
     bib_rules: dict[str, Any]
@@ -149,6 +303,12 @@ class MarcEnginePort(Protocol[U, V]):
 
     """Create a `bookops_marc.Bib` object from a `DomainBib` object"""
 
+    def extract(
+        self, record: V
+    ) -> tuple[dict[str, Any], list[dict[str, Any]]]: ...  # pragma: no branch
+
+    """Map a `bookops_marc.Bib` object and its orders to dictionaries."""
+
     def get_command_tag_field(self, bib: V) -> Any | None: ...  # pragma: no branch
 
     """Get the Sierra command tag from a bib record if present."""
@@ -183,6 +343,85 @@ class MarcEnginePort(Protocol[U, V]):
 
     """Write DomainBib objects to binary."""
 
+    def write_to(self, records: list[V], sink: BinaryIO) -> int: ...  # pragma:no branch
+
+    """Write DomainBib objects to a binary file or stream."""
+
+
+@runtime_checkable
+class MarcRecordIndexer(Protocol):
+    """
+    A protocol for a service that indexes the records in a MARC file.
+
+    The index allows individual records to be read from a file without reading
+    every record that precedes them.
+    """
+
+    def index(self, data: bytes) -> dict[str, Any] | None: ...  # pragma: no branch
+
+    """
+    Build an index of the records in a MARC file.
+
+    Args:
+        data: the content of a MARC file as a `bytes` object
+
+    Returns:
+        a JSON-serializable dictionary containing the `[offset, length]` of each
+        record (`records`) and mappings of `control_number`, `isbn` and `barcode`
+        values to record positions, or None if the file could not be indexed.
+    """
+
+
+@runtime_checkable
+class ProgressReporter(Protocol):
+    """
+    A protocol for a service that reports the progress of a processing run.
+
+    Implementations should be cheap to call once per record (eg. by throttling
+    how often progress is published).
+    """
+
+    def advance(self, stage: str, count: int = 1) -> None: ...  # pragma: no branch
+
+    """
+    Record that a number of records have reached a stage of processing.
+
+    Args:
+        stage: one of `parsed`, `matched`, `updated`, `written`, or `errors`
+        count: the number of records
+    """
+
+    def finish(self, status: str) -> None: ...  # pragma: no branch
+
+    """
+    Publish the final progress of a processing run.
+
+    Args:
+        status: the final status of the run (ie. `complete` or `failed`)
+    """
+
+
+@runtime_checkable
+class RecordCounter(Protocol):
+    """
+    A protocol for a service that counts the records in a MARC file while the
+    file is read in chunks.
+    """
+
+    @property
+    def count(self) -> int | None: ...  # pragma: no branch
+
+    """The number of records read or None if the records could not be counted."""
+
+    def update(self, data: bytes) -> None: ...  # pragma: no branch
+
+    """
+    Read the next chunk of a MARC file.
+
+    Args:
+        data: the next chunk of the file as a `bytes` object
+    """
+
 
 @runtime_checkable
 class SqlRepositoryProtocol(Protocol[T]):
@@ -225,6 +464,62 @@ class SqlRepositoryProtocol(Protocol[T]):
     """Update an existing object in a database."""
 
 
+@runtime_checkable
+class JobRepositoryProtocol(SqlRepositoryProtocol[T], Protocol[T]):
+    """
+    Interface for repository operations on background jobs.
+
+    Extends `SqlRepositoryProtocol` with a method to find jobs by their status.
+    """
+
+    def list_by_status(
+        self, statuses: Sequence[str]
+    ) -> Sequence[dict[str, Any]]: ...  # pragma: no branch
+
+    """List all jobs in a database that have one of a number of statuses."""
+
+
+@runtime_checkable
+class TaskExecutor(Protocol):
+    """
+    A protocol for a service that runs CPU-bound tasks in parallel.
+
+    `concurrent.futures.ProcessPoolExecutor` is a concrete implementation. Tasks
+    and their arguments and results must be picklable.
+    """
+
+    def map(
+        self, fn: Callable[..., Any], *iterables: Iterable[Any]
+    ) -> Iterator[Any]: ...  # pragma: no branch
+
+    """
+    Run a task for each item in one or more iterables.
+
+    Args:
+        fn: the task to run
+        iterables: the arguments to pass to each call of `fn`
+
+    Returns:
+        an iterator of the results of each call, in the same order as `iterables`
+    """
+
+    def submit(
+        self, fn: Callable[..., Any], /, *args: Any, **kwargs: Any
+    ) -> Any: ...  # pragma: no branch
+
+    """
+    Schedule a task to run.
+
+    Args:
+        fn: the task to run
+        args: positional arguments to pass to `fn`
+        kwargs: keyword arguments to pass to `fn`
+
+    Returns:
+        an object representing the pending result of the task (eg. a `Future`)
+    """
+
+
 class ReportHandler(Protocol):
     """A protocol defining a service used to create processing reports."""
 
@@ -47,8 +47,9 @@ def validate_preserved_barcodes(
 ) -> list[str]:
     """Confirm barcodes extracted from a file are present in processed records"""
     missing_barcodes = set()
+    processed = set(processed_barcodes)
     for barcode in original_barcodes:
-        if barcode not in processed_barcodes:
+        if barcode not in processed:
             missing_barcodes.add(barcode)
     valid = sorted(original_barcodes) == sorted(processed_barcodes)
     logger.debug(
@@ -59,9 +60,25 @@ def validate_preserved_barcodes(
     return list(missing_barcodes)
 
 
-def validate_unique_barcodes(barcodes: list[str]) -> None:
-    """Confirm barcodes in a file are all unique."""
+def validate_unique_barcodes(barcodes: list[str], seen: set[str] | None = None) -> None:
+    """
+    Confirm barcodes in a file are all unique.
+
+    Args:
+        barcodes:
+            The barcodes to validate.
+        seen:
+            Barcodes from records in the same file that were already validated, if
+            the file is being validated in chunks. Updated in place with `barcodes`.
+
+    Raises:
+        ValueError: if a barcode appears more than once.
+    """
+    seen = set() if seen is None else seen
     barcode_counter = Counter(barcodes)
-    dupe_barcodes = [i for i, count in barcode_counter.items() if count > 1]
+    dupe_barcodes = [
+        i for i, count in barcode_counter.items() if count > 1 or i in seen
+    ]
     if dupe_barcodes:
         raise ValueError(f"Duplicate barcodes found in file: {dupe_barcodes}")
+    seen.update(barcode_counter)
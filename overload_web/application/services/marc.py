@@ -2,14 +2,13 @@
 
 from __future__ import annotations
 
-import io
 import logging
-from collections import Counter
-from typing import Any
+import uuid
+from typing import Any, Callable, Iterator
 
 from overload_web.application import ports
 from overload_web.application.services import marc_updates
-from overload_web.domain.models import bibs
+from overload_web.domain.models import bibs, reporting
 
 logger = logging.getLogger(__name__)
 
@@ -19,7 +18,13 @@ class BibDeduplicator:
     def deduplicate(
         records: list[bibs.DomainBib], engine: ports.MarcEnginePort
     ) -> dict[str, list[bibs.DomainBib]]:
-        """Review and deduplicate a batch of processed full-level MARC records."""
+        """
+        Review and deduplicate a batch of processed full-level MARC records.
+
+        New records are grouped by control number in a single pass. The item
+        fields of each duplicate are merged into the first record in its group and
+        only records with duplicates are parsed.
+        """
         merge: list[bibs.DomainBib] = []
         new: list[bibs.DomainBib] = []
         deduped: list[bibs.DomainBib] = []
@@ -31,58 +36,169 @@ class BibDeduplicator:
         if not new:
             return {"NEW": merge, "DUP": new, "DEDUPED": deduped}
         logger.debug("Deduping new records")
-        new_record_counter = Counter([i.control_number for i in new])
-        dupe_recs = [i for i, count in new_record_counter.items() if count > 1]
-        if not dupe_recs:
+        groups: dict[str | None, list[bibs.DomainBib]] = {}
+        for record in new:
+            groups.setdefault(record.control_number, []).append(record)
+        if len(groups) == len(new):
             logger.debug("No duplicates found in file.")
             return {"NEW": merge, "DUP": new, "DEDUPED": deduped}
         logger.info("Discovered duplicate records in processed file")
 
-        processed_dupes = []
-        for record in new:
-            if record.control_number not in dupe_recs:
+        for group in groups.values():
+            record = group[0]
+            if len(group) == 1:
                 deduped.append(record)
-            if record.control_number in processed_dupes:
                 continue
-            all_dupes = [i for i in new if i.control_number == record.control_number]
-            base_rec = engine.create_bib_from_domain(record=all_dupes[0])
+            base_rec = engine.create_bib_from_domain(record=record)
             if base_rec.library == "bpl" and base_rec.overdrive_number is None:
                 tag = "960"
                 ind2 = " "
             else:
                 tag = "949"
                 ind2 = "1"
-            all_items = []
-            for dupe in all_dupes[1:]:
+            for dupe in group[1:]:
                 dupe_bib = engine.create_bib_from_domain(record=dupe)
-                all_items.extend(dupe_bib.get_fields(tag))
-            for item in all_items:
-                if item.indicator1 == " " and item.indicator2 == ind2:
-                    base_rec.add_ordered_field(item)
-            record.binary_data = base_rec.as_marc()
-            processed_dupes.append(record.control_number)
+                for item in dupe_bib.get_fields(tag):
+                    if item.indicator1 == " " and item.indicator2 == ind2:
+                        base_rec.add_ordered_field(item)
+            record.marc_record = base_rec
             deduped.append(record)
         return {"NEW": merge, "DUP": new, "DEDUPED": deduped}
 
 
+class BibFileProcessor:
+    """
+    Runs the CPU-bound steps of processing a file of order-level records.
+
+    The methods only take and return picklable objects so that they can be run in
+    a separate process (eg. by a `ProcessPoolExecutor`).
+    """
+
+    @staticmethod
+    def parse_file(
+        data: bytes | Callable[[], Any],
+        engine: ports.MarcEnginePort,
+        vendor: str | None = "UNKNOWN",
+        compact: bool = False,
+    ) -> tuple[list[bibs.DomainBib], int]:
+        """
+        Parse a file of MARC binary to a list of `DomainBib` objects.
+
+        `data` may be a callable that loads the file (eg. from storage) so that a
+        worker process can read the file itself rather than be sent a copy of it.
+        Content loaded this way is closed once the file is parsed.
+
+        If `compact` is True the parsed records are serialized back to MARC binary
+        so that they can be sent to another process cheaply.
+
+        Returns:
+            the parsed records and the number of records that could not be parsed.
+        """
+        skipped: list[int] = []
+        content = data() if callable(data) else data
+        try:
+            records = BibParser.parse_marc_data(
+                data=content,
+                engine=engine,
+                vendor=vendor,
+                on_error=lambda: skipped.append(1),
+            )
+            if compact:
+                for record in records:
+                    record.compact()
+        finally:
+            if content is not data and hasattr(content, "close"):
+                content.close()
+        return records, len(skipped)
+
+    @staticmethod
+    def update_file(
+        records: list[bibs.DomainBib],
+        engine: ports.MarcEnginePort,
+        template_data: dict[str, Any],
+        file_name: str,
+        output: ports.FileStorage | None = None,
+    ) -> tuple[reporting.ProcessedFile, int]:
+        """
+        Update a file of order-level records and write them to MARC binary.
+
+        Records are updated using the acquisitions or selection rules depending on
+        the engine's `record_type` and written with `write_file`. Records that
+        cannot be updated are logged and left out of the file.
+
+        Returns:
+            the processed file and the number of records that could not be updated.
+        """
+        if engine.record_type == "acq":
+            update = BibUpdater.update_acquisition_record
+        else:
+            update = BibUpdater.update_selection_record
+        updated = []
+        for record in records:
+            try:
+                update(record, engine=engine, template_data=template_data)
+            except Exception:
+                logger.exception(f"Unable to update record: {record}")
+                continue
+            updated.append(record)
+        processed = BibFileProcessor.write_file(
+            updated, engine=engine, file_name=file_name, output=output
+        )
+        return processed, len(records) - len(updated)
+
+    @staticmethod
+    def write_file(
+        records: list[bibs.DomainBib],
+        engine: ports.MarcEnginePort,
+        file_name: str,
+        output: ports.FileStorage | None = None,
+    ) -> reporting.ProcessedFile:
+        """
+        Write a file of records to MARC binary.
+
+        If `output` storage is provided each record is written to a new file in
+        storage as it is serialized and the `ProcessedFile` refers to the stored
+        file. Otherwise the records are kept on the `ProcessedFile` as bytes.
+        """
+        if output is None:
+            return reporting.ProcessedFile(
+                file_name=file_name, records=engine.write(records)
+            )
+        reference, sink = output.open_sink(id=str(uuid.uuid4()), filename=file_name)
+        with sink:
+            engine.write_to(records, sink)
+        logger.info(f"Processed file written to storage: {reference}")
+        return reporting.ProcessedFile(file_name=file_name, reference=reference)
+
+
 class BibParser:
     @staticmethod
-    def parse_marc_data(
-        data: bytes, engine: ports.MarcEnginePort, vendor: str | None = "UNKNOWN"
-    ) -> list[bibs.DomainBib]:
-        """Parse MARC binary to a list of `DomainBib` domain objects."""
+    def iter_marc_data(
+        data: bytes,
+        engine: ports.MarcEnginePort,
+        vendor: str | None = "UNKNOWN",
+        on_error: Callable[[], None] | None = None,
+    ) -> Iterator[bibs.DomainBib]:
+        """
+        Parse MARC binary to `DomainBib` domain objects one record at a time.
+
+        Records that cannot be read are logged and skipped. `on_error` is called
+        once for each skipped record.
+        """
         reader = engine.get_reader(data)
-        parsed = []
         for record in reader:
-            bib_dict = engine.map_data(
-                obj=record, rules=engine.config.parser_bib_mapping
-            )
-            order_data = [
-                engine.map_data(obj=i, rules=engine.config.parser_order_mapping)
-                for i in record.orders
-            ]
+            if record is None:
+                logger.warning(
+                    "Unable to parse vendor record: "
+                    f"{getattr(reader, 'current_exception', None)!r}"
+                )
+                if on_error is not None:
+                    on_error()
+                continue
+            bib_dict, order_data = engine.extract(record)
             bib_dict["orders"] = [bibs.Order(**i) for i in order_data]
-            bib_dict["binary_data"] = record.as_marc()
+            bib_dict["binary_data"] = None
+            bib_dict["marc_record"] = record
             bib_dict["record_type"] = engine.record_type
             if engine.record_type == "cat":
                 bib_dict["vendor_info"] = bibs.VendorInfo(
@@ -96,8 +212,26 @@ class BibParser:
                 bib_dict["collection"] = engine.collection
             bib = bibs.DomainBib(**bib_dict)
             logger.info(f"Vendor record parsed: {bib}")
-            parsed.append(bib)
-        return parsed
+            yield bib
+
+    @staticmethod
+    def parse_marc_data(
+        data: bytes,
+        engine: ports.MarcEnginePort,
+        vendor: str | None = "UNKNOWN",
+        on_error: Callable[[], None] | None = None,
+    ) -> list[bibs.DomainBib]:
+        """
+        Parse MARC binary to a list of `DomainBib` domain objects.
+
+        Records that cannot be read are logged and skipped. `on_error` is called
+        once for each skipped record.
+        """
+        return list(
+            BibParser.iter_marc_data(
+                data=data, engine=engine, vendor=vendor, on_error=on_error
+            )
+        )
 
 
 class BibUpdater:
@@ -112,7 +246,7 @@ class BibUpdater:
         )
         engine.update_fields(field_updates=updates, bib=bib)
         bib.leader = marc_updates.FieldRules.update_leader(bib.leader)
-        record.binary_data = bib.as_marc()
+        record.marc_record = bib
 
     @staticmethod
     def update_acquisition_record(
@@ -127,7 +261,7 @@ class BibUpdater:
         )
         engine.update_fields(field_updates=updates, bib=bib)
         bib.leader = marc_updates.FieldRules.update_leader(bib.leader)
-        record.binary_data = bib.as_marc()
+        record.marc_record = bib
 
     @staticmethod
     def update_selection_record(
@@ -146,20 +280,4 @@ class BibUpdater:
         )
         engine.update_fields(field_updates=updates, bib=bib)
         bib.leader = marc_updates.FieldRules.update_leader(bib.leader)
-        record.binary_data = bib.as_marc()
-
-
-class MarcFileMerger:
-    @staticmethod
-    def combine_marc_files(data: list[bytes], engine: ports.MarcEnginePort) -> bytes:
-        """Combine multiple bytes objects (ie. MARC files) into one for processing."""
-        records = []
-        for batch in data:
-            reader = engine.get_reader(batch)
-            for record in reader:
-                records.append(record)
-        io_data = io.BytesIO()
-        for record in records:
-            io_data.write(record.as_marc())
-        io_data.seek(0)
-        return io_data.getvalue()
+        record.marc_record = bib
@@ -3,18 +3,31 @@
 This module defines the `BibMatcher`, an application service responsible for
 finding duplicate records in Sierra for a `DomainBib`. Matching is based on
 specific identifiers such as OCLC number, ISBN, or Sierra Bib ID.
+
+Records can be matched one at a time or as a batch. When matching a batch the
+records are grouped by matchpoint and Sierra is queried with chunks of multiple
+identifiers at a time. Each matchpoint level (primary, secondary, tertiary) is
+only queried for the records that did not return any candidates at the previous
+level. The chunked queries can be run concurrently on a bounded pool of worker
+threads. Results are always returned in the same order as the input records.
 """
 
 from __future__ import annotations
 
+import itertools
 import logging
-from typing import Any
+from collections import defaultdict
+from concurrent.futures import ThreadPoolExecutor
+from typing import Any, Callable, Sequence, TypeVar
 
 from overload_web.application import ports
 from overload_web.domain.models import bibs
 
 logger = logging.getLogger(__name__)
 
+P = TypeVar("P")  # variable for items passed to concurrently run functions
+Q = TypeVar("Q")  # variable for output of concurrently run functions
+
 
 class BibMatcher:
     """
@@ -28,7 +41,9 @@ class BibMatcher:
     were found.
     """
 
-    def __init__(self, fetcher: ports.BibFetcher) -> None:
+    def __init__(
+        self, fetcher: ports.BibFetcher, max_workers: int = 1, batch_size: int = 5
+    ) -> None:
         """
         Initialize the match service with a fetcher.
 
@@ -36,8 +51,139 @@ class BibMatcher:
             fetcher:
                 An injected `ports.BibFetcher` that retrieves candidate bibs
                 from Sierra.
+            max_workers:
+                The maximum number of Sierra queries to run concurrently when
+                matching a batch of records. A value of 1 runs all queries
+                sequentially.
+            batch_size:
+                The maximum number of identifiers to send to Sierra in a single
+                query when matching a batch of records.
+
+        Raises:
+            ValueError: if `max_workers` or `batch_size` is less than 1.
         """
+        if max_workers < 1:
+            raise ValueError("`max_workers` must be greater than or equal to 1.")
+        if batch_size < 1:
+            raise ValueError("`batch_size` must be greater than or equal to 1.")
         self.fetcher = fetcher
+        self.max_workers = max_workers
+        self.batch_size = batch_size
+
+    def _run_concurrently(self, func: Callable[[P], Q], items: Sequence[P]) -> list[Q]:
+        """
+        Apply a function to each item in a sequence.
+
+        If the service was configured with more than one worker the items are
+        processed concurrently using a thread pool, otherwise they are processed
+        one after another.
+
+        Args:
+            func:
+                The function to apply to each item.
+            items:
+                A sequence of items to pass to `func`.
+
+        Returns:
+            A list containing the output for each item in the same order as `items`.
+        """
+        if self.max_workers == 1 or len(items) <= 1:
+            return [func(i) for i in items]
+        workers = min(self.max_workers, len(items))
+        logger.debug(f"Running {len(items)} Sierra queries with {workers} workers.")
+        with ThreadPoolExecutor(max_workers=workers) as executor:
+            return list(executor.map(func, items))
+
+    def _get_bibs_by_chunks(
+        self, chunks: Sequence[tuple[str, list[str]]]
+    ) -> list[dict[str, list[dict[str, Any]]]]:
+        """
+        Query Sierra for each chunk of values.
+
+        If the fetcher can run queries concurrently itself (eg. on an event loop)
+        all of the chunks are passed to it at once, otherwise the chunks are
+        queried using the service's worker threads.
+
+        Args:
+            chunks: a sequence of `(key, values)` tuples.
+
+        Returns:
+            a list containing the candidates for each value in each chunk in the
+            same order as `chunks`.
+        """
+        if isinstance(self.fetcher, ports.ConcurrentBibFetcher):
+            return self.fetcher.get_bibs_by_ids_many(
+                [(values, key) for key, values in chunks]
+            )
+        return self._run_concurrently(
+            lambda chunk: self.fetcher.get_bibs_by_ids(values=chunk[1], key=chunk[0]),
+            chunks,
+        )
+
+    def _match_bibs(
+        self, records: Sequence[bibs.DomainBib], matchpoints: Sequence[dict[str, str]]
+    ) -> list[list[dict[str, Any]]]:
+        """
+        Find all matches in Sierra for a batch of bib records.
+
+        The records are matched one matchpoint level at a time. At each level the
+        values of the records that have not yet returned candidates are grouped by
+        matchpoint, deduplicated, and sent to the fetcher in chunks of at most
+        `batch_size` values. As with `_match_bib`, the first matchpoint that
+        returns candidates for a record is used for comparison.
+
+        Args:
+            records:
+                A sequence of bibliographic records to match against Sierra
+                represented as `DomainBib` objects.
+            matchpoints:
+                A sequence containing a dictionary of matchpoints for each record.
+
+        Returns:
+            A list containing each record's matches as a list of dictionaries
+            representing Sierra responses in the same order as `records`.
+        """
+        queries: list[list[tuple[str, str]]] = []
+        for record, record_matchpoints in zip(records, matchpoints):
+            queries.append(
+                [
+                    (i, str(getattr(record, i)))
+                    for i in record_matchpoints.values()
+                    if i and getattr(record, i, None)
+                ]
+            )
+        out: list[list[dict[str, Any]]] = [[] for _ in records]
+        pending = [n for n, i in enumerate(queries) if i]
+        level = 0
+        while pending:
+            grouped: dict[str, dict[str, None]] = defaultdict(dict)
+            for n in pending:
+                key, value = queries[n][level]
+                grouped[key][value] = None
+            chunks = [
+                (key, list(chunk))
+                for key, values in grouped.items()
+                for chunk in itertools.batched(values, self.batch_size)
+            ]
+            logger.debug(
+                f"Querying Sierra for {len(pending)} records at matchpoint level "
+                f"{level + 1} with {len(chunks)} queries."
+            )
+            responses = self._get_bibs_by_chunks(chunks)
+            candidates: dict[tuple[str, str], list[dict[str, Any]]] = {}
+            for (key, values), response in zip(chunks, responses):
+                for value in values:
+                    candidates[(key, value)] = response.get(value, [])
+            next_pending = []
+            for n in pending:
+                matches = candidates[queries[n][level]]
+                if matches:
+                    out[n] = matches
+                elif level + 1 < len(queries[n]):
+                    next_pending.append(n)
+            pending = next_pending
+            level += 1
+        return out
 
     def _match_bib(
         self, record: bibs.DomainBib, matchpoints: dict[str, str]
@@ -114,3 +260,49 @@ class BibMatcher:
             record=record, matchpoints=record.vendor_info.matchpoints
         )
         return responses
+
+    def match_order_records(
+        self, records: Sequence[bibs.DomainBib], matchpoints: dict[str, str]
+    ) -> list[list[dict[str, Any]]]:
+        """
+        Match a batch of order-level bibliographic records against Sierra.
+
+        Args:
+            records:
+                A sequence of parsed bibliographic records as `DomainBib` objects.
+            matchpoints:
+                A dictionary containing matchpoints to be used in matching.
+
+        Returns:
+            A list containing each record's matches as a list of dictionaries
+            representing Sierra responses. The list is in the same order as
+            `records`.
+        """
+        return self._match_bibs(
+            records=records, matchpoints=[matchpoints for _ in records]
+        )
+
+    def match_full_records(
+        self, records: Sequence[bibs.DomainBib]
+    ) -> list[list[dict[str, Any]]]:
+        """
+        Match a batch of full-level bibliographic records against Sierra.
+
+        Args:
+            records:
+                A sequence of parsed bibliographic records as `DomainBib` objects.
+
+        Returns:
+            A list containing each record's matches as a list of dictionaries
+            representing Sierra responses. The list is in the same order as
+            `records`.
+
+        Raises:
+            ValueError: if the value of a record's `vendor_info` attribute is None.
+        """
+        record_matchpoints = []
+        for record in records:
+            if record.vendor_info is None:
+                raise ValueError("Vendor index required for cataloging workflow.")
+            record_matchpoints.append(record.vendor_info.matchpoints)
+        return self._match_bibs(records=records, matchpoints=record_matchpoints)
@@ -25,7 +25,7 @@ class CatalogAction(StrEnum):
 class ClassifiedCandidates:
     """Holds candidate matches and associated data."""
 
-    matched: list
+    matched: list[sierra_responses.SierraCandidate]
     mixed: list[str]
     other: list[str]
 
@@ -52,7 +52,7 @@ class DomainBib:
 
     def __init__(
         self,
-        binary_data: bytes,
+        binary_data: bytes | None,
         collection: Collection | str | None,
         library: LibrarySystem | str,
         record_type: RecordType | str,
@@ -62,6 +62,7 @@ class DomainBib:
         branch_call_number: str | None = None,
         control_number: str | None = None,
         isbn: str | None = None,
+        marc_record: MarcRecord | None = None,
         oclc_number: str | list[str] | None = None,
         orders: list[Order] = [],
         research_call_number: str | list[str] | None = None,
@@ -75,7 +76,8 @@ class DomainBib:
 
         Args:
             binary_data:
-                The marc record as a byte literal or `bytes` object
+                The marc record as a byte literal or `bytes` object. May be None if
+                `marc_record` is passed.
             collection:
                 The collection to whom the record belongs as an enum
                 (`Collection`), str or None.
@@ -97,6 +99,10 @@ class DomainBib:
                 The record's control number as a string, if present.
             isbn:
                 The ISBN for the title as a string, if present.
+            marc_record:
+                The parsed MARC record, if available. The parsed record is reused
+                by each processing step and only serialized when `binary_data` is
+                read.
             oclc_number:
                 OCLC number(s) identifying the record as a string or list of strings,
                 if present.
@@ -118,7 +124,8 @@ class DomainBib:
 
         self.barcodes = barcodes
         self.bib_id = bib_id
-        self.binary_data = binary_data
+        self._binary_data = binary_data or b""
+        self.marc_record = marc_record
         self.branch_call_number = branch_call_number
         self.collection = Collection(str(collection).upper())
         self.control_number = control_number
@@ -146,6 +153,18 @@ class DomainBib:
     def action(self, value) -> None:
         self._action = value
 
+    @property
+    def binary_data(self) -> bytes:
+        """The MARC record as `bytes`, serialized from `marc_record` if present."""
+        if self.marc_record is not None:
+            return self.marc_record.as_marc()
+        return self._binary_data
+
+    @binary_data.setter
+    def binary_data(self, value: bytes) -> None:
+        self._binary_data = value
+        self.marc_record = None
+
     @property
     def call_number(self) -> str | None:
         """Determine call number for bib record."""
@@ -218,17 +237,28 @@ class DomainBib:
             order.apply_template(template_data=template_data)
 
     def classify_matches(self, matches: list) -> ClassifiedCandidates:
-        """Classify the candidate matches associated with this response."""
+        """
+        Classify the candidate matches associated with this response.
+
+        Each candidate is parsed into a compact `SierraCandidate` so the raw
+        response data is not retained once the matches have been classified.
+        """
+        response_class: type[sierra_responses.BaseSierraResponse]
         if self.library == "bpl":
-            matches = [sierra_responses.BPLSolrResponse(i) for i in matches]
+            response_class = sierra_responses.BPLSolrResponse
         elif self.library == "nypl":
-            matches = [sierra_responses.NYPLPlatformResponse(i) for i in matches]
+            response_class = sierra_responses.NYPLPlatformResponse
         else:
             raise ValueError(
                 f"Unknown library: {self.library}. Cannot classify matches."
             )
-        matched, mixed, other = [], [], []
-        for c in sorted(matches, key=lambda i: int(i.bib_id.strip(".b")), reverse=True):
+        candidates = [response_class(i).to_candidate() for i in matches]
+        matched: list[sierra_responses.SierraCandidate] = []
+        mixed: list[str] = []
+        other: list[str] = []
+        for c in sorted(
+            candidates, key=lambda i: int(i.bib_id.strip(".b")), reverse=True
+        ):
             if c.collection == "MIXED":
                 mixed.append(c.bib_id)
             elif c.collection == self.collection:
@@ -238,8 +268,13 @@ class DomainBib:
 
         return ClassifiedCandidates(matched, mixed, other)
 
+    def compact(self) -> None:
+        """Serialize `marc_record` to `binary_data` and release the parsed record."""
+        if self.marc_record is not None:
+            self.binary_data = self.marc_record.as_marc()
+
     def determine_catalog_action(
-        self, candidate: sierra_responses.BaseSierraResponse
+        self, candidate: sierra_responses.SierraCandidate
     ) -> tuple[CatalogAction, bool]:
         """
         Determine whether to insert, attach, or overlay a bib record in Sierra
@@ -264,6 +299,12 @@ class LibrarySystem(StrEnum):
     NYPL = "nypl"
 
 
+class MarcRecord(Protocol):
+    """A parsed MARC record that can be serialized to MARC21 binary."""
+
+    def as_marc(self) -> bytes: ...  # pragma: no branch
+
+
 class MatchAnalysis:
     """Components extracted from match review process."""
 
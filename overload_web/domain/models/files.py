@@ -4,25 +4,117 @@ Classes:
 
 `VendorFile`
     Represents a vendor file.
+
+`VendorFileBatch`
+    Maps the names of vendor files to their content.
+
+`IncomingFile`
+    Represents a vendor file that has been added to a workflow.
 """
 
 from __future__ import annotations
 
+from collections.abc import Buffer, Callable, Iterable, Iterator, Mapping
 from dataclasses import dataclass
+from typing import Any
 
 
-@dataclass(kw_only=True)
 class VendorFile:
     """
     Represents a vendor file.
 
+    The content of a file can be passed directly or loaded by an `opener`. If an
+    `opener` is passed the file is only loaded the first time its content is read.
+
     Attributes:
         content: binary content of the file.
         file_name: name of the file.
     """
 
-    content: bytes
-    file_name: str
+    def __init__(
+        self,
+        *,
+        file_name: str,
+        content: Buffer | None = None,
+        opener: Callable[[], Buffer] | None = None,
+    ) -> None:
+        self.file_name = file_name
+        self._content = content
+        self._opener = opener
+
+    def __eq__(self, other: object) -> bool:
+        if not isinstance(other, VendorFile):
+            return NotImplemented
+        return self.file_name == other.file_name and self.content == other.content
+
+    def __repr__(self) -> str:
+        return f"VendorFile(file_name={self.file_name!r}, loaded={self.loaded})"
+
+    @property
+    def content(self) -> Any:
+        """The content of the file, loaded when it is first read."""
+        if self._content is None and self._opener is not None:
+            self._content = self._opener()
+        return self._content
+
+    @property
+    def source(self) -> Any:
+        """
+        The file's `opener` if it has one, otherwise its content.
+
+        An `opener` can be passed to another process, which loads the file itself,
+        so the file does not have to be loaded and copied by this process.
+        """
+        return self._opener if self._opener is not None else self._content
+
+    @property
+    def loaded(self) -> bool:
+        """Whether the content of the file has been loaded."""
+        return self._content is not None
+
+    def close(self) -> None:
+        """
+        Release the content of a file that was loaded by an `opener`.
+
+        The file will be loaded again if its content is read after it is closed.
+        Content passed directly to the `VendorFile` is kept.
+        """
+        if self._opener is None or self._content is None:
+            return
+        close = getattr(self._content, "close", None)
+        if close is not None:
+            close()
+        self._content = None
+
+
+class VendorFileBatch(Mapping[str, Any]):
+    """
+    Maps the names of vendor files to their content.
+
+    Each file's content is only loaded when it is looked up so the files in a
+    batch can be processed one at a time.
+    """
+
+    def __init__(self, files: Iterable[VendorFile]) -> None:
+        self._files = {i.file_name: i for i in files}
+
+    def __getitem__(self, key: str) -> Any:
+        return self._files[key].content
+
+    def __iter__(self) -> Iterator[str]:
+        return iter(self._files)
+
+    def __len__(self) -> int:
+        return len(self._files)
+
+    def source(self, key: str) -> Any:
+        """Get the `opener` of a file if it has one, otherwise its content."""
+        return self._files[key].source
+
+    def close(self) -> None:
+        """Release the content of all files in the batch."""
+        for file in self._files.values():
+            file.close()
 
 
 @dataclass(kw_only=True)
@@ -32,3 +124,6 @@ class IncomingFile:
     workflow_id: str
     source: str
     reference: str
+    sha256: str | None = None
+    size: int | None = None
+    record_count: int | None = None
@@ -2,6 +2,7 @@
 
 from __future__ import annotations
 
+import datetime
 import logging
 from dataclasses import dataclass, field
 from typing import Any
@@ -11,10 +12,16 @@ logger = logging.getLogger(__name__)
 
 @dataclass
 class ProcessedFile:
-    """A value object representing a processed file of MARC records"""
+    """
+    A value object representing a processed file of MARC records.
+
+    The records are either kept as MARC binary in `records` or, if the file was
+    written to storage, `reference` is the path to the stored file.
+    """
 
     file_name: str
-    records: bytes
+    records: bytes = b""
+    reference: str | None = None
 
 
 @dataclass
@@ -25,6 +32,26 @@ class ProcessedFileBatch:
     report: ProcessingStatistics
 
 
+@dataclass
+class ProcessingJob:
+    """
+    A dataclass representing a background job that processes a batch of files.
+
+    A job is `queued` when it is created, `running` while its files are processed,
+    and either `complete`, with the ID of its `ProcessedFileBatch`, or `failed`,
+    with an error message, once it has finished.
+    """
+
+    id: str
+    record_type: str
+    status: str = "queued"
+    batch_id: int | None = None
+    error: str | None = None
+    created_at: datetime.datetime = field(
+        default_factory=lambda: datetime.datetime.now(datetime.timezone.utc)
+    )
+
+
 @dataclass
 class ProcessingStatistics:
     """A value object representing a statistics for a batch of processed files"""
@@ -6,6 +6,8 @@ import datetime
 import json
 import logging
 from abc import ABC, abstractmethod
+from dataclasses import dataclass
+from functools import cached_property
 from typing import Any
 
 logger = logging.getLogger(__name__)
@@ -14,6 +16,10 @@ logger = logging.getLogger(__name__)
 class BaseSierraResponse(ABC):
     """An abstract domain model that represents bib data returned from Sierra.
 
+    Responses are read-only. Concrete implementations index the record's MARC
+    fields by tag the first time they are needed and cache derived attributes so
+    that each field is only scanned once per response.
+
     Attributes:
         library:
             The library to whom the record belongs as a str.
@@ -113,11 +119,78 @@ class BaseSierraResponse(ABC):
     @abstractmethod
     def var_fields(self) -> list[dict[str, Any]]: ...  # pragma: no branch
 
+    def to_candidate(self) -> SierraCandidate:
+        """Extract the attributes used to review matches as a `SierraCandidate`."""
+        return SierraCandidate(
+            bib_id=self.bib_id,
+            branch_call_number=self.branch_call_number,
+            cat_source=self.cat_source,
+            collection=self.collection,
+            library=self.library,
+            research_call_number=self.research_call_number,
+            title=self.title,
+            update_datetime=self.update_datetime,
+        )
+
+
+@dataclass(frozen=True, slots=True)
+class SierraCandidate:
+    """A compact, read-only representation of a candidate match from Sierra.
+
+    Holds only the attributes that the match analyzers need so that the raw
+    response data can be released once a candidate has been parsed.
+
+    Attributes:
+        bib_id:
+            The record's sierra bib ID as a string.
+        branch_call_number:
+            The branch call number for the record as a string, if present.
+        cat_source:
+            The source of cataloging as a string.
+        collection:
+            The collection to whom the record belongs as a str, if appropriate.
+        library:
+            The library to whom the record belongs as a str.
+        research_call_number:
+            The research call number for the record as a list of strings.
+        title:
+            The title associated with the record as a string.
+        update_datetime:
+            The date the record was last updated as a datetime.datetime object.
+    """
+
+    bib_id: str
+    branch_call_number: str | None
+    cat_source: str
+    collection: str | None
+    library: str
+    research_call_number: list[str]
+    title: str
+    update_datetime: datetime.datetime | None
+
 
 class BPLSolrResponse(BaseSierraResponse):
     library = "bpl"
 
-    @property
+    @cached_property
+    def _fields_by_tag(self) -> dict[str, list[dict[str, Any]]]:
+        """Index of the record's MARC data fields by tag, built on first access."""
+        index: dict[str, list[dict[str, Any]]] = {}
+        for field in self.var_fields:
+            index.setdefault(field["marc_tag"], []).append(field)
+        return index
+
+    def _get_subfields(self, tags: list[str], code: str) -> list[str]:
+        """Get the values of a subfield in all fields with the given tags."""
+        return [
+            subfield["content"]
+            for tag in tags
+            for field in self._fields_by_tag.get(tag, [])
+            for subfield in field["subfields"]
+            if subfield["tag"] == code
+        ]
+
+    @cached_property
     def barcodes(self) -> list[str]:
         item_data = self._data.get("sm_item_data", [])
         items = []
@@ -126,9 +199,9 @@ class BPLSolrResponse(BaseSierraResponse):
             items.append(parsed_item.get("barcode"))
         return items
 
-    @property
+    @cached_property
     def branch_call_number(self) -> str | None:
-        tag_099 = [i for i in self.var_fields if i["marc_tag"] == "099"]
+        tag_099 = self._fields_by_tag.get("099", [])
         call_nos = [" ".join(i["content"] for i in j["subfields"]) for j in tag_099]
         call_nos.append(self._data.get("call_number", ""))
         all_call_nos = list(set([i for i in call_nos if i]))
@@ -136,7 +209,7 @@ class BPLSolrResponse(BaseSierraResponse):
             return all_call_nos[0]
         return None
 
-    @property
+    @cached_property
     def cat_source(self) -> str:
         cat_source = "vendor"
         tag_001 = self._data.get("ss_marc_tag_001")
@@ -153,27 +226,15 @@ class BPLSolrResponse(BaseSierraResponse):
     def control_number(self) -> str | None:
         return self._data.get("ss_marc_tag_001")
 
-    @property
+    @cached_property
     def isbn(self) -> list[str]:
-        isbns = [
-            subfield["content"]
-            for j in self.var_fields
-            if j["marc_tag"] == "020"
-            for subfield in j["subfields"]
-            if subfield["tag"] == "a"
-        ]
+        isbns = self._get_subfields(["020"], "a")
         isbns.extend(self._data.get("isbn", []))
         return list(set([i for i in isbns if i]))
 
-    @property
+    @cached_property
     def oclc_number(self) -> list[str]:
-        oclc_nums = [
-            subfield["content"]
-            for j in self.var_fields
-            if j["marc_tag"] == "035"
-            for subfield in j["subfields"]
-            if subfield["tag"] == "a"
-        ]
+        oclc_nums = self._get_subfields(["035"], "a")
         oclc_nums.append(self._data.get("ss_marc_tag_001"))
         return list(set([i for i in oclc_nums if i]))
 
@@ -181,28 +242,22 @@ class BPLSolrResponse(BaseSierraResponse):
     def research_call_number(self) -> list[str]:
         return []
 
-    @property
+    @cached_property
     def upc(self) -> list[str]:
-        upcs = [
-            subfield["content"]
-            for j in self.var_fields
-            if j["marc_tag"] in ["024", "028"]
-            for subfield in j["subfields"]
-            if subfield["tag"] == "a"
-        ]
+        upcs = self._get_subfields(["024", "028"], "a")
         return list(set([i for i in upcs if i]))
 
     @property
     def update_date(self) -> str | None:
         return self._data.get("ss_marc_tag_005")
 
-    @property
+    @cached_property
     def update_datetime(self) -> datetime.datetime | None:
         if self.update_date:
             return datetime.datetime.strptime(self.update_date, "%Y%m%d%H%M%S.%f")
         return None
 
-    @property
+    @cached_property
     def var_fields(self) -> list[dict[str, Any]]:
         var_fields: list[dict[str, Any]] = []
         for field in self._data.get("sm_bib_varfields", []):
@@ -223,43 +278,49 @@ class BPLSolrResponse(BaseSierraResponse):
 class NYPLPlatformResponse(BaseSierraResponse):
     library = "nypl"
 
+    @cached_property
+    def _fields_by_tag(self) -> dict[str, list[dict[str, Any]]]:
+        """Index of the record's MARC data fields by tag, built on first access."""
+        index: dict[str, list[dict[str, Any]]] = {}
+        for field in self.var_fields:
+            index.setdefault(field.get("marcTag"), []).append(field)
+        return index
+
+    def _get_subfields(self, tags: list[str], code: str) -> list[str]:
+        """Get the values of a subfield in all fields with the given tags."""
+        return [
+            subfield["content"]
+            for tag in tags
+            for field in self._fields_by_tag.get(tag, [])
+            for subfield in field["subfields"]
+            if subfield["tag"] == code
+        ]
+
     @property
     def barcodes(self) -> list[str]:
         return []
 
-    @property
+    @cached_property
     def branch_call_number(self) -> str | None:
-        tag_091 = [i for i in self.var_fields if i["marcTag"] == "091"]
+        tag_091 = self._fields_by_tag.get("091", [])
         call_no = [" ".join(i["content"] for i in j["subfields"]) for j in tag_091]
         if call_no:
             return call_no[0]
         return None
 
-    @property
+    @cached_property
     def cat_source(self) -> str:
         cat_source = "vendor"
-        tag_901_b = [
-            subfield["content"]
-            for j in self.var_fields
-            if j["marcTag"] == "901"
-            for subfield in j["subfields"]
-            if subfield["tag"] == "b"
-        ]
+        tag_901_b = self._get_subfields(["901"], "b")
         if any(["CAT" in i for i in tag_901_b]):
             cat_source = "inhouse"
         return cat_source
 
-    @property
+    @cached_property
     def collection(self) -> str | None:
         branch = False
         research = False
-        collections = [
-            subfield["content"]
-            for j in self.var_fields
-            if j["marcTag"] == "910"
-            for subfield in j["subfields"]
-            if subfield["tag"] == "a"
-        ]
+        collections = self._get_subfields(["910"], "a")
         if "BL" in collections:
             branch = True
         if "RL" in collections:
@@ -268,28 +329,12 @@ class NYPLPlatformResponse(BaseSierraResponse):
             branch = True
         if self.research_call_number:
             research = True
-        locations = [i.get("code") for i in self._data.get("locations", [])]
-        for loc in locations:
-            if len(loc) < 3:
-                continue
-            if loc == "zzzzz":
-                branch = True
-            elif loc == "xxx":
-                research = True
-            elif loc in ["myd", "myh", "mym", "myt"]:
-                research = True
-            elif loc[:2] == "my" and loc not in ["myd", "myh", "mym", "myt"]:
-                branch = True
-            elif loc[:2] == "sc":
-                research = True
-            elif loc[:3] == "maj":
+        for location in self._data.get("locations", []):
+            location_collection = classify_nypl_location(location.get("code"))
+            if location_collection == "BL":
                 branch = True
-            elif loc[:2] == "ma" and loc[:3] != "maj":
-                research = True
-            elif loc[:3] in ["lsx", "lsd"]:
+            elif location_collection == "RL":
                 research = True
-            elif loc[:2] in NYPL_BRANCHES.keys():
-                branch = True
         if branch and research:
             return "MIXED"
         elif branch and not research:
@@ -303,53 +348,33 @@ class NYPLPlatformResponse(BaseSierraResponse):
     def control_number(self) -> str | None:
         return self._data.get("controlNumber")
 
-    @property
+    @cached_property
     def isbn(self) -> list[str]:
-        isbns = [
-            subfield["content"]
-            for j in self.var_fields
-            if j["marcTag"] == "020"
-            for subfield in j["subfields"]
-            if subfield["tag"] == "a"
-        ]
+        isbns = self._get_subfields(["020"], "a")
         isbns.extend(self._data.get("standardNumbers", []))
         return list(set(isbns))
 
-    @property
+    @cached_property
     def oclc_number(self) -> list[str]:
-        oclcs = [
-            subfield["content"]
-            for j in self.var_fields
-            if j["marcTag"] == "035"
-            for subfield in j["subfields"]
-            if subfield["tag"] == "a"
-        ]
+        oclcs = self._get_subfields(["035"], "a")
         oclcs.append(self._data.get("controlNumber"))
         return list(set([i for i in oclcs if i]))
 
-    @property
+    @cached_property
     def research_call_number(self) -> list[str]:
-        tag_852 = [
-            i for i in self.var_fields if i["marcTag"] == "852" and i["ind1"] == "8"
-        ]
+        tag_852 = [i for i in self._fields_by_tag.get("852", []) if i["ind1"] == "8"]
         return [" ".join(i["content"] for i in j["subfields"]) for j in tag_852]
 
-    @property
+    @cached_property
     def upc(self) -> list[str]:
-        upcs = [
-            subfield["content"]
-            for j in self.var_fields
-            if j["marcTag"] in ["024", "028"]
-            for subfield in j["subfields"]
-            if subfield["tag"] == "a"
-        ]
+        upcs = self._get_subfields(["024", "028"], "a")
         return list(set([i for i in upcs if i]))
 
     @property
     def update_date(self) -> str | None:
         return self._data.get("updatedDate")
 
-    @property
+    @cached_property
     def update_datetime(self) -> datetime.datetime | None:
         if self.update_date:
             return datetime.datetime.strptime(self.update_date, "%Y-%m-%dT%H:%M:%S")
@@ -459,6 +484,48 @@ NYPL_BRANCHES = {
     "ls": "Library Services Center",
 }
 
+# Collections of NYPL location codes. Exact codes take precedence over the
+# three-character prefixes, which take precedence over the two-character prefixes.
+_NYPL_LOCATION_CODES = {
+    "zzzzz": "BL",
+    "xxx": "RL",
+    "myd": "RL",
+    "myh": "RL",
+    "mym": "RL",
+    "myt": "RL",
+}
+_NYPL_LOCATION_PREFIXES = {
+    **{code: "BL" for code in NYPL_BRANCHES},
+    "my": "BL",
+    "sc": "RL",
+    "ma": "RL",
+    "maj": "BL",
+    "lsx": "RL",
+    "lsd": "RL",
+}
+
+
+def classify_nypl_location(code: str) -> str | None:
+    """
+    Determine the collection an NYPL location code belongs to.
+
+    Args:
+        code: a Sierra location code (eg. "myd" or "agj0n").
+
+    Returns:
+        "BL" for branch locations, "RL" for research locations, or None if the
+        location does not identify a collection.
+    """
+    if len(code) < 3:
+        return None
+    collection = _NYPL_LOCATION_CODES.get(code)
+    if collection is None:
+        collection = _NYPL_LOCATION_PREFIXES.get(code[:3])
+    if collection is None:
+        collection = _NYPL_LOCATION_PREFIXES.get(code[:2])
+    return collection
+
+
 BPL_BRANCHES = {
     "02": "Central Juv Children's Room",
     "03": "Central YA Young Teens",
@@ -0,0 +1,461 @@
+"""Adapter module defining asynchronous classes used to fetch bib records from Sierra.
+
+Includes a session that sends the queries built by the `bookops_bpl_solr` and
+`bookops_nypl_platform` sessions with `httpx2.AsyncClient` and a fetcher that runs
+these queries on a single event loop. Connections use HTTP/2 so that many queries
+can be multiplexed over one connection.
+
+Protocols:
+
+`AsyncSierraSessionProtocol`
+    Abstracts methods required for an asynchronous Sierra-compatible session.
+
+Classes:
+
+`AsyncSierraSession`
+    concrete implementation of `AsyncSierraSessionProtocol` that wraps a
+    `clients.SierraSessionProtocol` session.
+`AsyncSierraBibFetcher`
+    fetches bib records from Sierra concurrently. Implements the `BibFetcher`
+    and `ConcurrentBibFetcher` protocols by running its queries on an event loop
+    in a background thread.
+`EventLoopThread`
+    runs an asyncio event loop in a daemon thread.
+`RequestPreparer`
+    a `requests` transport adapter that returns requests rather than sending them.
+"""
+
+from __future__ import annotations
+
+import asyncio
+import logging
+import threading
+from typing import (
+    TYPE_CHECKING,
+    Any,
+    Awaitable,
+    Callable,
+    Coroutine,
+    Protocol,
+    Sequence,
+    TypeVar,
+    runtime_checkable,
+)
+
+import httpx2
+import requests
+from requests.adapters import BaseAdapter
+
+from . import throttling
+
+if TYPE_CHECKING:  # pragma: no cover
+    from .clients import SierraSessionProtocol
+
+logger = logging.getLogger(__name__)
+
+HOP_BY_HOP_HEADERS = frozenset(
+    ["connection", "content-length", "host", "keep-alive", "transfer-encoding"]
+)
+
+RETRY_EXCEPTIONS = (
+    httpx2.TimeoutException,
+    httpx2.NetworkError,
+    httpx2.RemoteProtocolError,
+)
+
+R = TypeVar("R")  # variable for the result of a coroutine
+
+
+class EventLoopThread:
+    """Runs an asyncio event loop in a daemon thread."""
+
+    def __init__(self) -> None:
+        self.loop = asyncio.new_event_loop()
+        self._thread = threading.Thread(
+            target=self.loop.run_forever, name="sierra-event-loop", daemon=True
+        )
+        self._thread.start()
+
+    def run(self, coro: Coroutine[Any, Any, R]) -> R:
+        """Run a coroutine on the event loop and wait for its result."""
+        return asyncio.run_coroutine_threadsafe(coro, self.loop).result()
+
+    def close(self) -> None:
+        """Stop the event loop and wait for its thread to finish."""
+        if self.loop.is_closed():
+            return None
+        self.loop.call_soon_threadsafe(self.loop.stop)
+        self._thread.join()
+        self.loop.close()
+
+
+class RequestPreparer(BaseAdapter):
+    """
+    A `requests` transport adapter that returns requests instead of sending them.
+
+    When mounted on a `bookops` session the session's search methods return a
+    response whose `request` is the fully prepared query, including its url,
+    parameters and credentials, without contacting the service.
+    """
+
+    def send(
+        self,
+        request: requests.PreparedRequest,
+        stream: bool = False,
+        timeout: Any = None,
+        verify: Any = True,
+        cert: Any = None,
+        proxies: Any = None,
+    ) -> requests.Response:
+        response = requests.Response()
+        response.status_code = 200
+        response._content = b"{}"
+        response.request = request
+        response.url = request.url or ""
+        return response
+
+    def close(self) -> None:
+        return None
+
+
+@runtime_checkable
+class AsyncSierraSessionProtocol(Protocol):
+    """
+    Protocol for asynchronous Sierra-compatible sessions.
+
+    Mirrors `clients.SierraSessionProtocol` with coroutine search methods.
+    """
+
+    client: httpx2.AsyncClient
+    batch_matchpoints: tuple[str, ...]
+    batch_limit: int
+
+    async def _get_bibs_by_bib_id(
+        self, value: str | int
+    ) -> httpx2.Response: ...  # pragma: no branch
+    async def _get_bibs_by_isbn(
+        self, value: str | int
+    ) -> httpx2.Response: ...  # pragma: no branch
+    async def _get_bibs_by_issn(
+        self, value: str | int
+    ) -> httpx2.Response: ...  # pragma: no branch
+    async def _get_bibs_by_control_number(
+        self, value: str | int
+    ) -> httpx2.Response: ...  # pragma: no branch
+    async def _get_bibs_by_upc(
+        self, value: str | int
+    ) -> httpx2.Response: ...  # pragma: no branch
+    async def _get_bibs_by_values(
+        self, values: list[str], key: str
+    ) -> httpx2.Response: ...  # pragma: no branch
+    def _parse_response(
+        self, response: httpx2.Response
+    ) -> list[dict[str, Any]]: ...  # pragma: no branch
+    def _get_ids(
+        self, bib: dict[str, Any], key: str
+    ) -> list[str]: ...  # pragma: no branch
+    def _prep_sierra_number(self, id: str | int) -> str: ...  # pragma: no branch
+    async def aclose(self) -> None: ...  # pragma: no branch
+
+
+class AsyncSierraSession:
+    """
+    Sends the queries of a Sierra session asynchronously with `httpx2.AsyncClient`.
+
+    Queries are built, and responses are parsed, by the `BPLSolrSession` or
+    `NYPLPlatformSession` that is wrapped so that the asynchronous fetcher sends
+    the same parameters and filters as `SierraBibFetcher` and returns the same
+    candidates. The wrapped session's credentials are refreshed before each query
+    is built. The wrapped session is only used to build queries and should not be
+    shared with a `SierraBibFetcher`.
+    """
+
+    def __init__(
+        self,
+        session: SierraSessionProtocol,
+        transport: httpx2.AsyncBaseTransport | None = None,
+    ) -> None:
+        """
+        Initialize the session.
+
+        Args:
+            session:
+                the `BPLSolrSession` or `NYPLPlatformSession` used to build queries
+                and parse responses.
+            transport: an optional transport to use in place of the network.
+
+        Raises:
+            TypeError: if `session` is not a `requests.Session`.
+        """
+        if not isinstance(session, requests.Session):
+            raise TypeError("Asynchronous sessions must wrap a `requests.Session`.")
+        session.mount("http://", RequestPreparer())
+        session.mount("https://", RequestPreparer())
+        self.session = session
+        self.batch_matchpoints: tuple[str, ...] = session.batch_matchpoints
+        self.batch_limit: int = session.batch_limit
+        self.client = httpx2.AsyncClient(
+            http2=True,
+            limits=httpx2.Limits(max_connections=20, max_keepalive_connections=20),
+            timeout=httpx2.Timeout(10.0),
+            transport=transport,
+        )
+
+    async def _send(
+        self, method: Callable[..., requests.Response], *args: Any
+    ) -> httpx2.Response:
+        """
+        Build a query with the wrapped session and send it with `httpx2`.
+
+        The wrapped session refreshes its credentials with a blocking request, so
+        the refresh is run in a worker thread to keep the event loop free for
+        other queries.
+        """
+        await asyncio.to_thread(self.session._refresh_credentials)
+        request = method(*args).request
+        headers = {
+            k: v
+            for k, v in request.headers.items()
+            if k.casefold() not in HOP_BY_HOP_HEADERS
+        }
+        response = await self.client.request(
+            request.method or "GET",
+            request.url or "",
+            headers=headers,
+            content=request.body,
+        )
+        if response.is_error and response.status_code != 404:
+            response.raise_for_status()
+        return response
+
+    async def _get_bibs_by_bib_id(self, value: str | int) -> httpx2.Response:
+        return await self._send(self.session._get_bibs_by_bib_id, value)
+
+    async def _get_bibs_by_isbn(self, value: str | int) -> httpx2.Response:
+        return await self._send(self.session._get_bibs_by_isbn, value)
+
+    async def _get_bibs_by_issn(self, value: str | int) -> httpx2.Response:
+        return await self._send(self.session._get_bibs_by_issn, value)
+
+    async def _get_bibs_by_control_number(self, value: str | int) -> httpx2.Response:
+        return await self._send(self.session._get_bibs_by_control_number, value)
+
+    async def _get_bibs_by_upc(self, value: str | int) -> httpx2.Response:
+        return await self._send(self.session._get_bibs_by_upc, value)
+
+    async def _get_bibs_by_values(self, values: list[str], key: str) -> httpx2.Response:
+        return await self._send(self.session._get_bibs_by_values, values, key)
+
+    def _parse_response(self, response: httpx2.Response) -> list[dict[str, Any]]:
+        """Parse a response with the wrapped session."""
+        if response.status_code == 404:
+            logger.info(f"Sierra Session response code: {response.status_code}.")
+            return []
+        return self.session._parse_response(response)  # type: ignore[arg-type]
+
+    def _get_ids(self, bib: dict[str, Any], key: str) -> list[str]:
+        return self.session._get_ids(bib, key)
+
+    def _prep_sierra_number(self, id: str | int) -> str:
+        return self.session._prep_sierra_number(id)
+
+    async def aclose(self) -> None:
+        """Close the session's HTTP client and the wrapped session."""
+        await self.client.aclose()
+        self.session.close()
+
+
+class AsyncSierraBibFetcher:
+    """
+    Fetches bibliographic records from Sierra using an asynchronous session.
+
+    All queries run on one event loop so that a large number of lookups can be in
+    flight at once without a thread per request. The number of concurrent queries
+    is bounded by `max_in_flight`. This class is a concrete implementation of the
+    `BibFetcher` and `ConcurrentBibFetcher` protocols.
+    """
+
+    def __init__(
+        self,
+        session: AsyncSierraSessionProtocol,
+        max_in_flight: int = 100,
+        runner: EventLoopThread | None = None,
+        throttle: throttling.Throttle | None = None,
+    ) -> None:
+        """
+        Initialize an `AsyncSierraBibFetcher`.
+
+        Args:
+            session:
+                an `AsyncSierraSessionProtocol` instance to be used to query Sierra.
+            max_in_flight:
+                the maximum number of queries to run concurrently.
+            runner:
+                the `EventLoopThread` on which to run queries. A new runner is
+                created if one is not passed. A runner that is passed, and the
+                session it is passed with, are owned by the caller (e.g. a
+                `SierraSessionPool`) and are not closed by `close`.
+            throttle:
+                an optional `Throttle` used to pace queries and retry queries
+                that are throttled by or fail transiently in Sierra.
+        """
+        self.session = session
+        self.throttle = throttle
+        self.max_in_flight = max_in_flight
+        self.runner = runner or EventLoopThread()
+        self._owns_runner = runner is None
+        self._semaphore: asyncio.Semaphore | None = None
+
+    def _get_match_methods(
+        self,
+    ) -> dict[str, Callable[[str | int], Awaitable[httpx2.Response]]]:
+        """Map each supported matchpoint to the session method used to query it."""
+        return {
+            "bib_id": self.session._get_bibs_by_bib_id,
+            "control_number": self.session._get_bibs_by_control_number,
+            "isbn": self.session._get_bibs_by_isbn,
+            "issn": self.session._get_bibs_by_issn,
+            "upc": self.session._get_bibs_by_upc,
+        }
+
+    def _validate_matchpoint(self, key: str) -> None:
+        """Raise a `ValueError` if `key` is not a supported matchpoint."""
+        match_methods = self._get_match_methods()
+        if key not in match_methods:
+            logger.error(f"Unsupported query matchpoint: '{key}'")
+            raise ValueError(
+                f"Invalid matchpoint: '{key}'. Available matchpoints are: "
+                f"{sorted(match_methods)}"
+            )
+
+    def _normalize_id(self, value: str | int, key: str) -> str:
+        """Normalize an identifier so query values can be compared to responses."""
+        if key == "bib_id":
+            return self.session._prep_sierra_number(value)
+        return str(value).replace("-", "").replace(" ", "").casefold()
+
+    async def _query(
+        self, method: Callable[..., Awaitable[httpx2.Response]], *args: Any
+    ) -> list[dict[str, Any]]:
+        if self._semaphore is None:
+            self._semaphore = asyncio.Semaphore(self.max_in_flight)
+        async with self._semaphore:
+            try:
+                if self.throttle is None:
+                    response = await method(*args)
+                else:
+                    response = await self.throttle.acall(lambda: method(*args))
+            except (httpx2.HTTPError, throttling.RetryError) as exc:
+                logger.error(f"{exc.__class__.__name__} while running Sierra queries. ")
+                raise
+        return self.session._parse_response(response)
+
+    async def aget_bibs_by_id(
+        self, value: str | int | None, key: str
+    ) -> list[dict[str, Any]]:
+        """
+        Retrieves bib records by a specific matchpoint (e.g., isbn, control_number)
+
+        Args:
+            value: identifier to search by.
+            key: name of identifier (e.g., 'isbn', 'bib_id').
+
+        Returns:
+            list of responses formatted as `BaseSierraResponse` objects.
+        """
+        self._validate_matchpoint(key)
+        if value is None:
+            logger.debug(f"Skipping Sierra query on {key} with missing value.")
+            return []
+        logger.debug(
+            f"Querying Sierra with {self.session.__class__.__name__} "
+            f"on {key} with value: {value}."
+        )
+        return await self._query(self._get_match_methods()[key], value)
+
+    async def aget_bibs_by_ids(
+        self, values: Sequence[str | int], key: str
+    ) -> dict[str, list[dict[str, Any]]]:
+        """
+        Retrieves bib records for multiple values of a single matchpoint.
+
+        Behaves like `SierraBibFetcher.get_bibs_by_ids`: values are sent in one
+        query and the candidates are redistributed to the values they match.
+
+        Args:
+            values: identifiers to search by.
+            key: name of identifier (e.g., 'isbn', 'bib_id').
+
+        Returns:
+            a dictionary mapping each value (as a string) to its list of responses.
+        """
+        self._validate_matchpoint(key)
+        unique_values = list(dict.fromkeys(str(i) for i in values if i is not None))
+        if len(unique_values) < 2 or key not in self.session.batch_matchpoints:
+            results = await asyncio.gather(
+                *[self.aget_bibs_by_id(value=i, key=key) for i in unique_values]
+            )
+            return dict(zip(unique_values, results))
+        logger.debug(
+            f"Querying Sierra with {self.session.__class__.__name__} "
+            f"on {key} with {len(unique_values)} values: {unique_values}."
+        )
+        bibs = await self._query(self.session._get_bibs_by_values, unique_values, key)
+        normalized = {self._normalize_id(i, key): i for i in unique_values}
+        out: dict[str, list[dict[str, Any]]] = {i: [] for i in unique_values}
+        unattributed = False
+        for bib in bibs:
+            ids = [self._normalize_id(i, key) for i in self.session._get_ids(bib, key)]
+            matched_values = {normalized[i] for i in ids if i in normalized}
+            if not matched_values:
+                unattributed = True
+            for value in matched_values:
+                out[value].append(bib)
+        if unattributed or len(bibs) >= self.session.batch_limit:
+            logger.debug(
+                f"Batch query on {key} could not be fully redistributed. "
+                "Querying each value individually."
+            )
+            results = await asyncio.gather(
+                *[self.aget_bibs_by_id(value=i, key=key) for i in unique_values]
+            )
+            return dict(zip(unique_values, results))
+        return out
+
+    def get_bibs_by_id(self, value: str | int, key: str) -> list[dict[str, Any]]:
+        """Synchronous wrapper around `aget_bibs_by_id`."""
+        return self.runner.run(self.aget_bibs_by_id(value=value, key=key))
+
+    def get_bibs_by_ids(
+        self, values: Sequence[str | int], key: str
+    ) -> dict[str, list[dict[str, Any]]]:
+        """Synchronous wrapper around `aget_bibs_by_ids`."""
+        return self.runner.run(self.aget_bibs_by_ids(values=values, key=key))
+
+    def get_bibs_by_ids_many(
+        self, queries: Sequence[tuple[Sequence[str | int], str]]
+    ) -> list[dict[str, list[dict[str, Any]]]]:
+        """
+        Run several multi-value queries concurrently on the event loop.
+
+        Args:
+            queries: a sequence of `(values, key)` tuples.
+
+        Returns:
+            a list containing the output of `get_bibs_by_ids` for each query in
+            the same order as `queries`.
+        """
+
+        async def gather() -> list[dict[str, list[dict[str, Any]]]]:
+            return await asyncio.gather(
+                *[self.aget_bibs_by_ids(values=v, key=k) for v, k in queries]
+            )
+
+        return self.runner.run(gather())
+
+    def close(self) -> None:
+        """Close the session and stop the event loop if owned by the fetcher."""
+        if not self._owns_runner:
+            return None
+        self.runner.run(self.session.aclose())
+        self.runner.close()
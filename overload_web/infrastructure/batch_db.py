@@ -6,12 +6,20 @@ Classes:
     `SQLModel` implementation of `SqlRepositoryProtocol` for managing
     `PVFBatch` objects in a SQL database.
 
+`PVFJobRepository`
+    `SQLModel` implementation of `JobRepositoryProtocol` for managing
+    `PVFJob` objects in a SQL database.
+
 Models:
 
 `PVFBatch`
     A pydantic/sqlmodel model that defines a batch containing one or more MARC files
     and their associated processing statistics.
 
+`PVFJob`
+    A pydantic/sqlmodel model that defines a background job that processes a batch
+    of MARC files.
+
 `PVFReportModel`
     A pydantic/sqlmodel model that defines processing statistics for a process vendor
     file workflow.
@@ -20,10 +28,11 @@ Models:
     A pydantic/sqlmodel model that defines a processed MARC file.
 """
 
+import datetime
 import logging
-from typing import Any
+from typing import Any, Sequence
 
-from sqlmodel import JSON, Column, Field, Relationship, Session, SQLModel
+from sqlmodel import JSON, Column, Field, Relationship, Session, SQLModel, col, select
 
 logger = logging.getLogger(__name__)
 
@@ -47,6 +56,24 @@ class PVFBatch(SQLModel, table=True):
     )
 
 
+class PVFJob(SQLModel, table=True):
+    """
+    A table model representing a background job that runs a single
+    `ProcessAcquisitionsRecords`, `ProcessCatalogingRecords`, or
+    `ProcessSelectionRecords` command.
+    """
+
+    __tablename__ = "jobs"
+
+    id: str = Field(primary_key=True, index=True)
+    record_type: str = Field(nullable=False)
+    status: str = Field(nullable=False, index=True)
+    batch_id: int | None = Field(default=None, foreign_key="batches.id")
+    error: str | None = Field(default=None)
+    created_at: datetime.datetime = Field(nullable=False)
+    updated_at: datetime.datetime | None = Field(default=None)
+
+
 class PVFReportModel(SQLModel, table=True):
     """A table model representing a batch of processing statistics."""
 
@@ -83,6 +110,7 @@ class ProcessedFileModel(SQLModel, table=True):
     id: int | None = Field(default=None, primary_key=True, index=True, exclude=True)
     file_name: str = Field(nullable=False, index=True)
     records: bytes = Field(nullable=False)
+    reference: str | None = Field(default=None)
 
     batch_id: int = Field(default=None, foreign_key="batches.id", exclude=True)
     batch: PVFBatch = Relationship(back_populates="files")
@@ -139,3 +167,87 @@ class PVFBatchRepository:
         self.session.commit()
         self.session.refresh(valid_batch)
         return valid_batch.model_dump()
+
+
+class PVFJobRepository:
+    """
+    `SQLModel` repository for `PVFJob` objects.
+
+    This class is a concrete implementation of the `JobRepositoryProtocol` protocol.
+
+    Args:
+        session: a `sqlmodel.Session`.
+    """
+
+    def __init__(self, session: Session) -> None:
+        self.session = session
+
+    def list_by_status(self, statuses: Sequence[str]) -> list[dict[str, Any]]:
+        """
+        Retrieve all `PVFJob` objects that have one of a number of statuses.
+
+        Args:
+            statuses: the statuses to search for (eg. `queued`, `running`).
+
+        Returns:
+            a list of `PVFJob` instances as dictionaries ordered by creation date.
+        """
+        statement = (
+            select(PVFJob)
+            .where(col(PVFJob.status).in_(statuses))
+            .order_by(col(PVFJob.created_at))
+        )
+        return [i.model_dump() for i in self.session.exec(statement).all()]
+
+    def get(self, id: str) -> dict[str, Any] | None:
+        """
+        Retrieve a `PVFJob` object by its ID.
+
+        Args:
+            id: the primary key of the `PVFJob`.
+
+        Returns:
+            a `PVFJob` instance as a dictionary or `None` if not found.
+        """
+        job = self.session.get(PVFJob, id)
+        if job:
+            return job.model_dump()
+        return None
+
+    def save(self, obj: Any) -> dict[str, Any]:
+        """
+        Adds a new `PVFJob` to the database.
+
+        Args:
+            obj: the `ProcessingJob` object to save.
+
+        Returns:
+            The `PVFJob` data as a dictionary.
+        """
+        valid_obj = PVFJob.model_validate(obj, from_attributes=True)
+        self.session.add(valid_obj)
+        self.session.commit()
+        self.session.refresh(valid_obj)
+        return valid_obj.model_dump()
+
+    def update(self, id: str, data: dict[str, Any]) -> dict[str, Any] | None:
+        """
+        Update the status of an existing `PVFJob`.
+
+        Args:
+            id: the primary key of the `PVFJob`.
+            data: a dictionary of the fields to update (eg. `status`).
+
+        Returns:
+            The updated `PVFJob` data as a dictionary or `None` if not found.
+        """
+        job = self.session.get(PVFJob, id)
+        if not job:
+            return None
+        job.sqlmodel_update(
+            {**data, "updated_at": datetime.datetime.now(datetime.timezone.utc)}
+        )
+        self.session.add(job)
+        self.session.commit()
+        self.session.refresh(job)
+        return job.model_dump()
@@ -0,0 +1,308 @@
+"""In-memory caching of Sierra candidate lookups.
+
+Vendors frequently send the same identifiers in files that are processed minutes
+apart and files are often reprocessed after a template has been corrected. This
+module provides a bounded, thread-safe cache with a per-entry time-to-live and a
+`BibFetcher` implementation that wraps a `SierraBibFetcher` so that repeated
+lookups of the same identifier are served from memory while they are fresh.
+
+Classes:
+
+`TTLCache`
+    A thread-safe least-recently-used cache whose entries expire after a
+    configurable number of seconds. Tracks hits and misses.
+
+`CachedSierraBibFetcher`
+    A `BibFetcher` that caches the responses of a wrapped `SierraBibFetcher`
+    keyed on library, matchpoint, and normalized identifier.
+
+`CachedConcurrentBibFetcher`
+    A `CachedSierraBibFetcher` for fetchers that can run many queries
+    concurrently (eg. `AsyncSierraBibFetcher`).
+"""
+
+from __future__ import annotations
+
+import logging
+import threading
+import time
+from collections import OrderedDict
+from typing import Any, Callable, Hashable, Sequence
+
+from overload_web.infrastructure import async_clients, clients
+
+logger = logging.getLogger(__name__)
+
+
+class TTLCache:
+    """
+    A bounded least-recently-used cache whose entries expire after `ttl` seconds.
+
+    All operations are protected by a lock so a single cache can be shared by the
+    worker threads used when matching a batch of records.
+    """
+
+    def __init__(
+        self,
+        maxsize: int = 10_000,
+        ttl: float = 3600.0,
+        timer: Callable[[], float] = time.monotonic,
+    ) -> None:
+        """
+        Initialize the cache.
+
+        Args:
+            maxsize:
+                The maximum number of entries to keep. When the cache is full the
+                least recently used entry is evicted.
+            ttl:
+                The number of seconds an entry is considered fresh.
+            timer:
+                A function that returns the current time in seconds.
+
+        Raises:
+            ValueError: if `maxsize` is less than 1 or `ttl` is not positive.
+        """
+        if maxsize < 1:
+            raise ValueError("`maxsize` must be greater than or equal to 1.")
+        if ttl <= 0:
+            raise ValueError("`ttl` must be greater than 0.")
+        self.maxsize = maxsize
+        self.ttl = ttl
+        self.hits = 0
+        self.misses = 0
+        self._timer = timer
+        self._data: OrderedDict[Hashable, tuple[float, Any]] = OrderedDict()
+        self._lock = threading.Lock()
+
+    def __contains__(self, key: Hashable) -> bool:
+        with self._lock:
+            entry = self._data.get(key)
+            return entry is not None and entry[0] > self._timer()
+
+    def __len__(self) -> int:
+        with self._lock:
+            return len(self._data)
+
+    def get(self, key: Hashable, default: Any = None) -> Any:
+        """
+        Get a fresh value from the cache and mark it as recently used.
+
+        Args:
+            key: the key to look up.
+            default: the value to return if the key is missing or has expired.
+
+        Returns:
+            the cached value or `default`.
+        """
+        with self._lock:
+            entry = self._data.get(key)
+            if entry is None:
+                self.misses += 1
+                return default
+            if entry[0] <= self._timer():
+                del self._data[key]
+                self.misses += 1
+                return default
+            self._data.move_to_end(key)
+            self.hits += 1
+            return entry[1]
+
+    def set(self, key: Hashable, value: Any) -> None:
+        """
+        Add a value to the cache, evicting the least recently used entry if full.
+
+        Args:
+            key: the key to store the value under.
+            value: the value to store.
+        """
+        with self._lock:
+            self._data[key] = (self._timer() + self.ttl, value)
+            self._data.move_to_end(key)
+            while len(self._data) > self.maxsize:
+                self._data.popitem(last=False)
+
+    def invalidate(self, key: Hashable) -> None:
+        """Remove a single entry from the cache if it is present."""
+        with self._lock:
+            self._data.pop(key, None)
+
+    def clear(self) -> None:
+        """Remove all entries from the cache and reset the hit and miss counters."""
+        with self._lock:
+            self._data.clear()
+            self.hits = 0
+            self.misses = 0
+
+    @property
+    def stats(self) -> dict[str, int]:
+        """The number of hits, misses, and entries currently in the cache."""
+        with self._lock:
+            return {"hits": self.hits, "misses": self.misses, "size": len(self._data)}
+
+
+class CachedSierraBibFetcher:
+    """
+    Caches the candidates returned by a `SierraBibFetcher`.
+
+    Candidates are cached under a `(library, matchpoint, normalized value)` key
+    so that lookups of the same identifier written differently (eg. an ISBN with
+    or without hyphens) share an entry. Lookups that return no candidates are
+    cached as well. This class is a concrete implementation of the `BibFetcher`
+    protocol.
+    """
+
+    def __init__(
+        self,
+        fetcher: clients.SierraBibFetcher | async_clients.AsyncSierraBibFetcher,
+        cache: TTLCache,
+        library: str,
+    ) -> None:
+        """
+        Initialize `CachedSierraBibFetcher`.
+
+        Args:
+            fetcher: the fetcher used to query Sierra on a cache miss.
+            cache: the `TTLCache` in which to store candidates.
+            library: the library whose Sierra instance `fetcher` queries.
+        """
+        self.fetcher = fetcher
+        self.cache = cache
+        self.library = library
+
+    @classmethod
+    def wrap(
+        cls,
+        fetcher: clients.SierraBibFetcher | async_clients.AsyncSierraBibFetcher,
+        cache: TTLCache,
+        library: str,
+    ) -> CachedSierraBibFetcher:
+        """
+        Wrap a fetcher, preserving its ability to run queries concurrently.
+
+        Args:
+            fetcher: the fetcher used to query Sierra on a cache miss.
+            cache: the `TTLCache` in which to store candidates.
+            library: the library whose Sierra instance `fetcher` queries.
+
+        Returns:
+            a `CachedConcurrentBibFetcher` if `fetcher` is an
+            `AsyncSierraBibFetcher`, otherwise a `CachedSierraBibFetcher`.
+        """
+        if isinstance(fetcher, async_clients.AsyncSierraBibFetcher):
+            return CachedConcurrentBibFetcher(fetcher, cache=cache, library=library)
+        return CachedSierraBibFetcher(fetcher, cache=cache, library=library)
+
+    @property
+    def session(
+        self,
+    ) -> clients.SierraSessionProtocol | async_clients.AsyncSierraSessionProtocol:
+        """The session used by the wrapped fetcher."""
+        return self.fetcher.session
+
+    def _cache_key(self, value: str | int, key: str) -> tuple[str, str, str]:
+        return (self.library, key, self.fetcher._normalize_id(value, key))
+
+    def get_bibs_by_id(self, value: str | int, key: str) -> list[dict[str, Any]]:
+        """
+        Retrieves bib records by a specific matchpoint, using the cache if possible.
+
+        Args:
+            value: identifier to search by.
+            key: name of identifier (e.g., 'isbn', 'bib_id').
+
+        Returns:
+            list of responses formatted as `BaseSierraResponse` objects.
+        """
+        if value is None:
+            return self.fetcher.get_bibs_by_id(value=value, key=key)
+        cache_key = self._cache_key(value, key)
+        candidates = self.cache.get(cache_key)
+        if candidates is None:
+            candidates = self.fetcher.get_bibs_by_id(value=value, key=key)
+            self.cache.set(cache_key, candidates)
+        else:
+            logger.debug(f"Using cached Sierra response for {key}: {value}.")
+        return list(candidates)
+
+    def get_bibs_by_ids(
+        self, values: Sequence[str | int], key: str
+    ) -> dict[str, list[dict[str, Any]]]:
+        """
+        Retrieves bib records for multiple values of a single matchpoint.
+
+        Only the values that are not already in the cache are sent to Sierra.
+
+        Args:
+            values: identifiers to search by.
+            key: name of identifier (e.g., 'isbn', 'bib_id').
+
+        Returns:
+            a dictionary mapping each value (as a string) to its list of responses.
+        """
+        out: dict[str, list[dict[str, Any]]] = {}
+        missing = []
+        for value in dict.fromkeys(str(i) for i in values if i is not None):
+            candidates = self.cache.get(self._cache_key(value, key))
+            if candidates is None:
+                missing.append(value)
+            else:
+                out[value] = list(candidates)
+        if out:
+            logger.debug(f"Using cached Sierra responses for {len(out)} {key} values.")
+        if missing:
+            fetched = self.fetcher.get_bibs_by_ids(values=missing, key=key)
+            for value, candidates in fetched.items():
+                self.cache.set(self._cache_key(value, key), candidates)
+                out[value] = list(candidates)
+        return out
+
+    def invalidate(self, value: str | int, key: str) -> None:
+        """Remove the cached candidates for an identifier."""
+        self.cache.invalidate(self._cache_key(value, key))
+
+
+class CachedConcurrentBibFetcher(CachedSierraBibFetcher):
+    """
+    Caches the candidates returned by an `AsyncSierraBibFetcher`.
+
+    This class is a concrete implementation of the `ConcurrentBibFetcher`
+    protocol.
+    """
+
+    fetcher: async_clients.AsyncSierraBibFetcher
+
+    def get_bibs_by_ids_many(
+        self, queries: Sequence[tuple[Sequence[str | int], str]]
+    ) -> list[dict[str, list[dict[str, Any]]]]:
+        """
+        Run several multi-value queries, only sending uncached values to Sierra.
+
+        Args:
+            queries: a sequence of `(values, key)` tuples.
+
+        Returns:
+            a list containing a dictionary mapping each value to its candidates
+            for each query in the same order as `queries`.
+        """
+        out: list[dict[str, list[dict[str, Any]]]] = []
+        missing: list[tuple[list[str], str]] = []
+        for values, key in queries:
+            found: dict[str, list[dict[str, Any]]] = {}
+            uncached = []
+            for value in dict.fromkeys(str(i) for i in values if i is not None):
+                candidates = self.cache.get(self._cache_key(value, key))
+                if candidates is None:
+                    uncached.append(value)
+                else:
+                    found[value] = list(candidates)
+            out.append(found)
+            missing.append((uncached, key))
+        queried = [n for n, (values, _) in enumerate(missing) if values]
+        fetched = self.fetcher.get_bibs_by_ids_many([missing[n] for n in queried])
+        for n, response in zip(queried, fetched):
+            key = missing[n][1]
+            for value, candidates in response.items():
+                self.cache.set(self._cache_key(value, key), candidates)
+                out[n][value] = list(candidates)
+        return out
@@ -18,6 +18,9 @@ Classes:
     (i.e. `bpl` or `nypl`).
 `NYPLPlatformSession`
     concrete implementation of `SierraSessionProtocol` for `bookops_nypl_platform`
+`SierraSessionPool`
+    keeps one long-lived session per library so that connections and
+    credentials can be reused across requests.
 `SierraBibFetcher`
     fetches bib records from Sierra and converts them into `BaseSierraResponse` objects
     to be used in determining best match for a `DomainBib` object.
@@ -27,35 +30,229 @@ from __future__ import annotations
 
 import logging
 import os
-from typing import Any, Protocol, runtime_checkable
+import threading
+from typing import Any, Protocol, Sequence, runtime_checkable
 
 import requests
 from bookops_bpl_solr import BookopsSolrError, SolrSession
 from bookops_nypl_platform import BookopsPlatformError, PlatformSession, PlatformToken
 
 from .. import __title__, __version__
+from . import async_clients, throttling
 
 logger = logging.getLogger(__name__)
 
 AGENT = f"{__title__}/{__version__}"
+RETRY_EXCEPTIONS = (
+    requests.exceptions.ConnectionError,
+    requests.exceptions.Timeout,
+    *async_clients.RETRY_EXCEPTIONS,
+)
+
+
+def create_session(library: str) -> SierraSessionProtocol:
+    """
+    Create a new Sierra session for a library.
+
+    Args:
+        library: the library whose Sierra instance to query (`bpl` or `nypl`).
+
+    Returns:
+        a `BPLSolrSession` or `NYPLPlatformSession` object.
+
+    Raises:
+        ValueError: if `library` is not 'bpl' or 'nypl'.
+        BookopsPlatformError: if a token cannot be obtained for NYPL's Platform.
+    """
+    if library not in ["bpl", "nypl"]:
+        raise ValueError(f"Invalid library: {library}. Must be 'bpl' or 'nypl'")
+    elif library == "bpl":
+        return BPLSolrSession()
+    try:
+        return NYPLPlatformSession()
+    except BookopsPlatformError as exc:
+        logger.error(f"Trouble connecting: {str(exc)}")
+        raise
+
+
+def create_async_session(library: str) -> async_clients.AsyncSierraSession:
+    """
+    Create a new asynchronous Sierra session for a library.
+
+    The session sends queries built by a new `BPLSolrSession` or
+    `NYPLPlatformSession` so that they match the queries sent by
+    `SierraBibFetcher`.
+
+    Args:
+        library: the library whose Sierra instance to query (`bpl` or `nypl`).
+
+    Returns:
+        an `AsyncSierraSession` object.
+
+    Raises:
+        ValueError: if `library` is not 'bpl' or 'nypl'.
+        BookopsPlatformError: if a token cannot be obtained for NYPL's Platform.
+    """
+    return async_clients.AsyncSierraSession(create_session(library))
 
 
 class FetcherFactory:
     """Create a `SierraBibFetcher` object"""
 
-    def make(self, library: str) -> SierraBibFetcher:
+    def make(
+        self,
+        library: str,
+        pool: SierraSessionPool | None = None,
+        use_async: bool = False,
+        throttle: throttling.Throttle | None = None,
+    ) -> SierraBibFetcher | async_clients.AsyncSierraBibFetcher:
+        """
+        Create a `SierraBibFetcher` for a library.
+
+        Args:
+            library: the library whose Sierra instance to query (`bpl` or `nypl`).
+            pool:
+                an optional `SierraSessionPool`. If passed the fetcher will use
+                the pool's session (and, if `use_async` is True, the pool's event
+                loop) for the library rather than creating new ones.
+            use_async:
+                if True, create an `AsyncSierraBibFetcher` that runs queries on
+                an event loop using an asynchronous HTTP client.
+            throttle:
+                an optional `Throttle` used by the fetcher to pace and retry
+                queries.
+
+        Returns:
+            a `SierraBibFetcher` or `AsyncSierraBibFetcher` object.
+        """
         client: SierraSessionProtocol
-        if library not in ["bpl", "nypl"]:
-            raise ValueError(f"Invalid library: {library}. Must be 'bpl' or 'nypl'")
-        elif library == "bpl":
-            client = BPLSolrSession()
+        if use_async and pool is not None:
+            return async_clients.AsyncSierraBibFetcher(
+                pool.get_async(library), runner=pool.runner, throttle=throttle
+            )
+        elif use_async:
+            return async_clients.AsyncSierraBibFetcher(
+                create_async_session(library), throttle=throttle
+            )
+        elif pool is not None:
+            client = pool.get(library)
         else:
+            client = create_session(library)
+        return SierraBibFetcher(client, throttle=throttle)
+
+
+class SierraSessionPool:
+    """
+    Holds one long-lived, keep-alive session per library.
+
+    Sessions are created the first time they are requested and reused for the
+    lifetime of the application, so TCP/TLS connections and NYPL Platform tokens
+    are not recreated for every request. A session may be used by several
+    threads at once. Credentials that have expired are refreshed when a session
+    is taken from the pool and by `SierraBibFetcher` before each query.
+
+    Asynchronous sessions are pooled in the same way and share a single
+    `EventLoopThread`, which is started with the first asynchronous session.
+    """
+
+    def __init__(self) -> None:
+        self._sessions: dict[str, SierraSessionProtocol] = {}
+        self._async_sessions: dict[str, async_clients.AsyncSierraSession] = {}
+        self._lock = threading.Lock()
+        self.runner: async_clients.EventLoopThread | None = None
+
+    def __contains__(self, library: str) -> bool:
+        return library in self._sessions
+
+    def get(self, library: str) -> SierraSessionProtocol:
+        """
+        Get the session for a library, creating it if it does not yet exist.
+
+        Args:
+            library: the library whose Sierra instance to query (`bpl` or `nypl`).
+
+        Returns:
+            a `SierraSessionProtocol` object.
+
+        Raises:
+            ValueError: if `library` is not 'bpl' or 'nypl'.
+            BookopsPlatformError: if a token cannot be obtained for NYPL's Platform.
+        """
+        with self._lock:
+            session = self._sessions.get(library)
+            if session is None:
+                logger.info(f"Creating Sierra session for {library}.")
+                session = create_session(library)
+                self._sessions[library] = session
+            else:
+                session._refresh_credentials()
+            return session
+
+    def get_async(self, library: str) -> async_clients.AsyncSierraSession:
+        """
+        Get the asynchronous session for a library, creating it if needed.
+
+        Credentials are refreshed by the session before each query so they are
+        not checked here. Queries sent with the session must be run on the
+        pool's `runner`.
+
+        Args:
+            library: the library whose Sierra instance to query (`bpl` or `nypl`).
+
+        Returns:
+            an `AsyncSierraSession` object.
+
+        Raises:
+            ValueError: if `library` is not 'bpl' or 'nypl'.
+            BookopsPlatformError: if a token cannot be obtained for NYPL's Platform.
+        """
+        with self._lock:
+            if self.runner is None:
+                self.runner = async_clients.EventLoopThread()
+            session = self._async_sessions.get(library)
+            if session is None:
+                logger.info(f"Creating asynchronous Sierra session for {library}.")
+                session = create_async_session(library)
+                self._async_sessions[library] = session
+            return session
+
+    def warm(
+        self, libraries: Sequence[str] = ("bpl", "nypl"), use_async: bool = False
+    ) -> None:
+        """
+        Create sessions ahead of the first request.
+
+        Libraries whose sessions cannot be created are skipped and will be
+        created on their first request instead.
+
+        Args:
+            libraries: the libraries to create sessions for.
+            use_async: if True, create asynchronous sessions instead.
+        """
+        for library in libraries:
             try:
-                client = NYPLPlatformSession()
-            except BookopsPlatformError as exc:
-                logger.error(f"Trouble connecting: {str(exc)}")
-                raise
-        return SierraBibFetcher(client)
+                if use_async:
+                    self.get_async(library)
+                else:
+                    self.get(library)
+            except (BookopsPlatformError, BookopsSolrError, KeyError) as exc:
+                logger.warning(
+                    f"Unable to create Sierra session for {library}: "
+                    f"{exc.__class__.__name__}"
+                )
+
+    def close(self) -> None:
+        """Close all sessions in the pool and stop the pool's event loop."""
+        with self._lock:
+            for session in self._sessions.values():
+                session.close()
+            self._sessions.clear()
+            if self.runner is not None:
+                for async_session in self._async_sessions.values():
+                    self.runner.run(async_session.aclose())
+                self.runner.close()
+                self.runner = None
+            self._async_sessions.clear()
 
 
 class SierraBibFetcher:
@@ -65,27 +262,42 @@ class SierraBibFetcher:
     This class is a concrete implementation of the `BibFetcher` protocol.
     """
 
-    def __init__(self, session: SierraSessionProtocol) -> None:
+    def __init__(
+        self,
+        session: SierraSessionProtocol,
+        throttle: throttling.Throttle | None = None,
+    ) -> None:
         """
         Initialize a `SierraBibFetcher` with a Sierra-compatible session.
 
         Args:
             session: a `SierraSessionProtocol` instance to be used to query Sierra.
+            throttle:
+                an optional `Throttle` used to pace queries and retry queries
+                that are throttled by or fail transiently in Sierra.
         """
         self.session = session
+        self.throttle = throttle
 
-    def get_bibs_by_id(self, value: str | int, key: str) -> list[dict[str, Any]]:
+    def _send(self, method: Any, *args: Any) -> requests.Response:
         """
-        Retrieves bib records by a specific matchpoint (e.g., isbn, control_number)
-
-        Args:
-            value: identifier to search by.
-            key: name of identifier (e.g., 'isbn', 'bib_id').
+        Send a query to Sierra, using the fetcher's throttle if it has one.
 
-        Returns:
-            list of responses formatted as `BaseSierraResponse` objects.
+        The session may be shared by several threads and kept for longer than its
+        credentials are valid, so credentials are refreshed before each attempt.
         """
-        match_methods = {
+
+        def send() -> requests.Response:
+            self.session._refresh_credentials()
+            return method(*args)
+
+        if self.throttle is None:
+            return send()
+        return self.throttle.call(send)
+
+    def _get_match_methods(self) -> dict[str, Any]:
+        """Map each supported matchpoint to the session method used to query it."""
+        return {
             "bib_id": self.session._get_bibs_by_bib_id,
             "control_number": self.session._get_bibs_by_control_number,
             "isbn": self.session._get_bibs_by_isbn,
@@ -93,12 +305,34 @@ class SierraBibFetcher:
             "upc": self.session._get_bibs_by_upc,
         }
 
+    def _validate_matchpoint(self, key: str, match_methods: dict[str, Any]) -> None:
+        """Raise a `ValueError` if `key` is not a supported matchpoint."""
         if key not in match_methods:
             logger.error(f"Unsupported query matchpoint: '{key}'")
             raise ValueError(
                 f"Invalid matchpoint: '{key}'. Available matchpoints are: "
                 f"{sorted([i for i in match_methods.keys()])}"
             )
+
+    def _normalize_id(self, value: str | int, key: str) -> str:
+        """Normalize an identifier so query values can be compared to responses."""
+        if key == "bib_id":
+            return self.session._prep_sierra_number(value)
+        return str(value).replace("-", "").replace(" ", "").casefold()
+
+    def get_bibs_by_id(self, value: str | int, key: str) -> list[dict[str, Any]]:
+        """
+        Retrieves bib records by a specific matchpoint (e.g., isbn, control_number)
+
+        Args:
+            value: identifier to search by.
+            key: name of identifier (e.g., 'isbn', 'bib_id').
+
+        Returns:
+            list of responses formatted as `BaseSierraResponse` objects.
+        """
+        match_methods = self._get_match_methods()
+        self._validate_matchpoint(key, match_methods)
         bibs = []
         if value is None:
             logger.debug(f"Skipping Sierra query on {key} with missing value.")
@@ -108,21 +342,81 @@ class SierraBibFetcher:
                 f"Querying Sierra with {self.session.__class__.__name__} "
                 f"on {key} with value: {value}."
             )
-            response = match_methods[key](value)
-        except (BookopsPlatformError, BookopsSolrError) as exc:
+            response = self._send(match_methods[key], value)
+        except (BookopsPlatformError, BookopsSolrError, throttling.RetryError) as exc:
             logger.error(f"{exc.__class__.__name__} while running Sierra queries. ")
             raise
         bibs.extend(self.session._parse_response(response))
         return bibs
 
+    def get_bibs_by_ids(
+        self, values: Sequence[str | int], key: str
+    ) -> dict[str, list[dict[str, Any]]]:
+        """
+        Retrieves bib records for multiple values of a single matchpoint.
+
+        If the session supports searching the matchpoint with multiple values
+        all of the values are sent in one query and the candidates that are
+        returned are redistributed to the values they match. Otherwise, or if the
+        response may have been truncated or contains candidates that cannot be
+        attributed to any value, every value is queried individually so that no
+        value is left with only some of its candidates.
+
+        Args:
+            values: identifiers to search by.
+            key: name of identifier (e.g., 'isbn', 'bib_id').
+
+        Returns:
+            a dictionary mapping each value (as a string) to its list of responses.
+        """
+        match_methods = self._get_match_methods()
+        self._validate_matchpoint(key, match_methods)
+        unique_values = list(dict.fromkeys(str(i) for i in values if i is not None))
+        if len(unique_values) < 2 or key not in self.session.batch_matchpoints:
+            return {i: self.get_bibs_by_id(value=i, key=key) for i in unique_values}
+        try:
+            logger.debug(
+                f"Querying Sierra with {self.session.__class__.__name__} "
+                f"on {key} with {len(unique_values)} values: {unique_values}."
+            )
+            response = self._send(self.session._get_bibs_by_values, unique_values, key)
+        except (BookopsPlatformError, BookopsSolrError, throttling.RetryError) as exc:
+            logger.error(f"{exc.__class__.__name__} while running Sierra queries. ")
+            raise
+        bibs = self.session._parse_response(response)
+        normalized = {self._normalize_id(i, key): i for i in unique_values}
+        out: dict[str, list[dict[str, Any]]] = {i: [] for i in unique_values}
+        unattributed = False
+        for bib in bibs:
+            ids = [self._normalize_id(i, key) for i in self.session._get_ids(bib, key)]
+            matched_values = {normalized[i] for i in ids if i in normalized}
+            if not matched_values:
+                unattributed = True
+            for value in matched_values:
+                out[value].append(bib)
+        if unattributed or len(bibs) >= self.session.batch_limit:
+            logger.debug(
+                f"Batch query on {key} could not be fully redistributed. "
+                "Querying each value individually."
+            )
+            return {i: self.get_bibs_by_id(value=i, key=key) for i in unique_values}
+        return out
+
 
 @runtime_checkable
 class SierraSessionProtocol(Protocol):
     """
     Protocol for Sierra-compatible sessions, ensuring expected search and response
     methods are implemented by all concrete sessions.
+
+    Sessions that can search a matchpoint with multiple values in a single query
+    list those matchpoints in `batch_matchpoints`. `batch_limit` is the maximum
+    number of results the service returns for a single query.
     """
 
+    batch_matchpoints: tuple[str, ...] = ()
+    batch_limit: int = 10
+
     def _get_credentials(self) -> str | PlatformToken: ...  # pragma: no branch
     def _get_bibs_by_bib_id(
         self, value: str | int
@@ -142,6 +436,15 @@ class SierraSessionProtocol(Protocol):
     def _parse_response(
         self, response: requests.Response
     ) -> list[dict[str, Any]]: ...  # pragma: no branch
+    def _get_bibs_by_values(
+        self, values: list[str], key: str
+    ) -> requests.Response: ...  # pragma: no branch
+    def _get_ids(
+        self, bib: dict[str, Any], key: str
+    ) -> list[str]: ...  # pragma: no branch
+    def _prep_sierra_number(self, id: str | int) -> str: ...  # pragma: no branch
+    def _refresh_credentials(self) -> None: ...  # pragma: no branch
+    def close(self) -> None: ...  # pragma: no branch
 
 
 class BPLSolrSession(SolrSession):
@@ -152,6 +455,9 @@ class BPLSolrSession(SolrSession):
     Inherits from `bookops_bpl_solr.SolrSession`.
     """
 
+    batch_matchpoints = ("isbn", "upc")
+    batch_limit = 10
+
     def __init__(self):
         super().__init__(
             authorization=self._get_credentials(),
@@ -162,6 +468,10 @@ class BPLSolrSession(SolrSession):
     def _get_credentials(self) -> str:
         return os.environ["BPL_SOLR_CLIENT"]
 
+    def _refresh_credentials(self) -> None:
+        """BPL Solr client keys do not expire so there is nothing to refresh."""
+        return None
+
     def _parse_response(self, response: requests.Response) -> list[dict[str, Any]]:
         """Parse solr response into list of `BPLSolrResponse` objects."""
         logger.info(f"Sierra Session response code: {response.status_code}.")
@@ -208,6 +518,34 @@ class BPLSolrSession(SolrSession):
         """Search BPL Solr by upc number."""
         return self.search_upcs([str(value)], default_response_fields=False)
 
+    def _get_bibs_by_values(self, values: list[str], key: str) -> requests.Response:
+        """Search BPL Solr by multiple isbns or upc numbers in a single query."""
+        if key == "isbn":
+            return self.search_isbns(values, default_response_fields=False)
+        elif key == "upc":
+            return self.search_upcs(values, default_response_fields=False)
+        raise NotImplementedError(f"Batch search by {key} not implemented in BPL Solr")
+
+    def _get_ids(self, bib: dict[str, Any], key: str) -> list[str]:
+        """
+        Get the identifiers of a given type from a solr response document.
+
+        Entries in `sm_bib_varfields` that are not in the `tag || data` format
+        are skipped.
+        """
+        if key == "isbn":
+            return [str(i) for i in bib.get("isbn", [])]
+        tags = ["024", "028"] if key == "upc" else []
+        ids = []
+        for field in bib.get("sm_bib_varfields", []):
+            tag, sep, data = field.partition(" || ")
+            if not sep or tag not in tags:
+                continue
+            for subfield in data.split(" || "):
+                if subfield.startswith("{{a}}"):
+                    ids.append(subfield[5:].strip())
+        return ids
+
 
 class NYPLPlatformSession(PlatformSession):
     """
@@ -217,12 +555,16 @@ class NYPLPlatformSession(PlatformSession):
     Inherits from `bookops_nypl_platform.PlatformSession`.
     """
 
+    batch_matchpoints = ("bib_id", "control_number", "isbn", "upc")
+    batch_limit = 10
+
     def __init__(self):
         super().__init__(
             authorization=self._get_credentials(),
             target=os.environ["NYPL_PLATFORM_TARGET"],
             agent=AGENT,
         )
+        self._credentials_lock = threading.Lock()
 
     def _get_credentials(self) -> PlatformToken:
         return PlatformToken(
@@ -232,6 +574,26 @@ class NYPLPlatformSession(PlatformSession):
             os.environ["NYPL_PLATFORM_AGENT"],
         )
 
+    def _refresh_credentials(self) -> None:
+        """
+        Request a new Platform token if the current token has expired.
+
+        The check and refresh are done under a lock so that threads sharing the
+        session request only one new token.
+        """
+        with self._credentials_lock:
+            if not self.authorization.is_expired():
+                return None
+            logger.info("NYPL Platform token expired. Requesting new token.")
+            try:
+                self.authorization = self._get_credentials()
+            except BookopsPlatformError as exc:
+                logger.error(f"Trouble connecting: {str(exc)}")
+                raise
+            self.headers.update(
+                {"Authorization": f"Bearer {self.authorization.token_str}"}
+            )
+
     def _parse_response(self, response: requests.Response) -> list[dict[str, Any]]:
         """Parse platform response into list of `NYPLPlatformResponse` objects."""
         logger.info(f"Sierra Session response code: {response.status_code}.")
@@ -277,3 +639,25 @@ class NYPLPlatformSession(PlatformSession):
     def _get_bibs_by_upc(self, value: str | int) -> requests.Response:
         """Search NYPL Platform by upc number."""
         return self.search_standardNos(str(value))
+
+    def _get_bibs_by_values(self, values: list[str], key: str) -> requests.Response:
+        """Search NYPL Platform by multiple identifiers in a single query."""
+        if key == "bib_id":
+            return self.search_bibNos(values)
+        elif key == "control_number":
+            return self.search_controlNos(values)
+        elif key in ["isbn", "upc"]:
+            return self.search_standardNos(values)
+        raise NotImplementedError(
+            f"Batch search by {key} not implemented in NYPL Platform"
+        )
+
+    def _get_ids(self, bib: dict[str, Any], key: str) -> list[str]:
+        """Get the identifiers of a given type from a platform response."""
+        if key == "bib_id":
+            return [str(bib["id"])]
+        elif key == "control_number":
+            return [str(bib.get("controlNumber"))]
+        elif key in ["isbn", "upc"]:
+            return [str(i) for i in bib.get("standardNumbers", [])]
+        return []
@@ -11,16 +11,41 @@ The classes within this module are concrete implementations of the `FileLoader`
 from __future__ import annotations
 
 import io
+import json
 import logging
+import mmap
 import os
 from pathlib import Path
-from typing import Any, Sequence
+from typing import Any, BinaryIO, Sequence
 
 from file_retriever import Client, File
 from sqlmodel import Field, Session, SQLModel, select
 
 logger = logging.getLogger(__name__)
 
+CHUNK_SIZE = 1024 * 1024
+INDEX_SUFFIX = ".index.json"
+
+
+def read_file(path: str | Path, mapped: bool = False) -> bytes | mmap.mmap:
+    """
+    Read a file from the local filesystem.
+
+    Args:
+        path: the path to the file.
+        mapped:
+            whether to memory-map the file rather than read it into memory. A
+            mapped file's pages are read from disk as they are accessed and can be
+            released by the OS. Empty files cannot be mapped and are always read.
+
+    Returns:
+        the content of the file as `bytes` or as a read-only `mmap.mmap` object.
+    """
+    with open(path, "rb") as fh:
+        if mapped and os.fstat(fh.fileno()).st_size > 0:
+            return mmap.mmap(fh.fileno(), 0, access=mmap.ACCESS_READ)
+        return fh.read()
+
 
 class LocalFileStorage:
     def __init__(self, base_path: str = "temp/uploads"):
@@ -36,10 +61,84 @@ class LocalFileStorage:
 
         return str(path)
 
-    def load(self, reference: str) -> bytes:
-        with open(reference, "rb") as fh:
-            file = fh.read()
-        return file
+    def save_stream(
+        self, id: str, filename: str, stream: BinaryIO, consumers: Sequence[Any] = ()
+    ) -> tuple[str, int]:
+        """
+        Save a file by copying it from a stream in chunks.
+
+        Only one chunk of the file is held in memory at a time.
+
+        Args:
+            id: the id for the file.
+            filename: the name of the file.
+            stream: a binary file-like object containing the file's content.
+            consumers:
+                objects with an `update` method (eg. a `hashlib` hash) that are
+                passed each chunk of the file as it is written.
+
+        Returns:
+            the path where the file was saved and the number of bytes written.
+        """
+        path = self.base_path / f"{id}_{filename}"
+        size = 0
+        with open(path, "wb") as f:
+            while chunk := stream.read(CHUNK_SIZE):
+                f.write(chunk)
+                for consumer in consumers:
+                    consumer.update(chunk)
+                size += len(chunk)
+        return str(path), size
+
+    def delete(self, reference: str) -> None:
+        """Delete a file and its record index from storage if they exist."""
+        Path(reference).unlink(missing_ok=True)
+        Path(f"{reference}{INDEX_SUFFIX}").unlink(missing_ok=True)
+
+    def load(self, reference: str, mapped: bool = False) -> bytes | mmap.mmap:
+        return read_file(reference, mapped=mapped)
+
+    def open_sink(self, id: str, filename: str) -> tuple[str, BinaryIO]:
+        """
+        Open a new file in storage for writing.
+
+        Args:
+            id: the id for the file.
+            filename: the name of the file.
+
+        Returns:
+            the path to the file and the file opened for writing. The caller is
+            responsible for closing the file.
+        """
+        path = self.base_path / f"{id}_{filename}"
+        return str(path), open(path, "wb")
+
+    def save_index(self, reference: str, index: dict[str, Any]) -> None:
+        """
+        Save the record index of a file in a sidecar file next to the file.
+
+        Args:
+            reference: the path to the file that was indexed.
+            index: the record index of the file.
+        """
+        with open(f"{reference}{INDEX_SUFFIX}", "w", encoding="utf-8") as f:
+            json.dump(index, f)
+
+    def load_index(self, reference: str) -> dict[str, Any] | None:
+        """
+        Load the record index of a file from its sidecar file.
+
+        Args:
+            reference: the path to the file whose index is to be loaded.
+
+        Returns:
+            the record index of the file or `None` if the file has not been indexed.
+        """
+        path = Path(f"{reference}{INDEX_SUFFIX}")
+        if not path.exists():
+            return None
+        with open(path, encoding="utf-8") as f:
+            return json.load(f)
 
 
 class LocalFileLoader:
@@ -56,10 +155,13 @@ class LocalFileLoader:
         logger.info(f"Files in {dir}: {files}")
         return files
 
-    def load(self, name: str, dir: str) -> bytes:
-        """Load a file from a local directory."""
-        with open(os.path.join(dir, name), "rb") as fh:
-            file = fh.read()
+    def load(self, name: str, dir: str, mapped: bool = False) -> bytes | mmap.mmap:
+        """
+        Load a file from a local directory.
+
+        If `mapped` is True the file is memory-mapped rather than read into memory.
+        """
+        file = read_file(os.path.join(dir, name), mapped=mapped)
         logger.info(f"File loaded: {name}")
         return file
 
@@ -151,6 +253,9 @@ class IncomingFileModel(SQLModel, table=True):
     workflow_id: str = Field(nullable=False, index=True)
     source: str = Field(nullable=False)
     reference: str = Field(nullable=False)
+    sha256: str | None = Field(default=None, index=True)
+    size: int | None = Field(default=None)
+    record_count: int | None = Field(default=None)
 
 
 class IncomingFileRepository:
@@ -173,6 +278,21 @@ class IncomingFileRepository:
         self.session.delete(file)
         self.session.commit()
 
+    def get(self, id: str | int) -> dict[str, Any] | None:
+        """
+        Retrieve an `IncomingFileModel` object by its ID.
+
+        Args:
+            id: the ID of the file to retrieve.
+
+        Returns:
+            the `IncomingFileModel` as a dictionary or `None` if not found.
+        """
+        file = self.session.get(IncomingFileModel, id)
+        if file:
+            return file.model_dump()
+        return None
+
     def list_by_id(self, id: str | int) -> Sequence[dict[str, Any]]:
         """
         Retrieve all `IncomingFileModel` objects in the database.
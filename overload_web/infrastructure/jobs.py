@@ -0,0 +1,76 @@
+"""Background job runners for the process vendor file workflow.
+
+Classes:
+
+`ThreadPoolJobRunner`
+    Runs jobs in a pool of worker threads. Each job uses its own database session.
+"""
+
+from __future__ import annotations
+
+import logging
+import threading
+from concurrent.futures import Future, ThreadPoolExecutor
+from typing import Callable
+
+from sqlalchemy import Engine
+from sqlmodel import Session
+
+from overload_web.infrastructure import batch_db
+
+logger = logging.getLogger(__name__)
+
+
+class ThreadPoolJobRunner:
+    """
+    Runs jobs in a pool of worker threads.
+
+    This class is a concrete implementation of the `JobRunner` protocol. Jobs run
+    outside of the request that submitted them, so each job opens its own
+    database session rather than using the request's session.
+
+    Args:
+        engine: the `sqlalchemy.Engine` used to create each job's session.
+        max_workers: the maximum number of jobs to run at once.
+    """
+
+    def __init__(self, engine: Engine, max_workers: int = 2) -> None:
+        self.engine = engine
+        self.max_workers = max_workers
+        self._executor: ThreadPoolExecutor | None = None
+        self._lock = threading.Lock()
+
+    def _run(self, task: Callable[..., None]) -> None:
+        with Session(self.engine) as session:
+            task(
+                jobs=batch_db.PVFJobRepository(session=session),
+                batches=batch_db.PVFBatchRepository(session=session),
+            )
+
+    def submit(self, task: Callable[..., None]) -> Future:
+        """
+        Schedule a task to run in a worker thread.
+
+        The task is called with `jobs` and `batches` repositories that share a
+        session owned by the worker. The worker pool is started when the first
+        task is submitted. Tasks may be submitted from several threads at once.
+
+        Args:
+            task: the callable to run.
+
+        Returns:
+            a `Future` for the task.
+        """
+        with self._lock:
+            if self._executor is None:
+                self._executor = ThreadPoolExecutor(
+                    max_workers=self.max_workers, thread_name_prefix="pvf-job"
+                )
+            return self._executor.submit(self._run, task)
+
+    def shutdown(self, wait: bool = True) -> None:
+        """Stop the worker pool. A new pool is started if another task is submitted."""
+        with self._lock:
+            executor, self._executor = self._executor, None
+        if executor is not None:
+            executor.shutdown(wait=wait)
@@ -15,27 +15,173 @@ Classes:
 `MarcEngineConfig`
     Configuration data used to determine MARC record processing. Loaded from a .json
     file and input via an html form in the presentation layer.
+`CompiledRules`
+    The `VendorIdentifier` and `MappingPlan` objects compiled from the rules of a
+    `MarcEngineConfig`.
+`FrozenDict`, `FrozenList`
+    Read-only copies of the dictionaries and lists loaded from the mapping specs
+    .json file.
+`MarcEngineConfigRegistry`
+    Loads the mapping specs .json file once and builds a `MarcEngineConfig` and
+    `CompiledRules` for each combination of library, collection, and record type.
 `MarcEngine`
     Interact with binary MARC data using `bookops_marc` and `pymarc`. Uses config data
     to determine field mapping and processing workflows.
+`FieldIndex`
+    The fields of a record grouped by tag in a single pass so that properties
+    which look up fields by tag do not walk the whole record each time.
+`IndexedBib`
+    A view of a record that looks up its fields in a `FieldIndex`.
+`MappingPlan`
+    Mapping rules compiled into attribute getters so that `bookops_marc` objects
+    can be mapped to dictionaries without interpreting the rules for each record.
+`MarcRecordCounter`
+    Counts the records in MARC binary as it is read in chunks.
+`MarcRecordIndexer`
+    Build an index of the records in a MARC file from its leaders and directories
+    without parsing the records.
+`VendorIdentifier`
+    Vendor identification rules compiled into a lookup table so that the vendor of
+    a record can be determined by reading its fields once.
 """
 
 from __future__ import annotations
 
-import io
+import bisect
+import json
 import logging
+import math
+import mmap
 from dataclasses import dataclass
-from typing import Any, BinaryIO, Protocol
+from operator import attrgetter
+from pathlib import Path
+from types import MappingProxyType
+from typing import Any, BinaryIO, Iterator, Mapping, Protocol, Sequence
 
 from bookops_marc import Bib, SierraBibReader
 from pymarc import Field, Indicators, Subfield
+from pymarc.exceptions import FieldNotFound
 
 logger = logging.getLogger(__name__)
 
+FIELD_TERMINATOR = 0x1E
+RECORD_TERMINATOR = 0x1D
+SUBFIELD_DELIMITER = 0x1F
+LEADER_LENGTH = 24
+DIRECTORY_ENTRY_LENGTH = 12
+RECORD_TYPES = ("acq", "cat", "sel")
+
+
+def field_sort_key(tag: str) -> float:
+    """
+    Get the key used to order a field within a record by its tag.
+
+    Mirrors `pymarc.Record.add_ordered_field`: fields with numeric tags are
+    ordered by the value of the tag and new fields are added before the first
+    field with a non-numeric tag, so non-numeric tags sort after every numeric
+    tag.
+
+    Args:
+        tag: the tag of a MARC field.
+
+    Returns:
+        the tag as an integer or infinity if the tag is not numeric.
+    """
+    return int(tag) if tag.isdigit() else math.inf
+
+
+def locate_records(data: bytes) -> list[tuple[int, int]] | None:
+    """
+    Locate the records in MARC binary using the record length in each leader.
+
+    Only well-formed UTF-8 records are located. Each record's leader must
+    contain a valid record length and base address of data, its directory must
+    end with a field terminator, and the record must end with a record
+    terminator.
+
+    Args:
+        data: MARC binary containing one or more records.
+
+    Returns:
+        a list of `(start, end)` byte offsets for each record or None if any
+        record is malformed or not encoded as UTF-8.
+    """
+    with memoryview(data) as view:
+        offsets = []
+        start = 0
+        while start < len(view):
+            leader = bytes(view[start : start + LEADER_LENGTH])
+            if len(leader) < LEADER_LENGTH:
+                return None
+            length, base_address = leader[:5], leader[12:17]
+            if not (length.isdigit() and base_address.isdigit()):
+                return None
+            end = start + int(length)
+            directory_end = start + int(base_address) - 1
+            if (
+                leader[9:10] != b"a"
+                or end > len(view)
+                or not start + LEADER_LENGTH <= directory_end < end
+                or view[directory_end] != FIELD_TERMINATOR
+                or view[end - 1] != RECORD_TERMINATOR
+            ):
+                return None
+            offsets.append((start, end))
+            start = end
+        return offsets
+
+
+class FrozenDict(dict):
+    """A `dict` that cannot be modified once it is created."""
+
+    def _read_only(self, *args: Any, **kwargs: Any) -> Any:
+        raise TypeError(f"'{type(self).__name__}' object is read-only")
+
+    __setitem__ = __delitem__ = __ior__ = _read_only
+    clear = pop = popitem = setdefault = update = _read_only
+
+    def __reduce__(self) -> tuple[type, tuple[dict[Any, Any]]]:
+        return (type(self), (dict(self),))
+
+
+class FrozenList(list):
+    """A `list` that cannot be modified once it is created."""
+
+    def _read_only(self, *args: Any, **kwargs: Any) -> Any:
+        raise TypeError(f"'{type(self).__name__}' object is read-only")
+
+    __setitem__ = __delitem__ = __iadd__ = __imul__ = _read_only
+    append = clear = extend = insert = pop = remove = reverse = sort = _read_only
+
+    def __reduce__(self) -> tuple[type, tuple[list[Any]]]:
+        return (type(self), (list(self),))
+
+
+def freeze(value: Any) -> Any:
+    """
+    Make a read-only copy of a value loaded from JSON.
+
+    Dictionaries and lists are copied to a `FrozenDict` or `FrozenList`, all the
+    way down. Frozen values compare equal to the values they were copied from and
+    can be pickled.
+
+    Args:
+        value: the value to freeze.
+
+    Returns:
+        the frozen value.
+    """
+    if isinstance(value, dict):
+        return FrozenDict((k, freeze(v)) for k, v in value.items())
+    if isinstance(value, list):
+        return FrozenList(freeze(i) for i in value)
+    return value
+
 
 class DomainBibProtocol(Protocol):
     library: str
     binary_data: bytes
+    marc_record: Any
 
 
 @dataclass(frozen=True)
@@ -51,10 +197,293 @@ class MarcEngineConfig:
     record_type: str
 
 
+@dataclass(frozen=True)
+class CompiledRules:
+    """
+    The vendor identifier and mapping plans compiled from a `MarcEngineConfig`.
+
+    Compiling the rules is the costly part of creating a `MarcEngine`, so the
+    `MarcEngineConfigRegistry` compiles them once for each config it holds.
+    """
+
+    vendor_identifier: VendorIdentifier
+    bib_plan: MappingPlan
+    order_plan: MappingPlan
+
+    @classmethod
+    def from_config(cls, config: MarcEngineConfig) -> CompiledRules:
+        """Compile the vendor and mapping rules of a config."""
+        return cls(
+            vendor_identifier=VendorIdentifier(config.parser_vendor_mapping),
+            bib_plan=MappingPlan(config.parser_bib_mapping),
+            order_plan=MappingPlan(config.parser_order_mapping),
+        )
+
+
+class MarcEngineConfigRegistry:
+    """
+    Holds a `MarcEngineConfig` for each library, collection, and record type.
+
+    The mapping specs file is read once when the registry is created and the
+    configs are built up front so that getting a config is a dictionary lookup.
+    Configs share the mapping rules loaded from the file, which are frozen so
+    that they cannot be modified. The rules of each config are compiled once so
+    that engines created with `engine` do not compile them again.
+
+    Args:
+        path: the path to the mapping specs .json file.
+    """
+
+    def __init__(self, path: str | Path) -> None:
+        self.path = Path(path)
+        self._specs: Mapping[str, Any] = {}
+        self._configs: Mapping[
+            tuple[str, str | None, str], tuple[MarcEngineConfig, CompiledRules]
+        ] = {}
+        self.reload()
+
+    def _build(
+        self, library: str, collection: str | None, record_type: str
+    ) -> MarcEngineConfig:
+        return MarcEngineConfig(
+            marc_order_mapping=self._specs["marc_order_mapping"],
+            default_loc=self._specs["default_locations"][library].get(collection),
+            bib_id_tag=self._specs["bib_id_tag"][library],
+            library=library,
+            record_type=record_type,
+            collection=collection,
+            parser_bib_mapping=self._specs["bib_domain_mapping"],
+            parser_order_mapping=self._specs["order_domain_mapping"],
+            parser_vendor_mapping=self._specs["vendor_info_options"][library],
+        )
+
+    def get(
+        self, library: str, collection: str | None, record_type: str
+    ) -> MarcEngineConfig:
+        """
+        Get the config for a library, collection, and record type.
+
+        Combinations that were not built when the specs were loaded are built
+        when requested.
+        """
+        entry = self._configs.get((library, collection, record_type))
+        if entry is None:
+            return self._build(library, collection, record_type)
+        return entry[0]
+
+    def engine(
+        self, library: str, collection: str | None, record_type: str
+    ) -> MarcEngine:
+        """
+        Create a `MarcEngine` for a library, collection, and record type.
+
+        Engines for configs built when the specs were loaded share the config's
+        compiled rules. Other engines compile their rules when they are created.
+        """
+        entry = self._configs.get((library, collection, record_type))
+        if entry is None:
+            return MarcEngine(rules=self._build(library, collection, record_type))
+        config, compiled = entry
+        return MarcEngine(rules=config, compiled=compiled)
+
+    def reload(self) -> None:
+        """Read the mapping specs file again and rebuild all configs."""
+        with open(self.path, "r", encoding="utf-8") as fh:
+            self._specs = freeze(json.load(fh))
+        configs = {}
+        for library in self._specs["bib_id_tag"]:
+            collections = list(self._specs["default_locations"][library]) or [None]
+            for collection in collections:
+                for record_type in RECORD_TYPES:
+                    config = self._build(library, collection, record_type)
+                    configs[(library, collection, record_type)] = (
+                        config,
+                        CompiledRules.from_config(config),
+                    )
+        self._configs = MappingProxyType(configs)
+        logger.info(f"Loaded {len(configs)} MARC engine configs from {self.path}")
+
+
+class FieldIndex:
+    """
+    The fields of a `bookops_marc.Bib` object grouped by tag in one pass.
+
+    `get_fields` and `get` return the same fields as the `Bib` methods of the
+    same name, which walk every field in the record on each call. `bib` is an
+    `IndexedBib` view of the record whose properties read fields from the index.
+    Fields added to or removed from the record other than through `bib` are not
+    in the index until it is refreshed.
+
+    Args:
+        record: the `bookops_marc.Bib` object to index.
+    """
+
+    def __init__(self, record: Bib) -> None:
+        self.record = record
+        self.refresh()
+        self.bib = IndexedBib(self)
+
+    def refresh(self) -> None:
+        """Group the fields of the record by tag again."""
+        tags: dict[str, list[Field]] = {}
+        for field in self.record.fields:
+            tags.setdefault(field.tag, []).append(field)
+        self.tags: dict[str, list[Field]] = tags
+
+    def get(self, tag: str, default: Field | None = None) -> Field | None:
+        """Get the first field with a tag."""
+        fields = self.tags.get(tag)
+        return fields[0] if fields else default
+
+    def get_fields(self, *args: str) -> list[Field]:
+        """Get all fields with one or more tags in the order they are in the record."""
+        if len(args) == 1:
+            return list(self.tags.get(args[0], ()))
+        return type(self.record).get_fields(self.record, *args)
+
+
+class IndexedBib:
+    """
+    A view of a `bookops_marc.Bib` object that finds fields in a `FieldIndex`.
+
+    The view wraps the record rather than subclassing `Bib`. `Bib` properties read
+    from the view are evaluated against the view so that the fields they look up
+    by tag are read from the index. Other attributes and methods are those of the
+    record, and attributes set on the view are set on the record. The index is
+    rebuilt after fields are added to or removed from the record through the view.
+
+    Args:
+        index: the `FieldIndex` of the record.
+    """
+
+    _field_updates = frozenset(
+        {
+            "add_field",
+            "add_grouped_field",
+            "add_ordered_field",
+            "remove_field",
+            "remove_fields",
+        }
+    )
+
+    def __init__(self, index: FieldIndex) -> None:
+        object.__setattr__(self, "_index", index)
+
+    def __getattr__(self, name: str) -> Any:
+        record = self._index.record
+        attr = getattr(type(record), name, None)
+        if isinstance(attr, property):
+            return attr.fget(self)
+        value = getattr(record, name)
+        if name in self._field_updates:
+
+            def update_fields(*args: Any) -> None:
+                value(*args)
+                self._index.refresh()
+
+            return update_fields
+        return value
+
+    def __setattr__(self, name: str, value: Any) -> None:
+        setattr(self._index.record, name, value)
+
+    def __contains__(self, tag: str) -> bool:
+        return tag in self._index.tags
+
+    def __getitem__(self, tag: str) -> Field:
+        field = self._index.get(tag)
+        if field is None:
+            raise KeyError(tag)
+        return field
+
+    def __iter__(self) -> Iterator[Field]:
+        return iter(self._index.record.fields)
+
+    def get(self, tag: str, default: Field | None = None) -> Field | None:
+        return self._index.get(tag, default)
+
+    def get_fields(self, *args: str) -> list[Field]:
+        return self._index.get_fields(*args)
+
+
+class MappingPlan:
+    """
+    A set of mapping rules compiled into attribute getters.
+
+    The rules are sorted by type once when the plan is created:
+
+    - attributes with a 1:1 mapping between `bookops_marc` and domain objects are
+      read with a single `operator.attrgetter`
+    - `oclc_nos` dictionaries are normalized to a list of OCLC numbers
+    - dictionaries containing a `tag` are mapped to the data of that control field
+    - other dictionaries are mapped from the subfields of the field named by
+      their key (eg. the `_field` of a `bookops_marc.Order`)
+
+    Args:
+        rules: the mapping rules (eg. `bib_domain_mapping` from the mapping specs).
+    """
+
+    def __init__(self, rules: dict[str, Any]) -> None:
+        self.rules = rules
+        attrs = {}
+        self.oclc_keys: list[str] = []
+        self.control_fields: list[tuple[str, str]] = []
+        self.subfields: list[tuple[attrgetter, list[tuple[str, str]]]] = []
+        for k, v in rules.items():
+            if v == "oclc_nos":
+                self.oclc_keys.append(k)
+            elif isinstance(v, str):
+                attrs[k] = v
+            elif isinstance(v, dict) and "tag" in v:
+                self.control_fields.append((k, v["tag"]))
+            else:
+                self.subfields.append((attrgetter(k), list(v.items())))
+        self.keys = tuple(attrs)
+        self.getter = attrgetter(*attrs.values()) if attrs else None
+
+    def __call__(self, obj: Any) -> dict[str, Any]:
+        """Map a `bookops_marc.Bib` or `bookops_marc.Order` object to a dictionary."""
+        if isinstance(obj, Bib):
+            obj.normalize_oclc_control_number()
+        return self.apply(obj)
+
+    def apply(self, obj: Any, index: FieldIndex | None = None) -> dict[str, Any]:
+        """
+        Map an object to a dictionary without normalizing its OCLC numbers.
+
+        Args:
+            obj: a `bookops_marc.Bib` or `bookops_marc.Order` object.
+            index:
+                an optional `FieldIndex` of `obj`. If passed, values are read from
+                the index's view of the record rather than from `obj`.
+        """
+        if index is not None:
+            obj = index.bib
+        if self.getter is None:
+            out: dict[str, Any] = {}
+        elif len(self.keys) == 1:
+            out = {self.keys[0]: self.getter(obj)}
+        else:
+            out = dict(zip(self.keys, self.getter(obj)))
+        for k in self.oclc_keys:
+            out[k] = list(set(obj.oclc_nos.values()))
+        for k, tag in self.control_fields:
+            field = obj.get(tag)
+            if field is not None:
+                out[k] = str(field.data)
+        for getter, codes in self.subfields:
+            field = getter(obj)
+            for code, attr in codes:
+                out[attr] = field.get(code) if field else None
+        return out
+
+
 class MarcEngine:
     """Interacts with binary MARC data using `bookops_marc`."""
 
-    def __init__(self, rules: MarcEngineConfig) -> None:
+    def __init__(
+        self, rules: MarcEngineConfig, compiled: CompiledRules | None = None
+    ) -> None:
         """
         Initialize `MarcEngine` using a set of marc mapping rules and workflow inputs.
 
@@ -66,14 +495,29 @@ class MarcEngine:
                 rules, rules to use when mapping MARC records to domain objects, library
                 and record type. Parsed from `/overload_web/data/mapping_specs.json` and
                 values input by user for `library`, `collection`, and `record_type`.
+            compiled:
+                The `CompiledRules` of `rules`, if they have already been compiled.
+                The rules are compiled when the engine is created if not.
         """
+        if compiled is None:
+            compiled = CompiledRules.from_config(rules)
         self.library = rules.library
         self.collection = rules.collection
         self.record_type = rules.record_type
         self.config = rules
+        self.vendor_identifier = compiled.vendor_identifier
+        self.bib_plan = compiled.bib_plan
+        self.order_plan = compiled.order_plan
 
     def create_bib_from_domain(self, record: DomainBibProtocol) -> Bib:
-        """Create a `bookops_marc.Bib` object from a `DomainBib` object"""
+        """
+        Get a `bookops_marc.Bib` object from a `DomainBib` object.
+
+        The record's parsed `Bib` is returned if it has one so that changes made to
+        it are kept with the record. Otherwise the record's binary data is parsed.
+        """
+        if isinstance(record.marc_record, Bib):
+            return record.marc_record
         return Bib(data=record.binary_data, library=record.library)  # type: ignore
 
     def get_command_tag_field(self, bib: Bib) -> Field | None:
@@ -84,8 +528,15 @@ class MarcEngine:
                 return field
         return None
 
-    def get_reader(self, data: bytes | BinaryIO) -> SierraBibReader:
-        """Instantiate a `SierraBibReader` to read MARC binary data."""
+    def get_reader(self, data: bytes | mmap.mmap | BinaryIO) -> SierraBibReader:
+        """
+        Instantiate a `SierraBibReader` to read MARC binary data.
+
+        A memory-mapped file is read from the beginning of the mapping without
+        copying the file into memory.
+        """
+        if isinstance(data, mmap.mmap):
+            data.seek(0)
         return SierraBibReader(data, library=self.library)
 
     def get_vendor_tags_from_bib(
@@ -121,6 +572,14 @@ class MarcEngine:
         """
         Update a bibliographic record.
 
+        All of the updates for the record are applied to a copy of its fields
+        which is then written back to the record once. Each field is paired with
+        a sort key parsed from its tag so that tags are only parsed once per
+        record rather than each time a field is added. When the record's fields
+        are already in tag order new fields are placed with a binary search.
+        Updates are applied in the order given and produce the same fields, in the
+        same order, as removing and adding each field with `pymarc`.
+
         Args:
             bib:
                 A MARC record as a `bookops_marc.Bib` object
@@ -128,15 +587,36 @@ class MarcEngine:
                 A list of updates to make to the record as `rules.MarcFieldUpdateValues`
                 objects
 
+        Raises:
+            FieldNotFound: if the original field of an update is not in the record.
+
         Returns:
             None. The record's fields are updated in place.
         """
+        if not field_updates:
+            return
+        fields = list(bib.fields)
+        keys = [field_sort_key(i.tag) for i in fields]
+        ordered = all(i <= j for i, j in zip(keys, keys[1:]))
         for update in field_updates:
             if update.delete:
-                bib.remove_fields(update.tag)
+                kept = [i for i in range(len(fields)) if fields[i].tag != update.tag]
+                fields = [fields[i] for i in kept]
+                keys = [keys[i] for i in kept]
             if update.original:
-                bib.remove_field(update.original)
-            bib.add_ordered_field(
+                try:
+                    position = fields.index(update.original)
+                except ValueError:
+                    raise FieldNotFound
+                del fields[position], keys[position]
+            key = field_sort_key(update.tag)
+            if ordered:
+                position = bisect.bisect_right(keys, key)
+            else:
+                position = next((n for n, i in enumerate(keys) if i > key), len(keys))
+            keys.insert(position, key)
+            fields.insert(
+                position,
                 Field(
                     tag=update.tag,
                     indicators=Indicators(update.ind1, update.ind1),
@@ -144,14 +624,18 @@ class MarcEngine:
                         Subfield(code=i["code"], value=i["value"])
                         for i in update.subfields
                     ],
-                )
+                ),
             )
+        bib.fields[:] = fields
 
     def map_data(self, obj: Any, rules: dict[str, Any]) -> dict[str, Any]:
         """
         Build a dictionary representing a `DomainBib` or `Order ` object
         from a `bookops_marc.Bib` object and a set of mapping rules.
 
+        The engine's compiled plans are used if `rules` are the bib or order
+        mapping rules in its config. Otherwise `rules` are compiled first.
+
         Args:
             obj: MARC record represented as a `bookops_marc.Bib` or `bookops_marc.Order`
             object.
@@ -160,58 +644,283 @@ class MarcEngine:
             a dictionary containing a mapping between a `bookops_marc` object
             and a domain object.
         """
-        out: dict[str, Any] = {}
+        if rules is self.config.parser_bib_mapping:
+            return self.bib_plan(obj)
+        if rules is self.config.parser_order_mapping:
+            return self.order_plan(obj)
+        return MappingPlan(rules)(obj)
 
-        if isinstance(obj, Bib):
-            obj.normalize_oclc_control_number()
-        for k, v in rules.items():
-            # OCLC Numbers have to be normalized from a dictionary
-            if v == "oclc_nos":
-                property = getattr(obj, v)
-                out[k] = list(set(property.values()))
-            # most attrs have 1:1 mapping between `Bib` and `DomainBib`
-            elif isinstance(v, str):
-                out[k] = getattr(obj, v)
-            # dict containing control field tag whose value to assign to attr
-            elif isinstance(v, dict) and "tag" in v:
-                field = obj.get(v["tag"])
-                if field is not None:
-                    out[k] = str(field.data)
-            # nested dict for `bookops_marc.Order` objects
-            else:
-                field = getattr(obj, k)
-                for code, attr in v.items():
-                    out[attr] = field.get(code) if field else None
-        return out
+    def extract(self, record: Bib) -> tuple[dict[str, Any], list[dict[str, Any]]]:
+        """
+        Map a `bookops_marc.Bib` object and its orders to dictionaries.
+
+        The record's OCLC numbers are normalized and its fields are indexed by
+        tag once. The values needed by the bib and order mapping rules are then
+        read from the index rather than by walking the record's fields for each
+        property.
+
+        Args:
+            record: MARC record represented as a `bookops_marc.Bib` object.
+
+        Returns:
+            a dictionary representing the `DomainBib` object and a list of
+            dictionaries representing its `Order` objects.
+        """
+        record.normalize_oclc_control_number()
+        index = FieldIndex(record)
+        bib = self.bib_plan.apply(record, index=index)
+        orders = [self.order_plan.apply(i) for i in index.bib.orders]
+        return bib, orders
 
     def identify_vendor(self, record: Bib, rules: dict[str, Any]) -> dict[str, Any]:
-        """Determine the vendor who created a `bookops_marc.Bib` record."""
-        for vendor, info in rules.items():
-            tags = info["vendor_tags"].get("primary", {})
-            tag_match = self.get_vendor_tags_from_bib(record=record, tags=tags)
-            if tag_match:
-                return info
-            alt_tags = info["vendor_tags"].get("alternate", {})
-            alt_match = self.get_vendor_tags_from_bib(record=record, tags=alt_tags)
-            if alt_match:
-                return info
-        return rules["UNKNOWN"]
+        """
+        Determine the vendor who created a `bookops_marc.Bib` record.
+
+        The engine's compiled rules are used if `rules` are the rules in its config.
+        Otherwise `rules` are compiled first.
+        """
+        if rules is self.config.parser_vendor_mapping:
+            return self.vendor_identifier.identify(record)
+        return VendorIdentifier(rules).identify(record)
 
     def write(self, records: list[DomainBibProtocol]) -> bytes:
         """
         Serialize `DomainBib` objects into a binary MARC stream.
 
+        The binary for each record is joined into a single `bytes` object so the
+        output is copied once rather than being built up in a buffer and copied
+        out of it.
+
+        Args:
+            records:
+                A list `DomainBib` objects.
+
+        Returns:
+            MARC binary as a `bytes` object.
+        """
+        return b"".join(self._serialize(records))
+
+    def write_to(self, records: list[DomainBibProtocol], sink: BinaryIO) -> int:
+        """
+        Serialize `DomainBib` objects into a file or stream.
+
+        Each record is written to the sink as it is serialized so the output is
+        never held in memory as a whole.
+
         Args:
             records:
                 A list `DomainBib` objects.
+            sink:
+                A binary file or stream opened for writing.
 
         Returns:
-            MARC binary as an an in-memory file stream.
+            the number of bytes written to the sink.
         """
-        io_data = io.BytesIO()
+        return sum(sink.write(i) for i in self._serialize(records))
+
+    def _serialize(self, records: list[DomainBibProtocol]) -> Iterator[bytes]:
         for record in records:
             logger.info(f"Writing MARC binary for record: {record}")
-            io_data.write(record.binary_data)
-        io_data.seek(0)
-        out = io_data.getvalue()
-        return out
+            yield record.binary_data
+
+
+class MarcRecordCounter:
+    """
+    Count the records in MARC binary as it is read in chunks.
+
+    Records are counted using the record length in each leader so only the first
+    five bytes of each record are read. Chunks can be split at any byte.
+    """
+
+    def __init__(self) -> None:
+        self._records = 0
+        self._length = b""
+        self._remaining = 0
+        self._valid = True
+
+    @property
+    def count(self) -> int | None:
+        """
+        The number of records read so far or None if a record is malformed or the
+        data ends partway through a record.
+        """
+        if not self._valid or self._length or self._remaining:
+            return None
+        return self._records
+
+    def update(self, data: bytes) -> None:
+        """Read the next chunk of MARC binary."""
+        position = 0
+        while self._valid and position < len(data):
+            if self._remaining:
+                step = min(self._remaining, len(data) - position)
+                self._remaining -= step
+                position += step
+                continue
+            needed = 5 - len(self._length)
+            self._length += bytes(data[position : position + needed])
+            position += needed
+            if len(self._length) < 5:
+                return
+            if not self._length.isdigit() or int(self._length) < LEADER_LENGTH:
+                self._valid = False
+                return
+            self._remaining = int(self._length) - 5
+            self._length = b""
+            self._records += 1
+
+
+class MarcRecordIndexer:
+    """
+    Indexes the records in a MARC file without parsing them.
+
+    The index maps each record's position in the file to its byte offset and
+    length and maps control numbers, ISBNs, and item barcodes to the positions of
+    the records that contain them. It is built from the leader and directory of
+    each record in a single pass so that individual records can later be sliced
+    out of the file.
+
+    Barcodes are read from subfield $i of NYPL (949 with a second indicator of
+    "1") and BPL (960) item fields. Non-numeric values, such as the order type
+    codes NYPL records in 960 $i, are ignored.
+
+    This class is a concrete implementation of the `MarcRecordIndexer` protocol.
+    """
+
+    item_fields = {"949": "1", "960": " "}
+
+    def _iter_fields(
+        self, data: memoryview, start: int, tags: Sequence[str]
+    ) -> Iterator[tuple[str, bytes]]:
+        """Get the tag and content of each field in a record with one of `tags`."""
+        base_address = start + int(bytes(data[start + 12 : start + 17]))
+        directory = bytes(data[start + LEADER_LENGTH : base_address - 1])
+        if len(directory) % DIRECTORY_ENTRY_LENGTH:
+            raise ValueError("Invalid MARC directory.")
+        for n in range(0, len(directory), DIRECTORY_ENTRY_LENGTH):
+            entry = directory[n : n + DIRECTORY_ENTRY_LENGTH]
+            tag = entry[:3].decode("ascii")
+            if tag not in tags:
+                continue
+            position = base_address + int(entry[7:12])
+            yield tag, bytes(data[position : position + int(entry[3:7]) - 1])
+
+    def _get_subfields(self, field: bytes, code: str) -> list[str]:
+        """Get the values of a subfield from the content of a data field."""
+        return [
+            i[1:].decode("utf-8").strip()
+            for i in field[2:].split(bytes([SUBFIELD_DELIMITER]))[1:]
+            if i[:1] == code.encode()
+        ]
+
+    def index(self, data: bytes) -> dict[str, Any] | None:
+        """
+        Build an index of the records in a MARC file.
+
+        Args:
+            data: the content of a MARC file.
+
+        Returns:
+            a JSON-serializable dictionary containing a list of `[offset, length]`
+            pairs for each record (`records`) and dictionaries mapping each
+            `control_number`, `isbn`, and `barcode` to a list of record positions,
+            or None if the file contains malformed records.
+        """
+        offsets = locate_records(data)
+        if offsets is None:
+            logger.warning("Unable to index MARC file containing malformed records.")
+            return None
+        with memoryview(data) as view:
+            tags = ("001", "020", *self.item_fields)
+            index: dict[str, Any] = {
+                "records": [],
+                "control_number": {},
+                "isbn": {},
+                "barcode": {},
+            }
+            try:
+                for position, (start, end) in enumerate(offsets):
+                    index["records"].append([start, end - start])
+                    keys: dict[str, list[str]] = {
+                        "control_number": [],
+                        "isbn": [],
+                        "barcode": [],
+                    }
+                    for tag, field in self._iter_fields(view, start, tags):
+                        if tag == "001":
+                            keys["control_number"].append(field.decode("utf-8").strip())
+                        elif tag == "020":
+                            keys["isbn"].extend(
+                                i.split(" ")[0].replace("-", "")
+                                for i in self._get_subfields(field, "a")
+                            )
+                        elif field[1:2].decode("ascii") == self.item_fields[tag]:
+                            keys["barcode"].extend(
+                                i
+                                for i in self._get_subfields(field, "i")
+                                if i.isdigit()
+                            )
+                    for key, values in keys.items():
+                        for value in dict.fromkeys(i for i in values if i):
+                            index[key].setdefault(value, []).append(position)
+            except (UnicodeDecodeError, ValueError) as exc:
+                logger.warning(f"Unable to index MARC file: {exc}")
+                return None
+            return index
+
+
+class VendorIdentifier:
+    """
+    Determine the vendor who created a record using compiled vendor rules.
+
+    Each vendor's `primary` and `alternate` tags are compiled into a rule made up
+    of `(tag, subfield code, value)` conditions. An index maps each condition to
+    the rules that contain it so the fields named in any rule are read from a
+    record once and the vendor is resolved in a single pass. A rule matches if a
+    field with each of its tags has the rule's value in the first subfield with
+    the rule's code. If more than one vendor matches, the vendor listed first in
+    the rules is returned.
+
+    Args:
+        rules: the vendor identification rules from the mapping specs.
+    """
+
+    def __init__(self, rules: dict[str, Any]) -> None:
+        self.rules = rules
+        self.sizes: list[int] = []
+        self.vendors: list[dict[str, Any]] = []
+        self.index: dict[tuple[str, str, str], list[int]] = {}
+        self.codes: dict[str, set[str]] = {}
+        for info in rules.values():
+            for key in ("primary", "alternate"):
+                tags = info["vendor_tags"].get(key, {})
+                if not tags:
+                    continue
+                position = len(self.vendors)
+                self.vendors.append(info)
+                self.sizes.append(len(tags))
+                for tag, data in tags.items():
+                    condition = (tag, data["code"], data["value"])
+                    self.index.setdefault(condition, []).append(position)
+                    self.codes.setdefault(tag, set()).add(data["code"])
+
+    def identify(self, record: Bib) -> dict[str, Any]:
+        """Get the rules for the vendor who created a record."""
+        seen = set()
+        counts: dict[int, int] = {}
+        for field in record.fields:
+            codes = self.codes.get(field.tag)
+            if codes is None:
+                continue
+            for code in codes:
+                condition = (field.tag, code, field.get(code))
+                positions = self.index.get(condition)
+                if positions is None or condition in seen:
+                    continue
+                seen.add(condition)
+                for position in positions:
+                    counts[position] = counts.get(position, 0) + 1
+        matched = [i for i, count in counts.items() if count == self.sizes[i]]
+        if matched:
+            return self.vendors[min(matched)]
+        return self.rules["UNKNOWN"]
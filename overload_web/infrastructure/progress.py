@@ -0,0 +1,193 @@
+"""In-memory progress tracking for processing jobs.
+
+Classes:
+
+`ProgressStore`
+    Holds the latest progress of each processing job and lets readers wait for
+    it to change, either in a thread or on an event loop.
+
+`ThrottledProgressReporter`
+    Counts records as a job processes them and publishes the counts to a
+    `ProgressStore` at most once per interval.
+"""
+
+from __future__ import annotations
+
+import asyncio
+import threading
+import time
+from typing import Any
+
+STAGES = ("parsed", "matched", "updated", "written", "errors")
+
+
+class ProgressStore:
+    """
+    Holds the latest progress of each processing job.
+
+    Progress is kept in memory so it is only visible to the process running the
+    job. Finished jobs are dropped from the store after `ttl` seconds. Jobs publish
+    progress from worker threads; readers on an event loop are woken with
+    `loop.call_soon_threadsafe` so that waiting does not hold a thread.
+
+    Args:
+        ttl: the number of seconds the progress of a finished job is kept.
+    """
+
+    def __init__(self, ttl: float = 3600) -> None:
+        self.ttl = ttl
+        self._changed = threading.Condition()
+        self._jobs: dict[str, dict[str, Any]] = {}
+        self._finished: dict[str, float] = {}
+        self._waiters: set[tuple[asyncio.AbstractEventLoop, asyncio.Event]] = set()
+
+    def _expire(self) -> None:
+        now = time.monotonic()
+        for job_id, finished in list(self._finished.items()):
+            if now - finished > self.ttl:
+                self._jobs.pop(job_id, None)
+                del self._finished[job_id]
+
+    def get(self, job_id: str) -> dict[str, Any] | None:
+        """Get the latest progress of a job or None if the job is not tracked."""
+        with self._changed:
+            progress = self._jobs.get(job_id)
+            return dict(progress) if progress else None
+
+    def publish(
+        self, job_id: str, counts: dict[str, int], status: str = "running"
+    ) -> None:
+        """
+        Publish the progress of a job and wake any readers waiting for it.
+
+        Args:
+            job_id: the ID of the job.
+            counts: the number of records that have reached each stage.
+            status: the status of the job (eg. `running`, `complete`, `failed`).
+        """
+        with self._changed:
+            self._expire()
+            version = self._jobs.get(job_id, {}).get("version", 0) + 1
+            done = status in ("complete", "failed")
+            self._jobs[job_id] = {
+                **counts,
+                "status": status,
+                "done": done,
+                "version": version,
+            }
+            if done:
+                self._finished[job_id] = time.monotonic()
+            self._changed.notify_all()
+            for loop, event in self._waiters:
+                if not loop.is_closed():
+                    loop.call_soon_threadsafe(event.set)
+
+    def reporter(self, job_id: str, interval: float = 0.5) -> ThrottledProgressReporter:
+        """Create a reporter that publishes a job's progress to this store."""
+        return ThrottledProgressReporter(store=self, job_id=job_id, interval=interval)
+
+    def wait(self, job_id: str, version: int, timeout: float) -> dict[str, Any] | None:
+        """
+        Wait for the progress of a job to change.
+
+        Args:
+            job_id: the ID of the job.
+            version: the version of the progress the reader has already seen.
+            timeout: the maximum number of seconds to wait.
+
+        Returns:
+            the latest progress of the job, which has the same `version` if it did
+            not change before the timeout, or None if the job is not tracked.
+        """
+        with self._changed:
+            self._changed.wait_for(
+                lambda: (
+                    job_id not in self._jobs or self._jobs[job_id]["version"] != version
+                ),
+                timeout=timeout,
+            )
+            progress = self._jobs.get(job_id)
+            return dict(progress) if progress else None
+
+    async def await_change(
+        self, job_id: str, version: int, timeout: float
+    ) -> dict[str, Any] | None:
+        """
+        Wait for the progress of a job to change without blocking a thread.
+
+        Behaves like `wait` but must be awaited on a running event loop.
+
+        Args:
+            job_id: the ID of the job.
+            version: the version of the progress the reader has already seen.
+            timeout: the maximum number of seconds to wait.
+
+        Returns:
+            the latest progress of the job, which has the same `version` if it did
+            not change before the timeout, or None if the job is not tracked.
+        """
+        loop = asyncio.get_running_loop()
+        waiter = (loop, asyncio.Event())
+        deadline = loop.time() + timeout
+        with self._changed:
+            self._waiters.add(waiter)
+        try:
+            while True:
+                waiter[1].clear()
+                progress = self.get(job_id)
+                remaining = deadline - loop.time()
+                if progress is None or progress["version"] != version:
+                    return progress
+                elif remaining <= 0:
+                    return progress
+                try:
+                    await asyncio.wait_for(waiter[1].wait(), timeout=remaining)
+                except TimeoutError:
+                    pass
+        finally:
+            with self._changed:
+                self._waiters.discard(waiter)
+
+
+class ThrottledProgressReporter:
+    """
+    Counts records as a job processes them.
+
+    This class is a concrete implementation of the `ProgressReporter` protocol.
+    Counts are kept locally and only published to the store if `interval` seconds
+    have passed since they were last published, so reporting each record adds
+    little overhead to processing.
+
+    Args:
+        store: the `ProgressStore` to publish counts to.
+        job_id: the ID of the job.
+        interval: the minimum number of seconds between published updates.
+    """
+
+    def __init__(
+        self, store: ProgressStore, job_id: str, interval: float = 0.5
+    ) -> None:
+        self.store = store
+        self.job_id = job_id
+        self.interval = interval
+        self.counts = dict.fromkeys(STAGES, 0)
+        self._published = 0.0
+        self.store.publish(job_id, dict(self.counts), status="queued")
+
+    def advance(self, stage: str, count: int = 1) -> None:
+        """
+        Record that a number of records have reached a stage of processing.
+
+        Args:
+            stage: one of `parsed`, `matched`, `updated`, `written`, or `errors`.
+            count: the number of records.
+        """
+        self.counts[stage] += count
+        now = time.monotonic()
+        if now - self._published >= self.interval:
+            self._published = now
+            self.store.publish(self.job_id, dict(self.counts))
+
+    def finish(self, status: str) -> None:
+        """Publish the final counts and status of the job."""
+        self.store.publish(self.job_id, dict(self.counts), status=status)
@@ -0,0 +1,385 @@
+"""Rate limiting and retries for queries sent to Sierra.
+
+BPL's Solr service and NYPL's Platform service both throttle clients that send
+too many requests. This module provides a `Throttle` that paces requests with an
+adaptive token bucket and retries requests that fail with a 429 or 5xx response
+or with a connection or timeout error using jittered exponential backoff. Any
+other error is raised immediately. Retries are drawn from a budget so that an
+outage does not multiply the load on the service.
+
+Classes:
+
+`AdaptiveRateLimiter`
+    a token bucket whose rate increases additively while requests succeed and
+    decreases multiplicatively when the service throttles requests.
+`ExponentialBackoff`
+    calculates full-jitter exponential backoff delays.
+`RetryBudget`
+    limits retries to a fraction of the requests that have been sent.
+`Throttle`
+    combines the above to send a request, retrying it if necessary.
+
+Exceptions:
+
+`RetryError`
+    raised when a request still receives a retryable response after all retries
+    have been used.
+"""
+
+from __future__ import annotations
+
+import asyncio
+import logging
+import random
+import threading
+import time
+from typing import Any, Awaitable, Callable, TypeVar
+
+logger = logging.getLogger(__name__)
+
+R = TypeVar("R")  # variable for the response returned by a request
+
+RETRY_STATUSES = frozenset([429, 500, 502, 503, 504])
+
+
+class RetryError(Exception):
+    """Raised when a request is still throttled or failing after all retries."""
+
+    def __init__(self, status_code: int, attempts: int) -> None:
+        self.status_code = status_code
+        self.attempts = attempts
+        super().__init__(
+            f"Request failed with status code {status_code} after {attempts} attempts."
+        )
+
+
+class AdaptiveRateLimiter:
+    """
+    A thread-safe token bucket whose rate adapts to the responses of a service.
+
+    The rate increases by `increase` requests per second after each successful
+    request, up to `max_rate`, and is multiplied by `decrease` each time the
+    service throttles a request, down to `min_rate`.
+    """
+
+    def __init__(
+        self,
+        rate: float = 10.0,
+        min_rate: float = 1.0,
+        max_rate: float = 50.0,
+        increase: float = 0.5,
+        decrease: float = 0.5,
+        clock: Callable[[], float] = time.monotonic,
+    ) -> None:
+        """
+        Initialize the rate limiter.
+
+        Args:
+            rate: the initial number of requests allowed per second.
+            min_rate: the lowest rate the limiter will decrease to.
+            max_rate: the highest rate the limiter will increase to.
+            increase: the amount to add to the rate after a successful request.
+            decrease: the factor to multiply the rate by when throttled.
+            clock: a function that returns the current time in seconds.
+
+        Raises:
+            ValueError: if the rates are not positive or `rate` is out of bounds.
+        """
+        if not 0 < min_rate <= rate <= max_rate:
+            raise ValueError("Rates must satisfy 0 < min_rate <= rate <= max_rate.")
+        self.rate = rate
+        self.min_rate = min_rate
+        self.max_rate = max_rate
+        self.increase = increase
+        self.decrease = decrease
+        self._clock = clock
+        self._tokens = 1.0
+        self._updated = clock()
+        self._lock = threading.Lock()
+
+    def reserve(self) -> float:
+        """
+        Reserve a token for a request.
+
+        Returns:
+            the number of seconds to wait before sending the request.
+        """
+        with self._lock:
+            now = self._clock()
+            self._tokens = min(1.0, self._tokens + (now - self._updated) * self.rate)
+            self._updated = now
+            self._tokens -= 1.0
+            if self._tokens >= 0:
+                return 0.0
+            return -self._tokens / self.rate
+
+    def on_success(self) -> None:
+        """Increase the rate after a successful request."""
+        with self._lock:
+            self.rate = min(self.max_rate, self.rate + self.increase)
+
+    def on_throttle(self) -> None:
+        """Decrease the rate after the service throttled a request."""
+        with self._lock:
+            self.rate = max(self.min_rate, self.rate * self.decrease)
+            logger.info(f"Sierra request rate decreased to {self.rate:.2f}/s.")
+
+
+class ExponentialBackoff:
+    """Calculates delays between retries using full-jitter exponential backoff."""
+
+    def __init__(
+        self,
+        base: float = 0.5,
+        cap: float = 30.0,
+        jitter: Callable[[float, float], float] = random.uniform,
+    ) -> None:
+        """
+        Initialize the backoff calculator.
+
+        Args:
+            base: the maximum delay in seconds before the first retry.
+            cap: the maximum delay in seconds before any retry.
+            jitter: a function returning a random number between two bounds.
+        """
+        self.base = base
+        self.cap = cap
+        self._jitter = jitter
+
+    def delay(self, attempt: int) -> float:
+        """Get the number of seconds to wait before retry number `attempt + 1`."""
+        return self._jitter(0, min(self.cap, self.base * 2**attempt))
+
+
+class RetryBudget:
+    """
+    Limits retries to a fraction of the requests sent.
+
+    Each request deposits `ratio` tokens into the budget, up to `max_tokens`, and
+    each retry withdraws one token. When the budget is empty requests are not
+    retried.
+    """
+
+    def __init__(self, ratio: float = 0.2, max_tokens: float = 10.0) -> None:
+        """
+        Initialize the retry budget.
+
+        Args:
+            ratio: the number of retries allowed per request sent.
+            max_tokens: the maximum number of retries that can be saved up.
+        """
+        self.ratio = ratio
+        self.max_tokens = max_tokens
+        self._tokens = max_tokens
+        self._lock = threading.Lock()
+
+    @property
+    def tokens(self) -> float:
+        """The number of retries currently available."""
+        return self._tokens
+
+    def deposit(self) -> None:
+        """Record a request."""
+        with self._lock:
+            self._tokens = min(self.max_tokens, self._tokens + self.ratio)
+
+    def withdraw(self) -> bool:
+        """Record a retry if the budget allows it."""
+        with self._lock:
+            if self._tokens < 1:
+                return False
+            self._tokens -= 1
+            return True
+
+
+class Throttle:
+    """
+    Paces requests to a service and retries requests that fail transiently.
+
+    A single `Throttle` should be shared by all requests sent to the same service
+    so that its rate limiter and retry budget reflect the service's overall load.
+    """
+
+    def __init__(
+        self,
+        name: str,
+        limiter: AdaptiveRateLimiter | None = None,
+        backoff: ExponentialBackoff | None = None,
+        budget: RetryBudget | None = None,
+        max_attempts: int = 4,
+        retry_exceptions: tuple[type[Exception], ...] = (),
+        retry_statuses: frozenset[int] = RETRY_STATUSES,
+        sleep: Callable[[float], None] = time.sleep,
+    ) -> None:
+        """
+        Initialize the throttle.
+
+        Args:
+            name: the name of the service (eg. the library).
+            limiter: the `AdaptiveRateLimiter` used to pace requests.
+            backoff: the `ExponentialBackoff` used to calculate retry delays.
+            budget: the `RetryBudget` shared by all requests.
+            max_attempts: the maximum number of times to send a request.
+            retry_exceptions:
+                connection and timeout exceptions that indicate a request can be
+                retried. Exceptions raised while handling one of these (eg. a
+                `BookopsSolrError` raised from a `requests.Timeout`) are also
+                retried.
+            retry_statuses: response status codes that indicate a request can be
+                retried.
+            sleep: a function used to wait a number of seconds.
+
+        Raises:
+            ValueError: if `max_attempts` is less than 1.
+        """
+        if max_attempts < 1:
+            raise ValueError("`max_attempts` must be greater than or equal to 1.")
+        self.name = name
+        self.limiter = limiter or AdaptiveRateLimiter()
+        self.backoff = backoff or ExponentialBackoff()
+        self.budget = budget or RetryBudget()
+        self.max_attempts = max_attempts
+        self.retry_exceptions = retry_exceptions
+        self.retry_statuses = retry_statuses
+        self._sleep = sleep
+
+    def _status_code(self, obj: Any) -> int | None:
+        """Get the status code of a response or of the response on an exception."""
+        response = getattr(obj, "response", obj)
+        return getattr(response, "status_code", None)
+
+    def _retry_delay(self, attempt: int, status_code: int | None, obj: Any) -> float:
+        """
+        Get the delay before retrying a request.
+
+        Args:
+            attempt: the number of attempts that have already been retried.
+            status_code: the status code of the failed response, if any.
+            obj: the failed response or the exception raised by the request.
+
+        Returns:
+            the number of seconds to wait or -1 if the request should not be retried.
+        """
+        if status_code in (429, 503):
+            self.limiter.on_throttle()
+        if attempt + 1 >= self.max_attempts or not self.budget.withdraw():
+            return -1
+        delay = self.backoff.delay(attempt)
+        headers = getattr(getattr(obj, "response", obj), "headers", None) or {}
+        retry_after = headers.get("Retry-After")
+        if retry_after is not None and str(retry_after).isdigit():
+            delay = max(delay, float(retry_after))
+        logger.warning(
+            f"Retrying {self.name} Sierra request after "
+            f"{status_code or obj.__class__.__name__} in {delay:.2f}s "
+            f"(attempt {attempt + 2} of {self.max_attempts})."
+        )
+        return delay
+
+    def _check(self, response: Any, attempt: int) -> float | None:
+        """
+        Determine whether a response should be returned or the request retried.
+
+        Returns:
+            None if the response should be returned, otherwise the number of
+            seconds to wait before retrying the request.
+        """
+        status_code = self._status_code(response)
+        if status_code not in self.retry_statuses:
+            self.limiter.on_success()
+            return None
+        delay = self._retry_delay(attempt, status_code, response)
+        if delay < 0:
+            raise RetryError(status_code=status_code or 0, attempts=attempt + 1)
+        return delay
+
+    def _is_transient(self, exc: BaseException) -> bool:
+        """Determine whether an exception, or an exception it wraps, is retryable."""
+        seen: set[int] = set()
+        error: BaseException | None = exc
+        while error is not None and id(error) not in seen:
+            seen.add(id(error))
+            if isinstance(error, self.retry_exceptions):
+                return True
+            error = error.__cause__ or error.__context__
+        return False
+
+    def _handle_exception(self, exc: Exception, attempt: int) -> float:
+        """Determine whether a request that raised an exception should be retried."""
+        status_code = self._status_code(exc)
+        if status_code is not None:
+            if status_code not in self.retry_statuses:
+                return -1
+        elif not self._is_transient(exc):
+            return -1
+        return self._retry_delay(attempt, status_code, exc)
+
+    def call(self, func: Callable[[], R]) -> R:
+        """
+        Send a request, retrying it if it fails transiently.
+
+        Args:
+            func: a function that sends the request and returns its response.
+
+        Returns:
+            the response to the request.
+
+        Raises:
+            RetryError:
+                if the response has a retryable status code after all retries.
+            Exception:
+                any exception raised by the request that cannot be retried, or
+                that is still raised after all retries.
+        """
+        self.budget.deposit()
+        attempt = 0
+        while True:
+            self._sleep(self.limiter.reserve())
+            try:
+                response = func()
+            except Exception as exc:
+                delay = self._handle_exception(exc, attempt)
+                if delay < 0:
+                    raise
+            else:
+                checked = self._check(response, attempt)
+                if checked is None:
+                    return response
+                delay = checked
+            self._sleep(delay)
+            attempt += 1
+
+    async def acall(self, func: Callable[[], Awaitable[R]]) -> R:
+        """
+        Send a request from a coroutine, retrying it if it fails transiently.
+
+        Args:
+            func: a function that returns an awaitable that sends the request.
+
+        Returns:
+            the response to the request.
+
+        Raises:
+            RetryError:
+                if the response has a retryable status code after all retries.
+            Exception:
+                any exception raised by the request that cannot be retried, or
+                that is still raised after all retries.
+        """
+        self.budget.deposit()
+        attempt = 0
+        while True:
+            await asyncio.sleep(self.limiter.reserve())
+            try:
+                response = await func()
+            except Exception as exc:
+                delay = self._handle_exception(exc, attempt)
+                if delay < 0:
+                    raise
+            else:
+                checked = self._check(response, attempt)
+                if checked is None:
+                    return response
+                delay = checked
+            await asyncio.sleep(delay)
+            attempt += 1
@@ -45,12 +45,25 @@ logging.config.dictConfig(get_log_config())
 
 @asynccontextmanager
 async def lifespan(app: FastAPI) -> AsyncGenerator[None, None]:
-    """Create and drop database tables on startup/shutdown."""
+    """
+    Create and drop database tables, fail jobs interrupted by the last shutdown,
+    load MARC engine configs, and open and close Sierra sessions on
+    startup/shutdown.
+    """
     logger.info("Starting up Overload...")
     engine = deps.get_engine_with_uri()
     deps.create_db_and_tables(engine)
+    deps.fail_interrupted_jobs(engine)
+    deps.get_marc_engine_configs()
+    session_pool = deps.get_session_pool()
+    session_pool.warm(use_async=deps.use_async_fetcher())
     yield
     logger.info("Shutting down Overload...")
+    deps.get_job_runner().shutdown()
+    process_pool = deps.get_process_pool()
+    if process_pool is not None:
+        process_pool.shutdown()
+    session_pool.close()
     engine.dispose()
 
 
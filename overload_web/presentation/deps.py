@@ -2,26 +2,38 @@
 
 from __future__ import annotations
 
-import json
 import logging
+import multiprocessing
 import os
+from concurrent.futures import ProcessPoolExecutor
+from functools import lru_cache
+from pathlib import Path
 from typing import Annotated, Any, Generator, Literal
 
 from fastapi import Depends, Form
 from pydantic import BaseModel, field_validator, model_validator
+from sqlalchemy import Engine, inspect, text
 from sqlmodel import Session, SQLModel, create_engine
 
+from overload_web.application.commands.jobs import FailInterruptedProcessingJobs
 from overload_web.infrastructure import (
+    async_clients,
     batch_db,
+    cache,
     clients,
     file_io,
+    jobs,
     marc_engine,
+    progress,
     reporter,
     template_db,
+    throttling,
 )
 
 logger = logging.getLogger(__name__)
 
+DATA_DIR = Path(__file__).resolve().parent.parent / "data"
+
 
 class MatchpointsModel(BaseModel):
     """Pydantic model for serializing/deserializing matchpoints from order templates"""
@@ -276,6 +288,54 @@ def get_engine_with_uri():
 def create_db_and_tables(engine) -> None:
     """Create the database and tables if they do not exist."""
     SQLModel.metadata.create_all(engine)
+    upgrade_db_schema(engine)
+
+
+def upgrade_db_schema(engine: Engine) -> list[str]:
+    """
+    Add columns that are missing from existing tables.
+
+    `create_all` does not alter tables that already exist so columns added to a
+    model after its table was created are added here, along with their indexes.
+    Only nullable columns can be added.
+
+    Args:
+        engine: the engine for the database to upgrade.
+
+    Returns:
+        the added columns as a list of `table.column` strings.
+    """
+    existing_tables = set(inspect(engine).get_table_names())
+    added = []
+    with engine.begin() as conn:
+        for table in SQLModel.metadata.sorted_tables:
+            if table.name not in existing_tables:
+                continue
+            existing = {i["name"] for i in inspect(conn).get_columns(table.name)}
+            missing = [i for i in table.columns if i.name not in existing]
+            for column in missing:
+                column_type = column.type.compile(dialect=engine.dialect)
+                conn.execute(
+                    text(
+                        f"ALTER TABLE {table.name} "
+                        f"ADD COLUMN {column.name} {column_type}"
+                    )
+                )
+                added.append(f"{table.name}.{column.name}")
+            for index in table.indexes:
+                if any(i in missing for i in index.columns):
+                    index.create(conn)
+    if added:
+        logger.info(f"Added columns to database: {added}")
+    return added
+
+
+def fail_interrupted_jobs(engine: Engine) -> list[str]:
+    """Mark processing jobs that did not finish before the last shutdown as failed."""
+    with Session(engine) as session:
+        return FailInterruptedProcessingJobs.execute(
+            repo=batch_db.PVFJobRepository(session=session)
+        )
 
 
 def get_session(
@@ -305,6 +365,50 @@ def pvf_batch_db(
     yield batch_db.PVFBatchRepository(session=session)
 
 
+def pvf_job_db(
+    session: Annotated[Any, Depends(get_session)],
+) -> Generator[batch_db.PVFJobRepository, None, None]:
+    """Create an PVFJob repository."""
+    yield batch_db.PVFJobRepository(session=session)
+
+
+@lru_cache
+def get_job_runner() -> jobs.ThreadPoolJobRunner:
+    """
+    Get the runner shared by all requests for background processing jobs.
+
+    The number of jobs run at once is read from the `PVF_JOB_WORKERS` environment
+    variable. Defaults to 2.
+    """
+    return jobs.ThreadPoolJobRunner(
+        engine=get_engine_with_uri(),
+        max_workers=max(int(os.environ.get("PVF_JOB_WORKERS", 2)), 1),
+    )
+
+
+@lru_cache
+def get_process_pool() -> ProcessPoolExecutor | None:
+    """
+    Get the pool of processes shared by all requests for parsing and updating files.
+
+    The number of processes is read from the `PVF_PROCESS_WORKERS` environment
+    variable. Defaults to 0, in which case files are processed by the job's own
+    thread and no pool is created.
+    """
+    workers = int(os.environ.get("PVF_PROCESS_WORKERS", 0))
+    if workers < 1:
+        return None
+    return ProcessPoolExecutor(
+        max_workers=workers, mp_context=multiprocessing.get_context("spawn")
+    )
+
+
+@lru_cache
+def get_progress_store() -> progress.ProgressStore:
+    """Get the store shared by all requests for the progress of processing jobs."""
+    return progress.ProgressStore()
+
+
 def incoming_file_db(
     session: Annotated[Any, Depends(get_session)],
 ) -> Generator[file_io.IncomingFileRepository, None, None]:
@@ -316,38 +420,143 @@ def local_file_storage() -> file_io.LocalFileStorage:
     return file_io.LocalFileStorage()
 
 
+def output_file_storage() -> file_io.LocalFileStorage:
+    """Create storage for the files written by processing jobs."""
+    return file_io.LocalFileStorage(base_path="temp/output")
+
+
+def get_record_indexer() -> marc_engine.MarcRecordIndexer:
+    """Create a service to index the records in uploaded MARC files."""
+    return marc_engine.MarcRecordIndexer()
+
+
+def get_record_counter() -> marc_engine.MarcRecordCounter:
+    """Create a service to count the records in a MARC file as it is uploaded."""
+    return marc_engine.MarcRecordCounter()
+
+
 def remote_file_loader(vendor: str) -> Generator[file_io.SFTPFileLoader, None, None]:
     """Create an SFTP file loader service."""
     yield file_io.SFTPFileLoader.create_loader_for_vendor(vendor=vendor)
 
 
+@lru_cache
+def get_bib_cache() -> cache.TTLCache:
+    """
+    Get the cache of Sierra candidates shared by all requests.
+
+    The maximum number of entries and the number of seconds an entry is kept are
+    read from the `SIERRA_CACHE_SIZE` and `SIERRA_CACHE_TTL` environment variables.
+    Default to 10,000 entries and one hour.
+    """
+    return cache.TTLCache(
+        maxsize=int(os.environ.get("SIERRA_CACHE_SIZE", 10_000)),
+        ttl=float(os.environ.get("SIERRA_CACHE_TTL", 3600)),
+    )
+
+
+@lru_cache
+def get_session_pool() -> clients.SierraSessionPool:
+    """Get the pool of Sierra sessions shared by all requests."""
+    return clients.SierraSessionPool()
+
+
+@lru_cache
+def get_throttle(library: str) -> throttling.Throttle:
+    """
+    Get the throttle shared by all queries sent to a library's Sierra instance.
+
+    The initial number of queries per second and the maximum number of times a
+    query is sent are read from the `SIERRA_RATE_LIMIT` and `SIERRA_MAX_ATTEMPTS`
+    environment variables. Default to 10 queries per second and 4 attempts.
+    """
+    rate = float(os.environ.get("SIERRA_RATE_LIMIT", 10))
+    return throttling.Throttle(
+        name=library,
+        limiter=throttling.AdaptiveRateLimiter(
+            rate=rate, min_rate=min(1.0, rate), max_rate=max(50.0, rate)
+        ),
+        max_attempts=int(os.environ.get("SIERRA_MAX_ATTEMPTS", 4)),
+        retry_exceptions=clients.RETRY_EXCEPTIONS,
+    )
+
+
+def use_async_fetcher() -> bool:
+    """
+    Determine whether Sierra should be queried with the asynchronous client.
+
+    Read from the `SIERRA_ASYNC_CLIENT` environment variable. Defaults to False.
+    """
+    return os.environ.get("SIERRA_ASYNC_CLIENT", "").casefold() in ["1", "true"]
+
+
 def get_fetcher(
     library: Annotated[str, Form(...)],
-) -> Generator[clients.SierraBibFetcher, None, None]:
-    """Create a Sierra bib fetcher service for a library."""
-    yield clients.FetcherFactory().make(library)
+    bib_cache: Annotated[cache.TTLCache, Depends(get_bib_cache)],
+    pool: Annotated[clients.SierraSessionPool, Depends(get_session_pool)],
+    use_async: Annotated[bool, Depends(use_async_fetcher)],
+) -> cache.CachedSierraBibFetcher:
+    """
+    Create a Sierra bib fetcher service for a library.
+
+    The fetcher is used by a background job that outlives the request, so it is
+    not closed when the request ends. Pass it to `close_fetcher` once the job
+    has finished.
+    """
+    fetcher = clients.FetcherFactory().make(
+        library, pool=pool, use_async=use_async, throttle=get_throttle(library)
+    )
+    return cache.CachedSierraBibFetcher.wrap(
+        fetcher=fetcher, cache=bib_cache, library=library
+    )
+
+
+def close_fetcher(fetcher: cache.CachedSierraBibFetcher) -> None:
+    """
+    Close the event loop and client owned by an asynchronous fetcher.
+
+    Fetchers that use the sessions and event loop in the `SierraSessionPool` are
+    left open; these are closed when the application shuts down.
+    """
+    if isinstance(fetcher.fetcher, async_clients.AsyncSierraBibFetcher):
+        fetcher.fetcher.close()
+
+
+def get_match_workers() -> int:
+    """
+    Get the maximum number of concurrent Sierra queries to run while matching.
+
+    The limit is read from the `SIERRA_MAX_WORKERS` environment variable so that
+    it can be tuned to respect the query limits of BPL's Solr service and NYPL's
+    Platform service. Defaults to 4.
+    """
+    return max(int(os.environ.get("SIERRA_MAX_WORKERS", 4)), 1)
+
+
+@lru_cache
+def get_marc_engine_configs() -> marc_engine.MarcEngineConfigRegistry:
+    """
+    Get the `MarcEngineConfig` objects shared by all requests.
+
+    The configs are loaded from `overload_web/data/mapping_specs.json` the first
+    time this is called. Call `reload` on the registry to pick up changes to the
+    file.
+    """
+    return marc_engine.MarcEngineConfigRegistry(path=DATA_DIR / "mapping_specs.json")
 
 
 def get_marc_engine(
     context: Annotated[ProcessingContext, Depends(ProcessingContext.from_form)],
+    configs: Annotated[
+        marc_engine.MarcEngineConfigRegistry, Depends(get_marc_engine_configs)
+    ],
 ) -> Generator[marc_engine.MarcEngine, None, None]:
     """Create a `MarcEngine` service with injected dependencies."""
-    with open("overload_web/data/mapping_specs.json", "r", encoding="utf-8") as fh:
-        constants = json.load(fh)
-    config = marc_engine.MarcEngineConfig(
-        marc_order_mapping=constants["marc_order_mapping"],
-        default_loc=constants["default_locations"][context.library].get(
-            context.collection
-        ),
-        bib_id_tag=constants["bib_id_tag"][context.library],
+    yield configs.engine(
         library=context.library,
-        record_type=context.record_type,
         collection=context.collection,
-        parser_bib_mapping=constants["bib_domain_mapping"],
-        parser_order_mapping=constants["order_domain_mapping"],
-        parser_vendor_mapping=constants["vendor_info_options"][context.library],
+        record_type=context.record_type,
     )
-    yield marc_engine.MarcEngine(rules=config)
 
 
 def get_report_handler() -> reporter.PandasReportHandler:
@@ -6,13 +6,14 @@ import logging
 import os
 from typing import Annotated, Any
 
-from fastapi import APIRouter, Depends, Form, Request, UploadFile
-from fastapi.responses import HTMLResponse
+from fastapi import APIRouter, Depends, Form, HTTPException, Request, UploadFile
+from fastapi.responses import HTMLResponse, Response
 
 from overload_web.application.commands.file_io import (
     DeleteFileFromWorkflow,
     ListVendorFiles,
     LoadVendorFile,
+    LoadWorkflowRecords,
     UploadFileToWorkflow,
 )
 from overload_web.presentation import deps
@@ -54,6 +55,8 @@ def select_ftp_file(
     repository: Annotated[Any, Depends(deps.incoming_file_db)],
     storage: Annotated[Any, Depends(deps.local_file_storage)],
     ftp: Annotated[Any, Depends(deps.remote_file_loader)],
+    indexer: Annotated[Any, Depends(deps.get_record_indexer)],
+    counter: Annotated[Any, Depends(deps.get_record_counter)],
     workflow_id: Annotated[str, Form(...)],
     remote_file: Annotated[str, Form(...)],
 ):
@@ -66,11 +69,17 @@ def select_ftp_file(
         source="ftp",
         storage=storage,
         repo=repository,
+        indexer=indexer,
+        counter=counter,
     )
     return request.app.state.templates.TemplateResponse(
         name="pvf_partials/selected_files.html",
         request=request,
-        context={"files": selected},
+        context={
+            "files": selected["files"],
+            "uploaded": remote_file,
+            "duplicate_of": selected["duplicate_of"],
+        },
     )
 
 
@@ -80,21 +89,29 @@ def upload_file(
     file: UploadFile,
     repository: Annotated[Any, Depends(deps.incoming_file_db)],
     storage: Annotated[Any, Depends(deps.local_file_storage)],
+    indexer: Annotated[Any, Depends(deps.get_record_indexer)],
+    counter: Annotated[Any, Depends(deps.get_record_counter)],
     workflow_id: Annotated[str, Form(...)],
 ):
     selected = UploadFileToWorkflow.execute(
         workflow_id=workflow_id,
         filename=str(file.filename),
-        content=file.file.read(),
+        content=file.file,
         source="local",
         storage=storage,
         repo=repository,
+        indexer=indexer,
+        counter=counter,
     )
-    logger.info(f"Current file list: {selected}")
+    logger.info(f"Current file list: {selected['files']}")
     return request.app.state.templates.TemplateResponse(
         name="pvf_partials/selected_files.html",
         request=request,
-        context={"files": selected},
+        context={
+            "files": selected["files"],
+            "uploaded": file.filename,
+            "duplicate_of": selected["duplicate_of"],
+        },
     )
 
 
@@ -114,3 +131,39 @@ def remove_file(
         request=request,
         context={"files": selected},
     )
+
+
+@api_router.get("/{file_id}/records")
+def get_file_records(
+    repository: Annotated[Any, Depends(deps.incoming_file_db)],
+    storage: Annotated[Any, Depends(deps.local_file_storage)],
+    indexer: Annotated[Any, Depends(deps.get_record_indexer)],
+    file_id: str,
+    key: str,
+    value: str,
+) -> Response:
+    """
+    Get records from a workflow file without reading the rest of the file.
+
+    Args:
+        file_id: the id of the file containing the records
+        key: the key used to identify the records (eg. `record` or `isbn`)
+        value: the value of the key for the records
+
+    Returns:
+        the matching records as MARC binary wrapped in a `Response` object
+    """
+    try:
+        records = LoadWorkflowRecords.execute(
+            file_id=file_id,
+            key=key,
+            value=value,
+            storage=storage,
+            repo=repository,
+            indexer=indexer,
+        )
+    except ValueError as exc:
+        raise HTTPException(status_code=400, detail=str(exc))
+    if not records:
+        raise HTTPException(status_code=404, detail=f"No records found for {key}")
+    return Response(content=b"".join(records), media_type="application/marc")
@@ -2,18 +2,22 @@
 
 from __future__ import annotations
 
+import json
 import logging
-from typing import Annotated, Any
+from functools import partial
+from typing import Annotated, Any, AsyncIterator
 
 from fastapi import APIRouter, Depends, Form, Request
-from fastapi.responses import HTMLResponse
+from fastapi.responses import HTMLResponse, StreamingResponse
 
 from overload_web.application.commands.file_io import LoadAllWorkflowFiles
+from overload_web.application.commands.jobs import GetProcessingJob, SubmitProcessingJob
 from overload_web.application.commands.process import (
     ProcessAcquisitionsRecords,
     ProcessCatalogingRecords,
     ProcessSelectionRecords,
 )
+from overload_web.domain.models.files import VendorFileBatch
 from overload_web.presentation import deps
 
 logger = logging.getLogger(__name__)
@@ -32,6 +36,23 @@ def load_files(
     )
 
 
+def render_job(
+    request: Request, job: dict[str, Any] | None, store: Any
+) -> HTMLResponse:
+    """Render a job's status and progress, or its results once it is complete."""
+    return request.app.state.templates.TemplateResponse(
+        request=request,
+        name="pvf_partials/pvf_job.html",
+        context={"job": job, "progress": store.get(job["id"]) if job else None},
+    )
+
+
+def format_event(event: str, data: str) -> str:
+    """Format a server-sent event. Each line of `data` is sent as a `data` field."""
+    lines = "".join(f"data: {line}\n" for line in data.splitlines() or [""])
+    return f"event: {event}\n{lines}\n"
+
+
 @api_router.post("/acq/process-vendor-file", response_class=HTMLResponse)
 def process_acq_records(
     request: Request,
@@ -39,12 +60,20 @@ def process_acq_records(
     order_template: Annotated[Any, Depends(deps.TemplateDataModel.from_form)],
     marc_engine: Annotated[Any, Depends(deps.get_marc_engine)],
     matchpoints: Annotated[Any, Depends(deps.MatchpointsModel.from_form)],
-    repository: Annotated[Any, Depends(deps.pvf_batch_db)],
+    repository: Annotated[Any, Depends(deps.pvf_job_db)],
+    runner: Annotated[Any, Depends(deps.get_job_runner)],
+    store: Annotated[Any, Depends(deps.get_progress_store)],
     files: Annotated[Any, Depends(load_files)],
+    max_workers: Annotated[int, Depends(deps.get_match_workers)],
+    executor: Annotated[Any, Depends(deps.get_process_pool)],
+    output: Annotated[Any, Depends(deps.output_file_storage)],
 ) -> HTMLResponse:
     """
     Process one or more files of order-level MARC records using the acq workflow.
 
+    The files are processed by a background job. The response streams the
+    job's progress until the job is complete.
+
     Args:
         fetcher:
             a `ports.BibFetcher` object used by application service.
@@ -56,27 +85,43 @@ def process_acq_records(
             a list of matchpoints loaded from an order template in the database or
             input via an html form.
         repository:
-            a `repository.PVFBatchRepository` object where the processed files and
-            their associated statistics will be saved.
+            a `repository.PVFJobRepository` object where the job is saved.
+        runner:
+            a `ports.JobRunner` object that runs the job in the background.
+        store:
+            a `progress.ProgressStore` object where the job's progress is kept.
         files:
             a list of files to be processed.
+        max_workers:
+            the maximum number of concurrent Sierra queries used while matching.
+        executor:
+            an optional process pool used to parse and update files in parallel.
+        output:
+            a `ports.FileStorage` object to which the processed files are written.
 
     Returns:
-        the ID for the processed files and stats wrapped in an `HTMLResponse` object
+        the ID and status of the job wrapped in an `HTMLResponse` object
     """
-    processed = ProcessAcquisitionsRecords.execute(
-        batches={f"{i.file_name}": i.content for i in files},
-        marc_engine=marc_engine,
-        fetcher=fetcher,
-        template_data=order_template.model_dump(),
-        matchpoints=matchpoints.model_dump(),
+    batches = VendorFileBatch(files)
+    job = SubmitProcessingJob.execute(
+        record_type="acq",
+        task=partial(
+            ProcessAcquisitionsRecords.execute,
+            batches=batches,
+            marc_engine=marc_engine,
+            fetcher=fetcher,
+            template_data=order_template.model_dump(),
+            matchpoints=matchpoints.model_dump(),
+            max_workers=max_workers,
+            executor=executor,
+            output=output,
+        ),
+        runner=runner,
         repo=repository,
+        cleanup=[batches.close, partial(deps.close_fetcher, fetcher)],
+        progress=store.reporter,
     )
-    return request.app.state.templates.TemplateResponse(
-        request=request,
-        name="pvf_partials/pvf_results.html",
-        context={"batch_id": processed["id"], "record_type": "acq"},
-    )
+    return render_job(request, job, store)
 
 
 @api_router.post("/cat/process-vendor-file", response_class=HTMLResponse)
@@ -84,37 +129,57 @@ def process_cat_records(
     request: Request,
     fetcher: Annotated[Any, Depends(deps.get_fetcher)],
     marc_engine: Annotated[Any, Depends(deps.get_marc_engine)],
-    repository: Annotated[Any, Depends(deps.pvf_batch_db)],
+    repository: Annotated[Any, Depends(deps.pvf_job_db)],
+    runner: Annotated[Any, Depends(deps.get_job_runner)],
+    store: Annotated[Any, Depends(deps.get_progress_store)],
     files: Annotated[Any, Depends(load_files)],
+    max_workers: Annotated[int, Depends(deps.get_match_workers)],
+    output: Annotated[Any, Depends(deps.output_file_storage)],
 ) -> HTMLResponse:
     """
     Process one or more files of full-level MARC records using the cat workflow.
 
+    The files are processed by a background job. The response streams the
+    job's progress until the job is complete.
+
     Args:
         fetcher:
             a `ports.BibFetcher` object used by application service.
         marc_engine:
             a `ports.MarcEnginePort` object used by application service.
         repository:
-            a `repository.PVFBatchRepository` object where the processed files and
-            their associated statistics will be saved.
+            a `repository.PVFJobRepository` object where the job is saved.
+        runner:
+            a `ports.JobRunner` object that runs the job in the background.
+        store:
+            a `progress.ProgressStore` object where the job's progress is kept.
         files:
             a list of files to be processed.
+        max_workers:
+            the maximum number of concurrent Sierra queries used while matching.
+        output:
+            a `ports.FileStorage` object to which the processed files are written.
 
     Returns:
-        the ID for the processed files and stats wrapped in an `HTMLResponse` object
+        the ID and status of the job wrapped in an `HTMLResponse` object
     """
-    processed = ProcessCatalogingRecords.execute(
-        batches={f"{i.file_name}": i.content for i in files},
-        marc_engine=marc_engine,
-        fetcher=fetcher,
+    batches = VendorFileBatch(files)
+    job = SubmitProcessingJob.execute(
+        record_type="cat",
+        task=partial(
+            ProcessCatalogingRecords.execute,
+            batches=batches,
+            marc_engine=marc_engine,
+            fetcher=fetcher,
+            max_workers=max_workers,
+            output=output,
+        ),
+        runner=runner,
         repo=repository,
+        cleanup=[batches.close, partial(deps.close_fetcher, fetcher)],
+        progress=store.reporter,
     )
-    return request.app.state.templates.TemplateResponse(
-        request=request,
-        name="pvf_partials/pvf_results.html",
-        context={"batch_id": processed["id"], "record_type": "cat"},
-    )
+    return render_job(request, job, store)
 
 
 @api_router.post("/sel/process-vendor-file", response_class=HTMLResponse)
@@ -124,12 +189,20 @@ def process_sel_records(
     order_template: Annotated[Any, Depends(deps.TemplateDataModel.from_form)],
     marc_engine: Annotated[Any, Depends(deps.get_marc_engine)],
     matchpoints: Annotated[Any, Depends(deps.MatchpointsModel.from_form)],
-    repository: Annotated[Any, Depends(deps.pvf_batch_db)],
+    repository: Annotated[Any, Depends(deps.pvf_job_db)],
+    runner: Annotated[Any, Depends(deps.get_job_runner)],
+    store: Annotated[Any, Depends(deps.get_progress_store)],
     files: Annotated[Any, Depends(load_files)],
+    max_workers: Annotated[int, Depends(deps.get_match_workers)],
+    executor: Annotated[Any, Depends(deps.get_process_pool)],
+    output: Annotated[Any, Depends(deps.output_file_storage)],
 ) -> HTMLResponse:
     """
     Process one or more files of order-level MARC records using the sel workflow.
 
+    The files are processed by a background job. The response streams the
+    job's progress until the job is complete.
+
     Args:
         fetcher:
             a `ports.BibFetcher` object used by application service.
@@ -141,24 +214,113 @@ def process_sel_records(
             a list of matchpoints loaded from an order template in the database or
             input via an html form.
         repository:
-            a `repository.PVFBatchRepository` object where the processed files and
-            their associated statistics will be saved.
+            a `repository.PVFJobRepository` object where the job is saved.
+        runner:
+            a `ports.JobRunner` object that runs the job in the background.
+        store:
+            a `progress.ProgressStore` object where the job's progress is kept.
         files:
             a list of files to be processed.
+        max_workers:
+            the maximum number of concurrent Sierra queries used while matching.
+        executor:
+            an optional process pool used to parse and update files in parallel.
+        output:
+            a `ports.FileStorage` object to which the processed files are written.
 
     Returns:
-        the ID for the processed files and stats wrapped in an `HTMLResponse` object
+        the ID and status of the job wrapped in an `HTMLResponse` object
     """
-    processed = ProcessSelectionRecords.execute(
-        batches={f"{i.file_name}": i.content for i in files},
-        marc_engine=marc_engine,
-        fetcher=fetcher,
-        template_data=order_template.model_dump(),
-        matchpoints=matchpoints.model_dump(),
+    batches = VendorFileBatch(files)
+    job = SubmitProcessingJob.execute(
+        record_type="sel",
+        task=partial(
+            ProcessSelectionRecords.execute,
+            batches=batches,
+            marc_engine=marc_engine,
+            fetcher=fetcher,
+            template_data=order_template.model_dump(),
+            matchpoints=matchpoints.model_dump(),
+            max_workers=max_workers,
+            executor=executor,
+            output=output,
+        ),
+        runner=runner,
         repo=repository,
+        cleanup=[batches.close, partial(deps.close_fetcher, fetcher)],
+        progress=store.reporter,
     )
-    return request.app.state.templates.TemplateResponse(
-        request=request,
-        name="pvf_partials/pvf_results.html",
-        context={"batch_id": processed["id"], "record_type": "sel"},
+    return render_job(request, job, store)
+
+
+@api_router.get("/jobs/{job_id}", response_class=HTMLResponse)
+def get_job(
+    request: Request,
+    job_id: str,
+    repository: Annotated[Any, Depends(deps.pvf_job_db)],
+    store: Annotated[Any, Depends(deps.get_progress_store)],
+) -> HTMLResponse:
+    """
+    Get the status of a processing job.
+
+    Args:
+        job_id: the ID of the job
+        repository: a `repository.PVFJobRepository` object where the job is saved.
+        store: a `progress.ProgressStore` object where the job's progress is kept.
+
+    Returns:
+        the status of the job, or the job's results once it is complete, wrapped
+        in an `HTMLResponse` object
+    """
+    job = GetProcessingJob.execute(job_id=job_id, repo=repository)
+    return render_job(request, job, store)
+
+
+@api_router.get("/jobs/{job_id}/progress")
+async def stream_job_progress(
+    request: Request,
+    job_id: str,
+    store: Annotated[Any, Depends(deps.get_progress_store)],
+) -> StreamingResponse:
+    """
+    Stream the progress of a processing job as server-sent events.
+
+    A `progress` event containing the rendered progress of the job is sent each
+    time the job publishes new counts. A `done` event is sent once the job has
+    finished or if the job's progress is not tracked. A comment is sent every 15
+    seconds while the job's progress does not change to keep the connection open.
+    Events are produced on the event loop so an open stream does not hold a worker
+    thread, and the stream ends once the client disconnects.
+
+    Args:
+        job_id: the ID of the job
+        store: a `progress.ProgressStore` object where the job's progress is kept.
+
+    Returns:
+        a `StreamingResponse` object with the `text/event-stream` media type
+    """
+    template = request.app.state.templates.get_template(
+        "pvf_partials/pvf_progress.html"
+    )
+
+    async def events() -> AsyncIterator[str]:
+        version = 0
+        while not await request.is_disconnected():
+            progress = await store.await_change(job_id, version=version, timeout=15)
+            if progress is None:
+                yield format_event("done", json.dumps({"status": None}))
+                return
+            if progress["version"] == version:
+                yield ": keep-alive\n\n"
+                continue
+            version = progress["version"]
+            yield format_event("progress", template.render(progress=progress))
+            if progress["done"]:
+                yield format_event("done", json.dumps({"status": progress["status"]}))
+                return
+
+    return StreamingResponse(
+        events(),
+        media_type="text/event-stream",
+        headers={"Cache-Control": "no-cache", "X-Accel-Buffering": "no"},
     )
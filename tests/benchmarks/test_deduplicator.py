@@ -0,0 +1,27 @@
+import copy
+
+import pytest
+
+from overload_web.application.services import marc
+
+
+def synthetic_records(full_bib, count):
+    """Every tenth record has a duplicate and every fourth is attached."""
+    records = []
+    for i in range(count):
+        record = copy.copy(full_bib)
+        record.control_number = str(i - 1 if i % 10 == 1 else i)
+        record.action = "attach" if i % 4 == 3 else "insert"
+        records.append(record)
+    return records
+
+
+@pytest.mark.benchmark
+@pytest.mark.parametrize(
+    "library, collection, record_type", [("nypl", "BL", "cat"), ("bpl", "NONE", "cat")]
+)
+def test_deduplicate(full_bib, marc_engine):
+    records = synthetic_records(full_bib, 50_000)
+    out = marc.BibDeduplicator.deduplicate(records, engine=marc_engine)
+    assert len(out["NEW"]) + len(out["DUP"]) == 50_000
+    assert len(out["DEDUPED"]) == len({i.control_number for i in out["DUP"]})
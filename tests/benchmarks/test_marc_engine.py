@@ -0,0 +1,78 @@
+import pytest
+
+from overload_web.application.services import marc_updates
+from overload_web.infrastructure import marc_engine as mrc
+
+
+@pytest.mark.benchmark
+@pytest.mark.parametrize(
+    "library, collection, record_type", [("nypl", "BL", "cat"), ("bpl", "NONE", "acq")]
+)
+def test_map_data(library, marc_engine):
+    with open(f"tests/data/{library}-sample.mrc", "rb") as fh:
+        records = list(marc_engine.get_reader(fh.read())) * 100
+    orders = [j for i in records for j in i.orders]
+    bib_rules = marc_engine.config.parser_bib_mapping
+    order_rules = marc_engine.config.parser_order_mapping
+    bibs = [marc_engine.map_data(i, rules=bib_rules) for i in records]
+    mapped_orders = [marc_engine.map_data(i, rules=order_rules) for i in orders]
+    assert len(bibs) == len(records)
+    assert len(mapped_orders) == len(orders)
+
+
+@pytest.mark.benchmark
+@pytest.mark.parametrize(
+    "library, collection, record_type", [("nypl", "BL", "cat"), ("bpl", "NONE", "acq")]
+)
+def test_extract(library, marc_engine):
+    with open(f"tests/data/{library}-sample.mrc", "rb") as fh:
+        records = list(marc_engine.get_reader(fh.read())) * 100
+    out = [marc_engine.extract(i) for i in records]
+    assert [len(orders) for _, orders in out] == [len(i.orders) for i in records]
+
+
+@pytest.mark.benchmark
+def test_identify_vendor():
+    registry = mrc.MarcEngineConfigRegistry("overload_web/data/mapping_specs.json")
+    for library in ["nypl", "bpl"]:
+        engine = registry.engine(library, None, "cat")
+        rules = engine.config.parser_vendor_mapping
+        for name in [f"{library}-sample.mrc", f"{library}-dupes-sample.mrc"]:
+            with open(f"tests/data/{name}", "rb") as fh:
+                records = list(engine.get_reader(fh.read())) * 100
+            vendors = [engine.identify_vendor(i, rules=rules) for i in records]
+            assert len(vendors) == len(records)
+
+
+@pytest.mark.benchmark
+@pytest.mark.parametrize(
+    "library, collection, record_type", [("nypl", "BL", "cat"), ("bpl", "NONE", "cat")]
+)
+def test_update_fields(library, marc_engine):
+    with open(f"tests/data/{library}-sample.mrc", "rb") as fh:
+        records = list(marc_engine.get_reader(fh.read())) * 100
+    values = [
+        ("907", ".b123456789", True),
+        ("910", "BL", True),
+        ("091", "FIC", True),
+        ("901", "overload", False),
+        ("947", "BT", False),
+        ("949", "*b2=a;", False),
+        ("960", "foo", False),
+        ("961", "bar", False),
+    ]
+    for record in records:
+        marc_engine.update_fields(
+            field_updates=[
+                marc_updates.MarcFieldUpdateValues(
+                    tag=tag,
+                    ind1=" ",
+                    ind2=" ",
+                    subfields=[{"code": "a", "value": value}],
+                    delete=delete,
+                )
+                for tag, value, delete in values
+            ],
+            bib=record,
+        )
+    assert all(len(i.get_fields("907")) == 1 for i in records)
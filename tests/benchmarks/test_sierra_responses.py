@@ -0,0 +1,28 @@
+import pytest
+
+from overload_web.domain.models import sierra_responses
+
+
+@pytest.fixture
+def platform_payloads():
+    branch_codes = [f"{i}0{j}" for i in sierra_responses.NYPL_BRANCHES for j in "anv"]
+    research_codes = ["mal92", "myd", "sc", "scf", "lsd", "xxx", "mab", "rc2ma"]
+    codes = branch_codes + research_codes
+    return [
+        {
+            "id": str(n),
+            "title": "Foo",
+            "varFields": [],
+            "locations": [{"code": codes[(n + i) % len(codes)]} for i in range(40)],
+        }
+        for n in range(2_000)
+    ]
+
+
+@pytest.mark.benchmark
+def test_nypl_collection_classification(platform_payloads):
+    collections = [
+        sierra_responses.NYPLPlatformResponse(i).collection for i in platform_payloads
+    ]
+    assert set(collections) <= {"BL", "RL", "MIXED"}
+    assert len(collections) == len(platform_payloads)
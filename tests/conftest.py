@@ -131,6 +131,9 @@ class FakeSierraSession(clients.SierraSessionProtocol):
     def _parse_response(self, response: requests.Response) -> list[dict[str, Any]]:
         return [{"id": "123456789", "title": "foo"}]
 
+    def _prep_sierra_number(self, id: str | int) -> str:
+        return str(id)
+
 
 @pytest.fixture
 def mock_session(monkeypatch):
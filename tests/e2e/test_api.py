@@ -1,8 +1,10 @@
+import datetime
 from pathlib import Path
 
 import pytest
 from fastapi.testclient import TestClient
 from pydantic import ValidationError
+from sqlalchemy import inspect, text
 from sqlmodel import Session, SQLModel, create_engine
 
 from overload_web.domain.models import files
@@ -71,18 +73,47 @@ def fake_sql_session():
     file = file_io.IncomingFileModel(
         id="1", filename="foo.mrc", workflow_id="123", source="ftp", reference="foo.mrc"
     )
+    job = batch_db.PVFJob(
+        id="1",
+        record_type="cat",
+        status="complete",
+        batch_id=1,
+        created_at=datetime.datetime(2025, 1, 1),
+    )
     test_engine = create_engine("sqlite:///:memory:")
     SQLModel.metadata.create_all(test_engine)
     with Session(test_engine) as session:
         session.add(template)
         session.add(batch)
         session.add(file)
+        session.add(job)
         session.commit()
         yield session
     session.close()
     test_engine.dispose()
 
 
+class FakeJobRunner:
+    """Runs jobs as soon as they are submitted."""
+
+    def __init__(self) -> None:
+        self.tasks: list = []
+
+    def submit(self, task):
+        self.tasks.append(task)
+        engine = create_engine("sqlite:///:memory:")
+        SQLModel.metadata.create_all(engine)
+        with Session(engine) as session:
+            task(
+                jobs=batch_db.PVFJobRepository(session=session),
+                batches=batch_db.PVFBatchRepository(session=session),
+            )
+        engine.dispose()
+
+
+job_runner = FakeJobRunner()
+
+
 def fake_storage():
     return [files.VendorFile(content=b"", file_name="foo.mrc")]
 
@@ -98,7 +129,14 @@ def mock_temp_storage(monkeypatch, mocker, tmp_path):
     monkeypatch.setattr(Path, "mkdir", mock_mkdir)
 
 
-def test_api_startup(monkeypatch):
+@pytest.fixture(autouse=True)
+def clear_session_pool():
+    deps.get_session_pool().close()
+    yield
+    deps.get_session_pool().close()
+
+
+def test_api_startup(monkeypatch, mock_session):
     def fake_engine(*args, **kwargs):
         return create_engine("sqlite:///:memory:")
 
@@ -107,6 +145,22 @@ def test_api_startup(monkeypatch):
     with TestClient(app) as client:
         response = client.get("/")
         assert response.status_code == 200
+        assert "bpl" in deps.get_session_pool()
+        assert "nypl" in deps.get_session_pool()
+    assert "nypl" not in deps.get_session_pool()
+
+
+def test_api_startup_platform_error(monkeypatch, mock_nypl_session_error):
+    def fake_engine(*args, **kwargs):
+        return create_engine("sqlite:///:memory:")
+
+    monkeypatch.setattr(deps, "create_engine", fake_engine)
+
+    with TestClient(app) as client:
+        response = client.get("/")
+        assert response.status_code == 200
+        assert "bpl" in deps.get_session_pool()
+        assert "nypl" not in deps.get_session_pool()
 
 
 def test_deps():
@@ -118,10 +172,39 @@ def test_deps():
     engine.dispose()
 
 
+def test_deps_upgrade_db_schema():
+    engine = create_engine("sqlite:///:memory:")
+    with engine.begin() as conn:
+        conn.execute(
+            text(
+                "CREATE TABLE incoming_files (id VARCHAR PRIMARY KEY, "
+                "filename VARCHAR NOT NULL, workflow_id VARCHAR NOT NULL, "
+                "source VARCHAR NOT NULL, reference VARCHAR NOT NULL)"
+            )
+        )
+        conn.execute(
+            text(
+                "INSERT INTO incoming_files VALUES "
+                "('1', 'foo.mrc', '12345', 'local', 'foo.mrc')"
+            )
+        )
+    deps.create_db_and_tables(engine)
+    columns = [i["name"] for i in inspect(engine).get_columns("incoming_files")]
+    indexes = [i["name"] for i in inspect(engine).get_indexes("incoming_files")]
+    assert columns[-3:] == ["sha256", "size", "record_count"]
+    assert "ix_incoming_files_sha256" in indexes
+    assert deps.upgrade_db_schema(engine) == []
+    with Session(engine) as session:
+        repo = file_io.IncomingFileRepository(session=session)
+        assert repo.list_by_id("12345")[0]["sha256"] is None
+    engine.dispose()
+
+
 @pytest.mark.usefixtures("mock_session", "mock_sftp_client", "mock_temp_storage")
 class TestApp:
     client = TestClient(app)
     app.dependency_overrides[deps.get_session] = fake_sql_session
+    app.dependency_overrides[deps.get_job_runner] = lambda: job_runner
     base_url = client.base_url
 
     def test_files_router_list_remote_files_get(self):
@@ -141,7 +224,9 @@ class TestApp:
         print(response.content)
         assert response.status_code == 200
         assert response.url == f"{self.base_url}/files/remote/select?vendor=foo"
-        assert sorted(list(response.context.keys())) == sorted(["files", "request"])
+        assert sorted(list(response.context.keys())) == sorted(
+            ["duplicate_of", "files", "request", "uploaded"]
+        )
         assert len(response.context["files"]) == 1
         assert response.context["files"][0]["filename"] == "bar.mrc"
         assert response.context["files"][0]["source"] == "ftp"
@@ -155,7 +240,10 @@ class TestApp:
         print(response.content)
         assert response.status_code == 200
         assert response.url == f"{self.base_url}/files/upload"
-        assert sorted(list(response.context.keys())) == sorted(["files", "request"])
+        assert sorted(list(response.context.keys())) == sorted(
+            ["duplicate_of", "files", "request", "uploaded"]
+        )
+        assert response.context["duplicate_of"] is None
         assert len(response.context["files"]) == 1
         assert response.context["files"][0]["filename"] == "baz.mrc"
         assert response.context["files"][0]["source"] == "local"
@@ -316,6 +404,71 @@ class TestApp:
         response = self.client.post("/pvf/cat/process-vendor-file", data=context)
         assert response.status_code == 200
 
+    @pytest.mark.parametrize(
+        "library, collection, record_type",
+        [("nypl", "BL", "acq"), ("bpl", "", "cat"), ("nypl", "RL", "sel")],
+    )
+    def test_pvf_router_process_records_job(
+        self, library, collection, record_type, processed_records
+    ):
+        context = {
+            "library": library,
+            "collection": collection,
+            "record_type": record_type,
+            "vendor": "INGRAM",
+            "primary_matchpoint": "isbn",
+            "name": "foo",
+            "agent": "bar",
+            "id": 1,
+            "workflow_id": "1234",
+        }
+        response = self.client.post(
+            f"/pvf/{record_type}/process-vendor-file", data=context
+        )
+        assert response.status_code == 200
+        assert response.context["job"]["record_type"] == record_type
+        assert response.context["job"]["status"] == "queued"
+        assert f'hx-get="/pvf/jobs/{response.context["job"]["id"]}"' in response.text
+        assert job_runner.tasks[-1].keywords["job_id"] == response.context["job"]["id"]
+        assert response.context["progress"]["status"] == "complete"
+        assert (
+            f'sse-connect="/pvf/jobs/{response.context["job"]["id"]}/progress"'
+            in response.text
+        )
+
+    def test_pvf_router_get_job(self):
+        response = self.client.get("/pvf/jobs/1")
+        assert response.status_code == 200
+        assert response.context["job"]["status"] == "complete"
+        assert "/reports/summary?batch_id=1&record_type=cat" in response.text
+
+    def test_pvf_router_get_job_not_found(self):
+        response = self.client.get("/pvf/jobs/2")
+        assert response.status_code == 200
+        assert response.context["job"] is None
+        assert "Processing job not found." in response.text
+
+    def test_pvf_router_job_progress(self):
+        store = deps.get_progress_store()
+        reporter = store.reporter("progress-test")
+        reporter.advance("parsed", 3)
+        reporter.advance("errors")
+        reporter.finish("failed")
+        response = self.client.get("/pvf/jobs/progress-test/progress")
+        assert response.status_code == 200
+        assert response.headers["content-type"].startswith("text/event-stream")
+        assert response.headers["cache-control"] == "no-cache"
+        events = response.text.split("\n\n")
+        assert events[0].startswith("event: progress\ndata: ")
+        assert "Parsed: 3" in events[0]
+        assert "Errors: 1" in events[0]
+        assert events[1] == 'event: done\ndata: {"status": "failed"}'
+
+    def test_pvf_router_job_progress_not_found(self):
+        response = self.client.get("/pvf/jobs/foo/progress")
+        assert response.status_code == 200
+        assert response.text == 'event: done\ndata: {"status": null}\n\n'
+
     def test_pvf_router_process_full_records_fetcher_error(self):
         """Tests incorrect library passed to `FetcherFactory` called in `deps.py`"""
         context = {
@@ -1,3 +1,6 @@
+import hashlib
+import io
+import mmap
 import os
 
 import pytest
@@ -7,9 +10,10 @@ from overload_web.application import ports
 from overload_web.application.commands.file_io import (
     DeleteFileFromWorkflow,
     LoadAllWorkflowFiles,
+    LoadWorkflowRecords,
     UploadFileToWorkflow,
 )
-from overload_web.infrastructure import file_io
+from overload_web.infrastructure import file_io, marc_engine
 
 
 @pytest.fixture
@@ -63,6 +67,19 @@ class TestFileWorkflow:
             in caplog.records[1].message
         )
 
+    def test_load_all_files_lazy(self, test_session, tmp_path, tmp_files):
+        storage = file_io.LocalFileStorage(base_path=tmp_path / "temp")
+        repo = file_io.IncomingFileRepository(session=test_session)
+        files = LoadAllWorkflowFiles.execute(
+            workflow_id="12345", storage=storage, repo=repo
+        )
+        assert [i.loaded for i in files] == [False, False]
+        assert isinstance(files[0].content, mmap.mmap)
+        assert files[0].content[:] == b"333331234567890"
+        assert [i.loaded for i in files] == [True, False]
+        files[0].close()
+        assert files[0].loaded is False
+
     @pytest.mark.parametrize("source", ["local", "ftp"])
     def test_upload_files(self, test_session, tmp_path, tmp_files, caplog, source):
         path = tmp_path / "temp"
@@ -79,6 +96,174 @@ class TestFileWorkflow:
         assert "File added to workflow 12345: IncomingFile(id=" in caplog.text
         assert "Local file storage location: " in caplog.text
 
+    def test_upload_files_indexed(self, test_session, tmp_path):
+        with open("tests/data/bpl-sample.mrc", "rb") as fh:
+            content = fh.read()
+        repo = file_io.IncomingFileRepository(session=test_session)
+        storage = file_io.LocalFileStorage(base_path=tmp_path / "temp")
+        files = UploadFileToWorkflow.execute(
+            workflow_id="12345",
+            filename="bpl-sample.mrc",
+            content=content,
+            source="local",
+            storage=storage,
+            repo=repo,
+            indexer=marc_engine.MarcRecordIndexer(),
+        )["files"]
+        assert len(files) == 3
+        assert all("index" not in i for i in files)
+        file = [i for i in files if i["filename"] == "bpl-sample.mrc"][0]
+        assert os.path.exists(f"{file['reference']}.index.json")
+        index = storage.load_index(file["reference"])
+        assert len(index["records"]) == 5
+        assert index["records"][0][0] == 0
+        assert sum(i[1] for i in index["records"]) == len(content)
+
+    @pytest.mark.parametrize("key", ["record", "control_number", "isbn", "barcode"])
+    def test_load_workflow_records(self, test_session, tmp_path, key):
+        with open("tests/data/bpl-sample.mrc", "rb") as fh:
+            content = fh.read()
+        repo = file_io.IncomingFileRepository(session=test_session)
+        storage = file_io.LocalFileStorage(base_path=tmp_path / "temp")
+        indexer = marc_engine.MarcRecordIndexer()
+        files = UploadFileToWorkflow.execute(
+            workflow_id="12345",
+            filename="bpl-sample.mrc",
+            content=content,
+            source="local",
+            storage=storage,
+            repo=repo,
+            indexer=indexer,
+        )["files"]
+        file_id = [i["id"] for i in files if i["filename"] == "bpl-sample.mrc"][0]
+        index = indexer.index(content)
+        value = 2 if key == "record" else list(index[key])[0]
+        records = LoadWorkflowRecords.execute(
+            file_id=file_id, key=key, value=value, storage=storage, repo=repo
+        )
+        position = 2 if key == "record" else index[key][value][0]
+        offset, length = index["records"][position]
+        assert records[0] == content[offset : offset + length]
+
+    def test_load_workflow_records_closes_file(self, test_session, tmp_path):
+        loaded = []
+
+        class RecordingStorage(file_io.LocalFileStorage):
+            def load(self, reference, mapped=False):
+                content = super().load(reference, mapped=mapped)
+                loaded.append(content)
+                return content
+
+        with open("tests/data/bpl-sample.mrc", "rb") as fh:
+            content = fh.read()
+        repo = file_io.IncomingFileRepository(session=test_session)
+        storage = RecordingStorage(base_path=tmp_path / "temp")
+        files = UploadFileToWorkflow.execute(
+            workflow_id="12345",
+            filename="bpl-sample.mrc",
+            content=io.BytesIO(content),
+            source="local",
+            storage=storage,
+            repo=repo,
+            indexer=marc_engine.MarcRecordIndexer(),
+        )["files"]
+        file_id = [i["id"] for i in files if i["filename"] == "bpl-sample.mrc"][0]
+        records = LoadWorkflowRecords.execute(
+            file_id=file_id, key="record", value=0, storage=storage, repo=repo
+        )
+        assert len(records) == 1
+        assert len(loaded) == 2
+        assert all(i.closed for i in loaded)
+
+    def test_load_workflow_records_unindexed(self, test_session, tmp_path):
+        with open("tests/data/nypl-sample.mrc", "rb") as fh:
+            content = fh.read()
+        (tmp_path / "foo.mrc").write_bytes(content)
+        repo = file_io.IncomingFileRepository(session=test_session)
+        storage = file_io.LocalFileStorage(base_path=tmp_path / "temp")
+        with pytest.raises(ValueError) as exc:
+            LoadWorkflowRecords.execute(
+                file_id="1", key="record", value=0, storage=storage, repo=repo
+            )
+        assert str(exc.value) == "Unable to index records in file: foo.mrc"
+        records = LoadWorkflowRecords.execute(
+            file_id="1",
+            key="record",
+            value=10,
+            storage=storage,
+            repo=repo,
+            indexer=marc_engine.MarcRecordIndexer(),
+        )
+        assert records == []
+        assert storage.load_index(f"{tmp_path}/foo.mrc") is not None
+        records = LoadWorkflowRecords.execute(
+            file_id="1", key="record", value=0, storage=storage, repo=repo
+        )
+        assert len(records) == 1
+
+    def test_load_workflow_records_invalid(self, test_session, tmp_path):
+        repo = file_io.IncomingFileRepository(session=test_session)
+        storage = file_io.LocalFileStorage(base_path=tmp_path / "temp")
+        with pytest.raises(ValueError) as exc:
+            LoadWorkflowRecords.execute(
+                file_id="1", key="foo", value=0, storage=storage, repo=repo
+            )
+        assert "Invalid key: 'foo'." in str(exc.value)
+        with pytest.raises(ValueError) as exc:
+            LoadWorkflowRecords.execute(
+                file_id="3", key="isbn", value=0, storage=storage, repo=repo
+            )
+        assert str(exc.value) == "File not found: 3"
+
+    def test_upload_files_stream(self, test_session, tmp_path):
+        with open("tests/data/nypl-sample.mrc", "rb") as fh:
+            content = fh.read()
+        repo = file_io.IncomingFileRepository(session=test_session)
+        storage = file_io.LocalFileStorage(base_path=tmp_path / "temp")
+        with open("tests/data/nypl-sample.mrc", "rb") as fh:
+            files = UploadFileToWorkflow.execute(
+                workflow_id="12345",
+                filename="nypl-sample.mrc",
+                content=fh,
+                source="local",
+                storage=storage,
+                repo=repo,
+                indexer=marc_engine.MarcRecordIndexer(),
+                counter=marc_engine.MarcRecordCounter(),
+            )["files"]
+        file = [i for i in files if i["filename"] == "nypl-sample.mrc"][0]
+        assert file["sha256"] == hashlib.sha256(content).hexdigest()
+        assert file["size"] == len(content)
+        assert file["record_count"] == 6
+        assert storage.load(file["reference"]) == content
+        assert len(storage.load_index(file["reference"])["records"]) == 6
+
+    def test_upload_files_duplicate(self, test_session, tmp_path, caplog):
+        repo = file_io.IncomingFileRepository(session=test_session)
+        storage = file_io.LocalFileStorage(base_path=tmp_path / "temp")
+        results = [
+            UploadFileToWorkflow.execute(
+                workflow_id="12345",
+                filename=name,
+                content=b"foo",
+                source="local",
+                storage=storage,
+                repo=repo,
+            )
+            for name in ["qux.mrc", "quux.mrc"]
+        ]
+        files = results[1]["files"]
+        assert [i["filename"] for i in files] == ["foo.mrc", "bar.mrc", "qux.mrc"]
+        assert [i.name for i in (tmp_path / "temp").iterdir()] == [
+            f"{files[2]['id']}_qux.mrc"
+        ]
+        assert results[0]["duplicate_of"] is None
+        assert results[1]["duplicate_of"] == files[2]
+        assert (
+            "File already added to workflow 12345: quux.mrc is a duplicate of "
+            f"{files[2]['id']}."
+        ) in caplog.text
+
     def test_delete_file(self, test_session):
         repo = file_io.IncomingFileRepository(session=test_session)
         files = DeleteFileFromWorkflow.execute(id="1", repo=repo, workflow_id="12345")
@@ -99,12 +284,47 @@ class TestLocalFiles:
         assert "333331234567890".encode() in loaded_file
         assert "foo.mrc" in os.listdir(tmp_path)
 
+    def test_local_load_mapped(self, tmp_path, tmp_files):
+        (tmp_path / "empty.mrc").write_bytes(b"")
+        loader = file_io.LocalFileLoader()
+        loaded_file = loader.load("foo.mrc", dir=tmp_path, mapped=True)
+        assert isinstance(loaded_file, mmap.mmap)
+        assert loaded_file[:] == b"333331234567890"
+        loaded_file.close()
+        assert loader.load("empty.mrc", dir=tmp_path, mapped=True) == b""
+
+    def test_local_storage_load_mapped(self, tmp_path):
+        storage = file_io.LocalFileStorage(base_path=tmp_path / "temp")
+        reference = storage.save(id="1", filename="foo.mrc", content=b"foo")
+        assert storage.load(reference) == b"foo"
+        loaded_file = storage.load(reference, mapped=True)
+        assert isinstance(loaded_file, mmap.mmap)
+        assert loaded_file.read() == b"foo"
+        loaded_file.close()
+
     def test_local_list(self, tmp_path, tmp_files):
         loader = file_io.LocalFileLoader()
         file_list = loader.list(dir=tmp_path)
         assert len(file_list) == 2
         assert "foo.mrc" in file_list
 
+    def test_local_storage_index(self, tmp_path):
+        storage = file_io.LocalFileStorage(base_path=tmp_path / "temp")
+        reference = storage.save(id="1", filename="foo.mrc", content=b"foo")
+        assert storage.load_index(reference) is None
+        storage.save_index(reference, {"records": [[0, 3]]})
+        assert storage.load_index(reference) == {"records": [[0, 3]]}
+        storage.delete(reference)
+        assert os.listdir(tmp_path / "temp") == []
+
+    def test_local_storage_open_sink(self, tmp_path):
+        storage = file_io.LocalFileStorage(base_path=tmp_path / "temp")
+        reference, sink = storage.open_sink(id="1", filename="foo.mrc")
+        with sink:
+            sink.write(b"foo")
+        assert reference == str(tmp_path / "temp" / "1_foo.mrc")
+        assert storage.load(reference) == b"foo"
+
     def test_local_write(self, tmp_path):
         writer = file_io.LocalFileWriter()
         new_file = writer.write(
@@ -1,6 +1,18 @@
+import multiprocessing
+import os
+import threading
+from concurrent.futures import ProcessPoolExecutor
+from functools import partial
+
 import pytest
 from sqlmodel import Session, SQLModel, create_engine
 
+from overload_web.application.commands.jobs import (
+    INTERRUPTED_ERROR,
+    FailInterruptedProcessingJobs,
+    GetProcessingJob,
+    SubmitProcessingJob,
+)
 from overload_web.application.commands.process import (
     ProcessAcquisitionsRecords,
     ProcessCatalogingRecords,
@@ -11,7 +23,16 @@ from overload_web.application.commands.reporting import (
     GetDetailedReportData,
     WriteOutputReport,
 )
-from overload_web.infrastructure import batch_db, marc_engine, reporter
+from overload_web.application.services import marc
+from overload_web.domain.models import bibs, files, reporting
+from overload_web.infrastructure import (
+    batch_db,
+    file_io,
+    jobs,
+    marc_engine,
+    progress,
+    reporter,
+)
 
 
 @pytest.fixture(scope="class")
@@ -74,6 +95,15 @@ def test_session():
     test_engine.dispose()
 
 
+@pytest.fixture(scope="module")
+def process_pool():
+    pool = ProcessPoolExecutor(
+        max_workers=2, mp_context=multiprocessing.get_context("spawn")
+    )
+    yield pool
+    pool.shutdown()
+
+
 class TestProcessCommands:
     @pytest.mark.parametrize(
         "library, collection, record_type",
@@ -94,6 +124,155 @@ class TestProcessCommands:
         )
         assert out["id"] is not None
 
+    @pytest.mark.parametrize(
+        "library, collection, record_type",
+        [("nypl", "BL", "cat"), ("nypl", "RL", "cat"), ("bpl", "NONE", "cat")],
+    )
+    def test_cat_service_process_vendor_file_chunks(
+        self, library, fake_fetcher, engine_config, test_session
+    ):
+        repo = batch_db.PVFBatchRepository(session=test_session)
+        engine = marc_engine.MarcEngine(rules=engine_config)
+        with open(f"tests/data/{library}-sample.mrc", "rb") as fh:
+            marc_data = fh.read()
+        whole = ProcessCatalogingRecords.execute(
+            batches={"foo.mrc": marc_data},
+            marc_engine=engine,
+            fetcher=fake_fetcher,
+            repo=repo,
+        )
+        chunked = ProcessCatalogingRecords.execute(
+            batches={"foo.mrc": marc_data},
+            marc_engine=engine,
+            fetcher=fake_fetcher,
+            repo=repo,
+            chunk_size=1,
+        )
+        whole_batch = repo.get(whole["id"])
+        chunked_batch = repo.get(chunked["id"])
+        assert chunked_batch["report"] == whole_batch["report"]
+        assert chunked_batch["files"] == whole_batch["files"]
+
+    @pytest.mark.parametrize(
+        "library, collection, record_type",
+        [("nypl", "BL", "cat"), ("bpl", "NONE", "cat")],
+    )
+    def test_cat_service_process_vendor_file_output(
+        self, library, fake_fetcher, engine_config, test_session, tmp_path
+    ):
+        repo = batch_db.PVFBatchRepository(session=test_session)
+        engine = marc_engine.MarcEngine(rules=engine_config)
+        output = file_io.LocalFileStorage(base_path=tmp_path / "output")
+        with open(f"tests/data/{library}-sample.mrc", "rb") as fh:
+            marc_data = fh.read()
+        kwargs = {
+            "batches": {"foo.mrc": marc_data},
+            "marc_engine": engine,
+            "fetcher": fake_fetcher,
+            "repo": repo,
+        }
+        in_memory = repo.get(ProcessCatalogingRecords.execute(**kwargs)["id"])
+        written = repo.get(
+            ProcessCatalogingRecords.execute(**kwargs, output=output)["id"]
+        )
+        assert written["report"] == in_memory["report"]
+        assert len(written["files"]) == len(in_memory["files"])
+        for file, expected in zip(written["files"], in_memory["files"]):
+            assert file["file_name"] == expected["file_name"]
+            assert file["records"] == b""
+            assert output.load(file["reference"]) == expected["records"]
+
+    @pytest.mark.parametrize(
+        "library, collection, record_type",
+        [("nypl", "BL", "cat"), ("nypl", "RL", "acq"), ("bpl", "NONE", "sel")],
+    )
+    @pytest.mark.parametrize("stage", ["parse", "match", "update"])
+    def test_process_vendor_file_bad_record(
+        self,
+        library,
+        record_type,
+        stage,
+        fake_fetcher,
+        engine_config,
+        test_session,
+        monkeypatch,
+    ):
+        def fail_once(func):
+            calls = []
+
+            def wrapper(*args, **kwargs):
+                calls.append(True)
+                if len(calls) == 1:
+                    raise ValueError("Bad record")
+                return func(*args, **kwargs)
+
+            return wrapper
+
+        command = {
+            "acq": ProcessAcquisitionsRecords,
+            "cat": ProcessCatalogingRecords,
+            "sel": ProcessSelectionRecords,
+        }
+        update = {
+            "acq": "update_acquisition_record",
+            "cat": "update_cataloging_record",
+            "sel": "update_selection_record",
+        }
+        engine = marc_engine.MarcEngine(rules=engine_config)
+        repo = batch_db.PVFBatchRepository(session=test_session)
+        with open(f"tests/data/{library}-sample.mrc", "rb") as fh:
+            marc_data = fh.read()
+        count = len(marc.BibParser.parse_marc_data(marc_data, engine=engine))
+        if stage == "parse":
+            marc_data = b"00026nam a22abcde   4500\x1e\x1d" + marc_data
+        elif stage == "match":
+            analyze = fail_once(bibs.DomainBib.analyze_matches)
+            monkeypatch.setattr(bibs.DomainBib, "analyze_matches", analyze)
+        else:
+            method = fail_once(getattr(marc.BibUpdater, update[record_type]))
+            monkeypatch.setattr(marc.BibUpdater, update[record_type], method)
+        kwargs = {
+            "batches": {"foo.mrc": marc_data},
+            "marc_engine": engine,
+            "fetcher": fake_fetcher,
+            "repo": repo,
+        }
+        if record_type != "cat":
+            kwargs["template_data"] = {"format": "a", "vendor": "UNKNOWN"}
+            kwargs["matchpoints"] = {"primary_matchpoint": "isbn"}
+        reporter = progress.ProgressStore().reporter("foo")
+        out = command[record_type].execute(**kwargs, progress=reporter)
+        written = sum(
+            len(marc.BibParser.parse_marc_data(i["records"], engine=engine))
+            for i in repo.get(out["id"])["files"]
+        )
+        expected = count if stage == "parse" else count - 1
+        assert reporter.counts["errors"] == 1
+        assert reporter.counts["parsed"] == count
+        assert reporter.counts["updated"] == expected
+        assert reporter.counts["written"] == expected
+        assert written == expected
+
+    @pytest.mark.parametrize(
+        "library, collection, record_type",
+        [("nypl", "BL", "acq"), ("bpl", "NONE", "sel")],
+    )
+    def test_update_file_bad_record(self, library, engine_config, monkeypatch):
+        def update(record, engine, template_data):
+            if record is records[0]:
+                raise ValueError("Bad record")
+
+        engine = marc_engine.MarcEngine(rules=engine_config)
+        with open(f"tests/data/{library}-sample.mrc", "rb") as fh:
+            records = marc.BibParser.parse_marc_data(fh.read(), engine=engine)
+        monkeypatch.setattr(marc.BibUpdater, "update_acquisition_record", update)
+        monkeypatch.setattr(marc.BibUpdater, "update_selection_record", update)
+        processed, errors = marc.BibFileProcessor.update_file(
+            records, engine=engine, template_data={}, file_name="foo.mrc"
+        )
+        assert errors == 1
+        assert processed.records == engine.write(records[1:])
+
     @pytest.mark.parametrize(
         "library, collection, record_type",
         [("nypl", "BL", "sel"), ("nypl", "RL", "sel"), ("bpl", "NONE", "sel")],
@@ -136,6 +315,157 @@ class TestProcessCommands:
         )
         assert out["id"] is not None
 
+    @pytest.mark.parametrize(
+        "library, collection, record_type",
+        [("nypl", "BL", "acq"), ("nypl", "RL", "sel"), ("bpl", "NONE", "acq")],
+    )
+    def test_order_service_process_vendor_files_in_pool(
+        self,
+        library,
+        record_type,
+        fake_fetcher,
+        engine_config,
+        test_session,
+        process_pool,
+    ):
+        command = {"acq": ProcessAcquisitionsRecords, "sel": ProcessSelectionRecords}
+        engine = marc_engine.MarcEngine(rules=engine_config)
+        repo = batch_db.PVFBatchRepository(session=test_session)
+        with open(f"tests/data/{library}-sample.mrc", "rb") as fh:
+            marc_data = fh.read()
+        kwargs = {
+            "batches": {"foo.mrc": marc_data, "bar.mrc": marc_data},
+            "marc_engine": engine,
+            "fetcher": fake_fetcher,
+            "template_data": {"format": "a", "vendor": "UNKNOWN"},
+            "matchpoints": {"primary_matchpoint": "isbn"},
+            "repo": repo,
+        }
+        sequential = command[record_type].execute(**kwargs)
+        pooled = command[record_type].execute(**kwargs, executor=process_pool)
+        sequential_batch = repo.get(sequential["id"])
+        pooled_batch = repo.get(pooled["id"])
+        assert pooled_batch["report"] == sequential_batch["report"]
+        assert pooled_batch["files"] == sequential_batch["files"]
+
+    @pytest.mark.parametrize(
+        "library, collection, record_type",
+        [("nypl", "BL", "acq"), ("bpl", "NONE", "sel")],
+    )
+    def test_order_service_process_vendor_files_output(
+        self,
+        library,
+        record_type,
+        fake_fetcher,
+        engine_config,
+        test_session,
+        process_pool,
+        tmp_path,
+    ):
+        command = {"acq": ProcessAcquisitionsRecords, "sel": ProcessSelectionRecords}
+        engine = marc_engine.MarcEngine(rules=engine_config)
+        repo = batch_db.PVFBatchRepository(session=test_session)
+        output = file_io.LocalFileStorage(base_path=tmp_path / "output")
+        with open(f"tests/data/{library}-sample.mrc", "rb") as fh:
+            marc_data = fh.read()
+        kwargs = {
+            "batches": {"foo.mrc": marc_data, "bar.mrc": marc_data},
+            "marc_engine": engine,
+            "fetcher": fake_fetcher,
+            "template_data": {"format": "a", "vendor": "UNKNOWN"},
+            "matchpoints": {"primary_matchpoint": "isbn"},
+            "repo": repo,
+        }
+        in_memory = repo.get(command[record_type].execute(**kwargs)["id"])
+        written = repo.get(command[record_type].execute(**kwargs, output=output)["id"])
+        pooled = repo.get(
+            command[record_type].execute(
+                **kwargs, output=output, executor=process_pool
+            )["id"]
+        )
+        assert len(os.listdir(tmp_path / "output")) == 4
+        for batch in [written, pooled]:
+            assert batch["report"] == in_memory["report"]
+            assert len(batch["files"]) == 2
+            for file, expected in zip(batch["files"], in_memory["files"]):
+                assert file["file_name"] == expected["file_name"]
+                assert file["records"] == b""
+                assert output.load(file["reference"]) == expected["records"]
+
+    @pytest.mark.parametrize(
+        "library, collection, record_type",
+        [("nypl", "BL", "acq"), ("bpl", "NONE", "sel")],
+    )
+    def test_order_service_process_stored_files_in_pool(
+        self,
+        library,
+        record_type,
+        fake_fetcher,
+        engine_config,
+        test_session,
+        process_pool,
+    ):
+        command = {"acq": ProcessAcquisitionsRecords, "sel": ProcessSelectionRecords}
+        engine = marc_engine.MarcEngine(rules=engine_config)
+        repo = batch_db.PVFBatchRepository(session=test_session)
+        path = f"tests/data/{library}-sample.mrc"
+        stored = [
+            files.VendorFile(
+                file_name=i, opener=partial(file_io.read_file, path, mapped=True)
+            )
+            for i in ["foo.mrc", "bar.mrc"]
+        ]
+        kwargs = {
+            "marc_engine": engine,
+            "fetcher": fake_fetcher,
+            "template_data": {"format": "a", "vendor": "UNKNOWN"},
+            "matchpoints": {"primary_matchpoint": "isbn"},
+            "repo": repo,
+        }
+        pooled = command[record_type].execute(
+            batches=files.VendorFileBatch(stored), executor=process_pool, **kwargs
+        )
+        assert not any(i.loaded for i in stored)
+        with open(path, "rb") as fh:
+            marc_data = fh.read()
+        sequential = command[record_type].execute(
+            batches={"foo.mrc": marc_data, "bar.mrc": marc_data}, **kwargs
+        )
+        sequential_batch = repo.get(sequential["id"])
+        pooled_batch = repo.get(pooled["id"])
+        assert pooled_batch["report"] == sequential_batch["report"]
+        assert pooled_batch["files"] == sequential_batch["files"]
+
+    @pytest.mark.parametrize(
+        "library, collection, record_type",
+        [("nypl", "BL", "acq"), ("bpl", "NONE", "sel")],
+    )
+    def test_order_service_process_vendor_file_dupes_in_pool(
+        self,
+        library,
+        record_type,
+        fake_fetcher,
+        engine_config,
+        test_session,
+        process_pool,
+    ):
+        command = {"acq": ProcessAcquisitionsRecords, "sel": ProcessSelectionRecords}
+        engine = marc_engine.MarcEngine(rules=engine_config)
+        repo = batch_db.PVFBatchRepository(session=test_session)
+        with open(f"tests/data/{library}-dupes-sample.mrc", "rb") as fh:
+            marc_data = fh.read()
+        with pytest.raises(ValueError) as exc:
+            command[record_type].execute(
+                {"foo.mrc": marc_data},
+                marc_engine=engine,
+                fetcher=fake_fetcher,
+                template_data={"format": "a"},
+                matchpoints={"primary_matchpoint": "isbn"},
+                repo=repo,
+                executor=process_pool,
+            )
+        assert "Duplicate barcodes found in file: " in str(exc.value)
+
     @pytest.mark.parametrize(
         "library, collection, record_type",
         [("nypl", "BL", "cat"), ("nypl", "RL", "cat"), ("bpl", "NONE", "cat")],
@@ -201,6 +531,182 @@ class TestProcessCommands:
         assert "Duplicate barcodes found in file: " in str(exc.value)
 
 
+@pytest.fixture
+def job_engine(tmp_path):
+    engine = create_engine(f"sqlite:///{tmp_path}/jobs.db")
+    SQLModel.metadata.create_all(engine)
+    yield engine
+    engine.dispose()
+
+
+class TestJobCommands:
+    @pytest.mark.parametrize(
+        "library, collection, record_type",
+        [("nypl", "BL", "cat"), ("bpl", "NONE", "cat")],
+    )
+    def test_submit_processing_job(
+        self, library, fake_fetcher, engine_config, job_engine
+    ):
+        with open(f"tests/data/{library}-sample.mrc", "rb") as fh:
+            marc_data = fh.read()
+        released = []
+        runner = jobs.ThreadPoolJobRunner(engine=job_engine)
+        with Session(job_engine) as session:
+            repo = batch_db.PVFJobRepository(session=session)
+            job = SubmitProcessingJob.execute(
+                record_type="cat",
+                task=partial(
+                    ProcessCatalogingRecords.execute,
+                    batches={"foo.mrc": marc_data},
+                    marc_engine=marc_engine.MarcEngine(rules=engine_config),
+                    fetcher=fake_fetcher,
+                ),
+                runner=runner,
+                repo=repo,
+                cleanup=[lambda: released.append(True)],
+            )
+            assert job["status"] == "queued"
+            runner.shutdown()
+        with Session(job_engine) as session:
+            out = GetProcessingJob.execute(
+                job_id=job["id"], repo=batch_db.PVFJobRepository(session=session)
+            )
+            batch = batch_db.PVFBatchRepository(session=session).get(out["batch_id"])
+        assert out["status"] == "complete"
+        assert out["error"] is None
+        assert out["updated_at"] is not None
+        assert batch["report"]["file_names"] == ["foo.mrc"]
+        assert released == [True]
+
+    def test_submit_processing_job_error(self, job_engine, caplog):
+        def task(repo):
+            raise ValueError("Duplicate barcodes found in file: ['foo']")
+
+        released = []
+        runner = jobs.ThreadPoolJobRunner(engine=job_engine)
+        with Session(job_engine) as session:
+            repo = batch_db.PVFJobRepository(session=session)
+            job = SubmitProcessingJob.execute(
+                record_type="acq",
+                task=task,
+                runner=runner,
+                repo=repo,
+                cleanup=[lambda: released.append(True)],
+            )
+            runner.shutdown()
+        with Session(job_engine) as session:
+            out = GetProcessingJob.execute(
+                job_id=job["id"], repo=batch_db.PVFJobRepository(session=session)
+            )
+        assert out["status"] == "failed"
+        assert out["batch_id"] is None
+        assert out["error"] == "Duplicate barcodes found in file: ['foo']"
+        assert f"Processing job {job['id']} failed." in caplog.text
+        assert released == [True]
+
+    @pytest.mark.parametrize(
+        "library, collection, record_type",
+        [("nypl", "BL", "cat"), ("bpl", "NONE", "cat")],
+    )
+    def test_submit_processing_job_progress(
+        self, library, fake_fetcher, engine_config, job_engine
+    ):
+        with open(f"tests/data/{library}-sample.mrc", "rb") as fh:
+            marc_data = fh.read()
+        store = progress.ProgressStore()
+        runner = jobs.ThreadPoolJobRunner(engine=job_engine)
+        with Session(job_engine) as session:
+            job = SubmitProcessingJob.execute(
+                record_type="cat",
+                task=partial(
+                    ProcessCatalogingRecords.execute,
+                    batches={"foo.mrc": marc_data},
+                    marc_engine=marc_engine.MarcEngine(rules=engine_config),
+                    fetcher=fake_fetcher,
+                ),
+                runner=runner,
+                repo=batch_db.PVFJobRepository(session=session),
+                progress=store.reporter,
+            )
+            runner.shutdown()
+        out = store.get(job["id"])
+        assert out["status"] == "complete"
+        assert out["done"] is True
+        assert out["errors"] == 0
+        assert out["parsed"] > 0
+        assert out["parsed"] == out["matched"] == out["updated"] == out["written"]
+
+    def test_submit_processing_job_progress_error(self, job_engine):
+        def task(repo, progress):
+            progress.advance("parsed", 5)
+            raise ValueError("Duplicate barcodes found in file: ['foo']")
+
+        store = progress.ProgressStore()
+        runner = jobs.ThreadPoolJobRunner(engine=job_engine)
+        with Session(job_engine) as session:
+            job = SubmitProcessingJob.execute(
+                record_type="acq",
+                task=task,
+                runner=runner,
+                repo=batch_db.PVFJobRepository(session=session),
+                progress=store.reporter,
+            )
+            runner.shutdown()
+        out = store.get(job["id"])
+        assert out["status"] == "failed"
+        assert out["parsed"] == 5
+        assert out["errors"] == 1
+
+    def test_runner_concurrent_submit(self, job_engine):
+        threads = set()
+        barrier = threading.Barrier(8)
+        runner = jobs.ThreadPoolJobRunner(engine=job_engine, max_workers=2)
+
+        def task(jobs, batches):
+            threads.add(threading.current_thread().name)
+
+        def submit():
+            barrier.wait()
+            runner.submit(task)
+
+        submitters = [threading.Thread(target=submit) for _ in range(8)]
+        for thread in submitters:
+            thread.start()
+        for thread in submitters:
+            thread.join()
+        runner.shutdown()
+        assert len(threads) <= 2
+        assert all(i.startswith("pvf-job") for i in threads)
+        assert runner._executor is None
+
+    def test_fail_interrupted_processing_jobs(self, job_engine, caplog):
+        statuses = ["queued", "running", "complete", "failed"]
+        with Session(job_engine) as session:
+            repo = batch_db.PVFJobRepository(session=session)
+            for i, status in enumerate(statuses):
+                repo.save(
+                    reporting.ProcessingJob(
+                        id=str(i), record_type="cat", status=status, error=None
+                    )
+                )
+            assert [i["id"] for i in repo.list_by_status(["queued", "running"])] == [
+                "0",
+                "1",
+            ]
+            assert FailInterruptedProcessingJobs.execute(repo=repo) == ["0", "1"]
+            assert FailInterruptedProcessingJobs.execute(repo=repo) == []
+            out = [repo.get(str(i)) for i in range(4)]
+        assert [i["status"] for i in out] == ["failed", "failed", "complete", "failed"]
+        assert [i["error"] for i in out] == [INTERRUPTED_ERROR] * 2 + [None] * 2
+        assert "Marked 2 interrupted processing jobs as failed" in caplog.text
+
+    def test_get_processing_job_not_found(self, job_engine):
+        with Session(job_engine) as session:
+            repo = batch_db.PVFJobRepository(session=session)
+            assert GetProcessingJob.execute(job_id="foo", repo=repo) is None
+            assert repo.update("foo", {"status": "running"}) is None
+
+
 @pytest.fixture(scope="class")
 def test_session_no_records():
     test_engine = create_engine("sqlite:///:memory:")
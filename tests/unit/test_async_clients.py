@@ -0,0 +1,400 @@
+import threading
+
+import httpx2
+import pytest
+import requests
+from requests.adapters import BaseAdapter
+
+from overload_web.application.services import match_service
+from overload_web.domain.models import bibs
+from overload_web.infrastructure import async_clients, cache, clients, throttling
+
+
+class FakeSierraService:
+    """Responds to requests like NYPL's Platform or BPL's Solr."""
+
+    def __init__(self) -> None:
+        self.requests: list[httpx2.Request] = []
+        self.records = [
+            {"id": "12345678", "standardNumbers": ["9781234567890"], "isbn": []},
+            {"id": "23456789", "standardNumbers": ["9780987654321"], "isbn": []},
+        ]
+        for record in self.records:
+            record["isbn"] = record["standardNumbers"]
+
+    def __call__(self, request: httpx2.Request) -> httpx2.Response:
+        self.requests.append(request)
+        query = " ".join(v for _, v in request.url.params.multi_items())
+        query = query.replace("-", "")
+        data = [i for i in self.records if any(n in query for n in i["isbn"])]
+        if "Ocp-Apim-Subscription-Key" in request.headers:
+            return httpx2.Response(200, json={"response": {"docs": data}})
+        if not data:
+            return httpx2.Response(404, json={"statusCode": 404})
+        return httpx2.Response(200, json={"data": data})
+
+
+class SierraServiceAdapter(BaseAdapter):
+    """Sends requests made by a `requests.Session` to a `FakeSierraService`."""
+
+    def __init__(self, service: FakeSierraService) -> None:
+        super().__init__()
+        self.service = service
+
+    def send(self, request, **kwargs):
+        response = self.service(
+            httpx2.Request(request.method, request.url, headers=dict(request.headers))
+        )
+        out = requests.Response()
+        out.status_code = response.status_code
+        out._content = response.content
+        out.request = request
+        out.url = request.url
+        return out
+
+    def close(self):
+        return None
+
+
+def describe(request: httpx2.Request) -> tuple:
+    """The parts of a request that the sync and async fetchers must agree on."""
+    headers = ["Authorization", "Ocp-Apim-Subscription-Key", "User-Agent"]
+    return (
+        request.method,
+        f"{request.url.scheme}://{request.url.host}{request.url.path}",
+        sorted(request.url.params.multi_items()),
+        {i: request.headers.get(i) for i in headers},
+    )
+
+
+def make_session(library, transport):
+    return async_clients.AsyncSierraSession(
+        clients.create_session(library), transport=transport
+    )
+
+
+@pytest.fixture
+def platform_tokens(monkeypatch):
+    tokens = []
+
+    def token_response(*args, **kwargs):
+        tokens.append(kwargs)
+        token_json = {"access_token": f"foo{len(tokens)}", "expires_in": 10}
+        return httpx2.Response(200, json=token_json)
+
+    monkeypatch.setattr("requests.post", token_response)
+    return tokens
+
+
+@pytest.fixture
+def sierra_service(monkeypatch, platform_tokens):
+    monkeypatch.setenv("BPL_SOLR_TARGET", "https://solr.test/select")
+    return FakeSierraService()
+
+
+@pytest.fixture
+def async_fetcher(sierra_service, library):
+    session = make_session(library, httpx2.MockTransport(sierra_service))
+    fetcher = async_clients.AsyncSierraBibFetcher(session=session)
+    yield fetcher
+    fetcher.close()
+
+
+@pytest.mark.parametrize("library", ["bpl", "nypl"])
+class TestAsyncSierraBibFetcher:
+    def test_get_bibs_by_id(self, async_fetcher, caplog):
+        bibs = async_fetcher.get_bibs_by_id(value="9781234567890", key="isbn")
+        assert [i["id"] for i in bibs] == ["12345678"]
+        assert "Querying Sierra with Async" in caplog.text
+
+    def test_get_bibs_by_id_no_value_passed(self, async_fetcher, caplog):
+        assert async_fetcher.get_bibs_by_id(value=None, key="isbn") == []
+        assert "Skipping Sierra query on isbn with missing value." in caplog.text
+
+    def test_get_bibs_by_id_invalid_matchpoint(self, async_fetcher):
+        with pytest.raises(ValueError) as exc:
+            async_fetcher.get_bibs_by_id(value="1", key="bar")
+        assert "Invalid matchpoint: 'bar'. Available matchpoints are:" in str(exc.value)
+
+    def test_get_bibs_by_id_issn(self, async_fetcher):
+        with pytest.raises(NotImplementedError) as exc:
+            async_fetcher.get_bibs_by_id(value="1", key="issn")
+        assert "Search by ISSN not implemented in" in str(exc.value)
+
+    def test_get_bibs_by_ids(self, async_fetcher, sierra_service):
+        bibs = async_fetcher.get_bibs_by_ids(
+            values=["978-1-234-56789-0", "9780987654321", "9781111111111"], key="isbn"
+        )
+        assert [i["id"] for i in bibs["978-1-234-56789-0"]] == ["12345678"]
+        assert [i["id"] for i in bibs["9780987654321"]] == ["23456789"]
+        assert bibs["9781111111111"] == []
+        assert len(sierra_service.requests) == 1
+
+    def test_get_bibs_by_ids_truncated(self, library, sierra_service, caplog):
+        def truncated(request):
+            query = " ".join(v for _, v in request.url.params.multi_items())
+            batch = "9781234567890" in query and "9780987654321" in query
+            isbn = "9781234567890"
+            docs = [
+                {"id": str(i), "standardNumbers": [isbn], "isbn": [isbn]}
+                for i in range(10 if batch else 12)
+            ]
+            return httpx2.Response(200, json={"data": docs, "response": {"docs": docs}})
+
+        session = make_session(library, httpx2.MockTransport(truncated))
+        fetcher = async_clients.AsyncSierraBibFetcher(session=session)
+        bibs = fetcher.get_bibs_by_ids(
+            values=["9781234567890", "9780987654321"], key="isbn"
+        )
+        fetcher.close()
+        assert len(bibs["9781234567890"]) == 12
+        assert "Querying each value individually." in caplog.text
+
+    def test_get_bibs_by_ids_many(self, async_fetcher):
+        out = async_fetcher.get_bibs_by_ids_many(
+            [(["9781234567890"], "isbn"), (["9780987654321", "1"], "isbn")]
+        )
+        assert [i["id"] for i in out[0]["9781234567890"]] == ["12345678"]
+        assert [i["id"] for i in out[1]["9780987654321"]] == ["23456789"]
+        assert out[1]["1"] == []
+
+    def test_bib_matcher(self, async_fetcher, library):
+        records = [
+            bibs.DomainBib(
+                library=library,
+                collection=None,
+                isbn=isbn,
+                title="Foo",
+                record_type="acq",
+                binary_data=b"",
+            )
+            for isbn in ["9781234567890", "9780987654321", "9781111111111"]
+        ]
+        fetcher = cache.CachedSierraBibFetcher.wrap(
+            async_fetcher, cache=cache.TTLCache(), library=library
+        )
+        assert isinstance(fetcher, cache.CachedConcurrentBibFetcher)
+        service = match_service.BibMatcher(fetcher=fetcher, batch_size=1)
+        candidates = service.match_order_records(
+            records, matchpoints={"primary_matchpoint": "isbn"}
+        )
+        assert [[i["id"] for i in c] for c in candidates] == [
+            ["12345678"],
+            ["23456789"],
+            [],
+        ]
+        assert fetcher.cache.stats["size"] == 3
+        service.match_order_records(records, matchpoints={"primary_matchpoint": "isbn"})
+        assert fetcher.cache.stats["hits"] == 3
+
+
+@pytest.mark.parametrize("library", ["bpl", "nypl"])
+@pytest.mark.parametrize(
+    "values, key",
+    [
+        (["9781234567890"], "isbn"),
+        (["978-1-234-56789-0", "9780987654321", "9781111111111"], "isbn"),
+        (["012345678905"], "upc"),
+        (["012345678905", "9780987654321"], "upc"),
+        (["b123456789"], "bib_id"),
+        (["b123456789", "b234567890"], "bib_id"),
+        (["ocm00012345"], "control_number"),
+        (["ocm00012345", "on1234567"], "control_number"),
+    ],
+)
+def test_sync_async_parity(library, values, key, sierra_service, platform_tokens):
+    sync_session = clients.create_session(library)
+    sync_session.mount("https://", SierraServiceAdapter(sierra_service))
+    sync_fetcher = clients.SierraBibFetcher(sync_session)
+    sync_bibs = sync_fetcher.get_bibs_by_ids(values=values, key=key)
+    sync_requests = [describe(i) for i in sierra_service.requests]
+    sierra_service.requests.clear()
+    platform_tokens.clear()
+
+    session = make_session(library, httpx2.MockTransport(sierra_service))
+    async_fetcher = async_clients.AsyncSierraBibFetcher(session=session)
+    async_bibs = async_fetcher.get_bibs_by_ids(values=values, key=key)
+    async_fetcher.close()
+    async_requests = [describe(i) for i in sierra_service.requests]
+
+    assert async_bibs == sync_bibs
+    assert sorted(async_requests, key=repr) == sorted(sync_requests, key=repr)
+    assert async_requests != []
+
+
+class TestAsyncSessions:
+    def test_platform_token_reused(self, sierra_service, platform_tokens):
+        session = make_session("nypl", httpx2.MockTransport(sierra_service))
+        fetcher = async_clients.AsyncSierraBibFetcher(session=session)
+        fetcher.get_bibs_by_id(value="9781234567890", key="isbn")
+        fetcher.get_bibs_by_id(value="9780987654321", key="isbn")
+        fetcher.close()
+        assert len(platform_tokens) == 1
+        assert [i.headers["Authorization"] for i in sierra_service.requests] == [
+            "Bearer foo1",
+            "Bearer foo1",
+        ]
+
+    def test_platform_token_refreshed(
+        self, sierra_service, platform_tokens, monkeypatch
+    ):
+        session = make_session("nypl", httpx2.MockTransport(sierra_service))
+        fetcher = async_clients.AsyncSierraBibFetcher(session=session)
+        fetcher.get_bibs_by_id(value="9781234567890", key="isbn")
+        monkeypatch.setattr(session.session.authorization, "is_expired", lambda: True)
+        fetcher.get_bibs_by_id(value="9780987654321", key="isbn")
+        fetcher.close()
+        assert len(platform_tokens) == 2
+        assert sierra_service.requests[-1].headers["Authorization"] == "Bearer foo2"
+
+    def test_platform_token_refreshed_off_event_loop(
+        self, sierra_service, platform_tokens, monkeypatch
+    ):
+        session = make_session("nypl", httpx2.MockTransport(sierra_service))
+        fetcher = async_clients.AsyncSierraBibFetcher(session=session)
+        refresh = session.session._refresh_credentials
+        loop_running = []
+
+        def blocking_refresh():
+            event = threading.Event()
+            fetcher.runner.loop.call_soon_threadsafe(event.set)
+            loop_running.append(event.wait(timeout=1))
+            refresh()
+
+        monkeypatch.setattr(session.session, "_refresh_credentials", blocking_refresh)
+        monkeypatch.setattr(session.session.authorization, "is_expired", lambda: True)
+        fetcher.get_bibs_by_id(value="9781234567890", key="isbn")
+        fetcher.close()
+        assert loop_running == [True]
+        assert len(platform_tokens) == 2
+
+    def test_session_requires_requests_session(self):
+        with pytest.raises(TypeError) as exc:
+            async_clients.AsyncSierraSession(object())
+        assert "must wrap a `requests.Session`" in str(exc.value)
+
+    def test_server_error(self, sierra_service, caplog):
+        def error(request):
+            return httpx2.Response(503)
+
+        session = make_session("bpl", httpx2.MockTransport(error))
+        fetcher = async_clients.AsyncSierraBibFetcher(session=session)
+        with pytest.raises(httpx2.HTTPStatusError):
+            fetcher.get_bibs_by_id(value="9781234567890", key="isbn")
+        fetcher.close()
+        assert "HTTPStatusError while running Sierra queries." in caplog.text
+
+    def test_server_error_retried(self, sierra_service, monkeypatch):
+        statuses = [503, 429]
+
+        def flaky(request):
+            if statuses:
+                return httpx2.Response(statuses.pop())
+            return sierra_service(request)
+
+        async def no_sleep(seconds):
+            return None
+
+        monkeypatch.setattr(throttling.asyncio, "sleep", no_sleep)
+        throttle = throttling.Throttle(
+            name="bpl", retry_exceptions=async_clients.RETRY_EXCEPTIONS
+        )
+        session = make_session("bpl", httpx2.MockTransport(flaky))
+        fetcher = async_clients.AsyncSierraBibFetcher(
+            session=session, throttle=throttle
+        )
+        bibs = fetcher.get_bibs_by_id(value="9781234567890", key="isbn")
+        fetcher.close()
+        assert [i["id"] for i in bibs] == ["12345678"]
+        assert statuses == []
+
+    @pytest.mark.parametrize("status_code", [400, 401])
+    def test_client_error_not_retried(self, sierra_service, monkeypatch, status_code):
+        requests_sent = []
+
+        def error(request):
+            requests_sent.append(request)
+            return httpx2.Response(status_code)
+
+        async def no_sleep(seconds):
+            return None
+
+        monkeypatch.setattr(throttling.asyncio, "sleep", no_sleep)
+        throttle = throttling.Throttle(
+            name="nypl", retry_exceptions=async_clients.RETRY_EXCEPTIONS
+        )
+        session = make_session("nypl", httpx2.MockTransport(error))
+        fetcher = async_clients.AsyncSierraBibFetcher(
+            session=session, throttle=throttle
+        )
+        with pytest.raises(httpx2.HTTPStatusError):
+            fetcher.get_bibs_by_id(value="9781234567890", key="isbn")
+        fetcher.close()
+        assert len(requests_sent) == 1
+
+    def test_transport_error_retried(self, sierra_service, monkeypatch):
+        errors = [httpx2.ConnectTimeout("timeout")]
+
+        def flaky(request):
+            if errors:
+                raise errors.pop()
+            return sierra_service(request)
+
+        async def no_sleep(seconds):
+            return None
+
+        monkeypatch.setattr(throttling.asyncio, "sleep", no_sleep)
+        throttle = throttling.Throttle(
+            name="bpl", retry_exceptions=async_clients.RETRY_EXCEPTIONS
+        )
+        session = make_session("bpl", httpx2.MockTransport(flaky))
+        fetcher = async_clients.AsyncSierraBibFetcher(
+            session=session, throttle=throttle
+        )
+        bibs = fetcher.get_bibs_by_id(value="9781234567890", key="isbn")
+        fetcher.close()
+        assert [i["id"] for i in bibs] == ["12345678"]
+        assert errors == []
+
+    @pytest.mark.parametrize(
+        "library, session_class",
+        [("bpl", clients.BPLSolrSession), ("nypl", clients.NYPLPlatformSession)],
+    )
+    def test_fetcher_factory_async(self, sierra_service, library, session_class):
+        fetcher = clients.FetcherFactory().make(library, use_async=True)
+        assert isinstance(fetcher, async_clients.AsyncSierraBibFetcher)
+        assert isinstance(fetcher.session, async_clients.AsyncSierraSession)
+        assert isinstance(fetcher.session.session, session_class)
+        fetcher.close()
+
+    @pytest.mark.parametrize("library", ["bpl", "nypl"])
+    def test_fetcher_factory_async_pool(self, sierra_service, library):
+        pool = clients.SierraSessionPool()
+        factory = clients.FetcherFactory()
+        first = factory.make(library, pool=pool, use_async=True)
+        second = factory.make(library, pool=pool, use_async=True)
+        assert isinstance(first, async_clients.AsyncSierraBibFetcher)
+        assert isinstance(second, async_clients.AsyncSierraBibFetcher)
+        assert first.session is second.session is pool.get_async(library)
+        assert first.runner is second.runner is pool.runner
+        first.close()
+        assert not first.session.client.is_closed
+        assert not pool.runner.loop.is_closed()
+        runner = pool.runner
+        pool.close()
+        assert first.session.client.is_closed
+        assert runner.loop.is_closed()
+        assert pool.runner is None
+
+    def test_pool_warm_async(self, sierra_service, platform_tokens):
+        pool = clients.SierraSessionPool()
+        pool.warm(use_async=True)
+        assert "bpl" not in pool
+        assert len(platform_tokens) == 1
+        assert pool.get_async("nypl") is pool.get_async("nypl")
+        pool.close()
+
+    def test_create_async_session_invalid_library(self):
+        with pytest.raises(ValueError) as exc:
+            clients.create_async_session("foo")
+        assert str(exc.value) == "Invalid library: foo. Must be 'bpl' or 'nypl'"
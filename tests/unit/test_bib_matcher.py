@@ -1,10 +1,14 @@
+import json
+import threading
 from contextlib import nullcontext as does_not_raise
+from types import SimpleNamespace
 
 import pytest
+import requests
 
 from overload_web.application.services import match_service
 from overload_web.domain.models import bibs
-from overload_web.infrastructure import clients
+from overload_web.infrastructure import clients, throttling
 
 
 @pytest.fixture
@@ -79,12 +83,210 @@ class TestSierraBibFetcher:
             fetcher.get_bibs_by_id(value="123456789", key="isbn")
         assert "BookopsSolrError while running Sierra queries." in caplog.text
 
+    def test_get_bibs_by_id_throttle_retry(self, mock_session, monkeypatch):
+        errors = [requests.exceptions.ReadTimeout("timeout")]
+
+        def flaky(*args, **kwargs):
+            if errors:
+                raise clients.BookopsSolrError("timeout") from errors.pop()
+
+        monkeypatch.setattr(mock_session, "_get_bibs_by_isbn", flaky)
+        throttle = throttling.Throttle(
+            name="bpl",
+            retry_exceptions=clients.RETRY_EXCEPTIONS,
+            sleep=lambda seconds: None,
+        )
+        fetcher = clients.SierraBibFetcher(session=mock_session, throttle=throttle)
+        bibs = fetcher.get_bibs_by_id(value="123456789", key="isbn")
+        assert bibs == [{"id": "123456789", "title": "foo"}]
+        assert errors == []
+
+    @pytest.mark.parametrize("status_code", [400, 401])
+    def test_get_bibs_by_id_throttle_client_error(
+        self, mock_session, monkeypatch, status_code
+    ):
+        calls = []
+
+        def rejected(*args, **kwargs):
+            calls.append(args)
+            response = requests.Response()
+            response.status_code = status_code
+            raise clients.BookopsSolrError(
+                f"{status_code} Client Error"
+            ) from requests.exceptions.HTTPError(response=response)
+
+        monkeypatch.setattr(mock_session, "_get_bibs_by_isbn", rejected)
+        throttle = throttling.Throttle(
+            name="bpl",
+            retry_exceptions=clients.RETRY_EXCEPTIONS,
+            sleep=lambda seconds: None,
+        )
+        fetcher = clients.SierraBibFetcher(session=mock_session, throttle=throttle)
+        with pytest.raises(clients.BookopsSolrError):
+            fetcher.get_bibs_by_id(value="123456789", key="isbn")
+        assert len(calls) == 1
+
+    def test_get_bibs_by_id_throttle_status_not_retried(
+        self, mock_session, monkeypatch
+    ):
+        calls = []
+
+        def unauthorized(*args, **kwargs):
+            calls.append(args)
+            return SimpleNamespace(status_code=401, ok=False, headers={})
+
+        throttle = throttling.Throttle(name="nypl", sleep=lambda seconds: None)
+        fetcher = clients.SierraBibFetcher(
+            session=clients.NYPLPlatformSession(), throttle=throttle
+        )
+        monkeypatch.setattr("requests.Session.get", unauthorized)
+        monkeypatch.setattr(fetcher.session, "_parse_response", lambda r: [])
+        assert fetcher.get_bibs_by_id(value="123456789", key="isbn") == []
+        assert len(calls) == 1
+
+    def test_get_bibs_by_id_throttle_retry_error(
+        self, mock_session, monkeypatch, caplog
+    ):
+        def throttled(*args, **kwargs):
+            return SimpleNamespace(status_code=429, ok=False, headers={})
+
+        throttle = throttling.Throttle(
+            name="nypl", max_attempts=1, sleep=lambda seconds: None
+        )
+        fetcher = clients.SierraBibFetcher(
+            session=clients.NYPLPlatformSession(), throttle=throttle
+        )
+        monkeypatch.setattr("requests.Session.get", throttled)
+        with pytest.raises(throttling.RetryError):
+            fetcher.get_bibs_by_id(value="123456789", key="isbn")
+        assert "RetryError while running Sierra queries." in caplog.text
+
     def test_get_bibs_by_id_nypl_issn(self, mock_session):
         fetcher = clients.SierraBibFetcher(session=clients.NYPLPlatformSession())
         with pytest.raises(NotImplementedError) as exc:
             fetcher.get_bibs_by_id(value="123456789", key="issn")
         assert "Search by ISSN not implemented in NYPL Platform" in str(exc.value)
 
+    def test_get_bibs_by_ids_nypl(self, mock_session, caplog):
+        fetcher = clients.SierraBibFetcher(session=clients.NYPLPlatformSession())
+        bibs = fetcher.get_bibs_by_ids(values=["123456789", 987654321], key="bib_id")
+        assert bibs == {
+            "123456789": [{"id": "123456789", "title": "foo"}],
+            "987654321": [],
+        }
+        assert "on bib_id with 2 values" in caplog.text
+
+    def test_get_bibs_by_ids_unattributed_fallback(self, mock_session, caplog):
+        fetcher = clients.SierraBibFetcher(session=clients.BPLSolrSession())
+        bibs = fetcher.get_bibs_by_ids(values=["978-1", "9782"], key="isbn")
+        assert list(bibs.keys()) == ["978-1", "9782"]
+        assert all(i == [{"id": "123456789", "title": "foo"}] for i in bibs.values())
+        assert "Querying each value individually." in caplog.text
+
+    def test_get_bibs_by_ids_bpl_isbn(self, mock_session, monkeypatch):
+        session = clients.BPLSolrSession()
+        docs = [
+            {"id": "1", "isbn": ["9781234567890"]},
+            {"id": "2", "isbn": ["9781234567890", "9780987654321"]},
+        ]
+        monkeypatch.setattr(session, "_parse_response", lambda *args: docs)
+        fetcher = clients.SierraBibFetcher(session=session)
+        bibs = fetcher.get_bibs_by_ids(
+            values=["978-1-234-56789-0", "9780987654321", "9781111111111"], key="isbn"
+        )
+        assert [i["id"] for i in bibs["978-1-234-56789-0"]] == ["1", "2"]
+        assert [i["id"] for i in bibs["9780987654321"]] == ["2"]
+        assert bibs["9781111111111"] == []
+
+    def test_get_bibs_by_ids_truncated(self, mock_session, monkeypatch, caplog):
+        session = clients.BPLSolrSession()
+        docs = {
+            "batch": [{"id": str(i), "isbn": ["9781234567890"]} for i in range(10)],
+            "9781234567890": [
+                {"id": str(i), "isbn": ["9781234567890"]} for i in range(12)
+            ],
+            "9780987654321": [{"id": "12", "isbn": ["9780987654321"]}],
+        }
+        monkeypatch.setattr(session, "_get_bibs_by_values", lambda *args: "batch")
+        monkeypatch.setattr(session, "_get_bibs_by_isbn", lambda value: value)
+        monkeypatch.setattr(session, "_parse_response", lambda response: docs[response])
+        fetcher = clients.SierraBibFetcher(session=session)
+        bibs = fetcher.get_bibs_by_ids(
+            values=["9781234567890", "9780987654321"], key="isbn"
+        )
+        assert bibs == {
+            "9781234567890": docs["9781234567890"],
+            "9780987654321": docs["9780987654321"],
+        }
+        assert "Querying each value individually." in caplog.text
+
+    def test_get_bibs_by_ids_bpl_upc(self, mock_session, monkeypatch):
+        session = clients.BPLSolrSession()
+        docs = [{"id": "1", "sm_bib_varfields": ["024 || {{a}} 12345"]}]
+        monkeypatch.setattr(session, "_parse_response", lambda *args: docs)
+        fetcher = clients.SierraBibFetcher(session=session)
+        bibs = fetcher.get_bibs_by_ids(values=["12345", "67890"], key="upc")
+        assert bibs == {"12345": docs, "67890": []}
+
+    def test_get_bibs_by_ids_bpl_upc_response(self, mock_session, monkeypatch):
+        with open("tests/data/bpl-solr-upc-response.json") as fh:
+            data = json.load(fh)
+        queries = []
+
+        def response(*args, **kwargs):
+            queries.append(kwargs)
+            return SimpleNamespace(status_code=200, json=lambda: data)
+
+        monkeypatch.setattr("requests.Session.get", response)
+        docs = data["response"]["docs"]
+        fetcher = clients.SierraBibFetcher(session=clients.BPLSolrSession())
+        bibs = fetcher.get_bibs_by_ids(
+            values=["602445789123", "093624914256", "B0034567-02"], key="upc"
+        )
+        assert bibs == {
+            "602445789123": [docs[0]],
+            "093624914256": [docs[1]],
+            "B0034567-02": [docs[0]],
+        }
+        assert len(queries) == 1
+
+    def test_get_ids_bpl_varfields(self, mock_session):
+        session = clients.BPLSolrSession()
+        bib = {
+            "sm_bib_varfields": [
+                "590",
+                "",
+                "024 || {{a}} 12345",
+                "028 || {{b}} Decca || {{a}} 67890",
+                "245 || {{a}} 12345",
+            ]
+        }
+        assert session._get_ids(bib, "upc") == ["12345", "67890"]
+        assert session._get_ids({}, "upc") == []
+
+    def test_get_bibs_by_ids_unsupported_batch(self, mock_session, caplog):
+        fetcher = clients.SierraBibFetcher(session=mock_session)
+        bibs = fetcher.get_bibs_by_ids(values=["1", "2", "1", None], key="isbn")
+        assert list(bibs.keys()) == ["1", "2"]
+        assert caplog.text.count("Querying Sierra with FakeSierraSession") == 2
+
+    def test_get_bibs_by_ids_invalid_matchpoint(self, mock_session):
+        fetcher = clients.SierraBibFetcher(session=mock_session)
+        with pytest.raises(ValueError) as exc:
+            fetcher.get_bibs_by_ids(values=["1", "2"], key="bar")
+        assert "Invalid matchpoint: 'bar'. Available matchpoints are:" in str(exc.value)
+
+    def test_get_bibs_by_ids_nypl_error(self, mock_session, monkeypatch, caplog):
+        def mock_error(*args, **kwargs):
+            raise clients.BookopsPlatformError
+
+        session = clients.NYPLPlatformSession()
+        monkeypatch.setattr(session, "_get_bibs_by_values", mock_error)
+        fetcher = clients.SierraBibFetcher(session=session)
+        with pytest.raises(clients.BookopsPlatformError):
+            fetcher.get_bibs_by_ids(values=["1", "2"], key="isbn")
+        assert "BookopsPlatformError while running Sierra queries." in caplog.text
+
     def test_get_bibs_by_id_bpl_issn(self, mock_session):
         fetcher = clients.SierraBibFetcher(session=clients.BPLSolrSession())
         with pytest.raises(NotImplementedError) as exc:
@@ -92,6 +294,102 @@ class TestSierraBibFetcher:
         assert "Search by ISSN not implemented in BPL Solr" in str(exc.value)
 
 
+class TestSierraSessionPool:
+    @pytest.mark.parametrize(
+        "library, session_class",
+        [("bpl", clients.BPLSolrSession), ("nypl", clients.NYPLPlatformSession)],
+    )
+    def test_get_reuses_session(self, mock_session, library, session_class):
+        pool = clients.SierraSessionPool()
+        session = pool.get(library)
+        assert isinstance(session, session_class)
+        assert pool.get(library) is session
+        assert library in pool
+
+    def test_get_invalid_library(self, mock_session):
+        pool = clients.SierraSessionPool()
+        with pytest.raises(ValueError) as exc:
+            pool.get("foo")
+        assert str(exc.value) == "Invalid library: foo. Must be 'bpl' or 'nypl'"
+
+    def test_get_platform_error(self, mock_nypl_session_error, caplog):
+        pool = clients.SierraSessionPool()
+        with pytest.raises(clients.BookopsPlatformError):
+            pool.get("nypl")
+        assert "Trouble connecting: " in caplog.text
+        assert "nypl" not in pool
+
+    def test_get_refreshes_expired_token(self, mock_session, monkeypatch):
+        pool = clients.SierraSessionPool()
+        session = pool.get("nypl")
+        old_token = session.authorization
+        monkeypatch.setattr(old_token, "is_expired", lambda: True)
+        assert pool.get("nypl") is session
+        assert session.authorization is not old_token
+        assert session.headers["Authorization"] == "Bearer foo"
+
+    def test_get_keeps_valid_token(self, mock_session):
+        pool = clients.SierraSessionPool()
+        session = pool.get("nypl")
+        token = session.authorization
+        pool.get("nypl")
+        assert session.authorization is token
+
+    def test_fetcher_refreshes_expired_token(self, mock_session, monkeypatch):
+        pool = clients.SierraSessionPool()
+        fetcher = clients.SierraBibFetcher(session=pool.get("nypl"))
+        old_token = fetcher.session.authorization
+        monkeypatch.setattr(old_token, "is_expired", lambda: True)
+        fetcher.get_bibs_by_id(value="123456789", key="isbn")
+        assert fetcher.session.authorization is not old_token
+        assert fetcher.session.headers["Authorization"] == "Bearer foo"
+
+    def test_refresh_shared_session(self, mock_session, monkeypatch):
+        session = clients.SierraSessionPool().get("nypl")
+        monkeypatch.setattr(session.authorization, "is_expired", lambda: True)
+        tokens = []
+
+        def new_token():
+            tokens.append(SimpleNamespace(token_str="bar", is_expired=lambda: False))
+            return tokens[-1]
+
+        monkeypatch.setattr(session, "_get_credentials", new_token)
+        barrier = threading.Barrier(8)
+
+        def refresh():
+            barrier.wait()
+            session._refresh_credentials()
+
+        threads = [threading.Thread(target=refresh) for _ in range(8)]
+        for thread in threads:
+            thread.start()
+        for thread in threads:
+            thread.join()
+        assert len(tokens) == 1
+        assert session.headers["Authorization"] == "Bearer bar"
+
+    def test_warm_and_close(self, mock_session):
+        pool = clients.SierraSessionPool()
+        pool.warm()
+        assert "bpl" in pool
+        assert "nypl" in pool
+        pool.close()
+        assert "bpl" not in pool
+        assert "nypl" not in pool
+
+    def test_warm_platform_error(self, mock_nypl_session_error, caplog):
+        pool = clients.SierraSessionPool()
+        pool.warm()
+        assert "bpl" in pool
+        assert "nypl" not in pool
+        assert "Unable to create Sierra session for nypl" in caplog.text
+
+    def test_fetcher_factory_with_pool(self, mock_session):
+        pool = clients.SierraSessionPool()
+        fetcher = clients.FetcherFactory().make("bpl", pool=pool)
+        assert fetcher.session is pool.get("bpl")
+
+
 @pytest.mark.parametrize(
     "library, collection", [("nypl", "BL"), ("nypl", "RL"), ("bpl", "NONE")]
 )
@@ -154,3 +452,123 @@ class TestBibMatcher:
             stub_domain_bib, matchpoints={"primary_matchpoint": None}
         )
         assert len(candidates) == 0
+
+    @pytest.mark.parametrize("max_workers", [1, 4])
+    def test_match_order_records(self, fake_fetcher, stub_domain_bib, max_workers):
+        service = match_service.BibMatcher(
+            fetcher=fake_fetcher, max_workers=max_workers
+        )
+        candidates = service.match_order_records(
+            [stub_domain_bib, stub_domain_bib],
+            matchpoints={"primary_matchpoint": "isbn"},
+        )
+        assert len(candidates) == 2
+        assert [len(i) for i in candidates] == [1, 1]
+
+    @pytest.mark.parametrize("max_workers", [1, 4])
+    def test_match_full_records(self, fake_fetcher, stub_domain_bib, max_workers):
+        stub_domain_bib.vendor_info = bibs.VendorInfo(
+            name="UNKNOWN", matchpoints={"primary_matchpoint": "isbn"}, bib_fields=[]
+        )
+        stub_domain_bib.record_type = "cat"
+        service = match_service.BibMatcher(
+            fetcher=fake_fetcher, max_workers=max_workers
+        )
+        candidates = service.match_full_records([stub_domain_bib] * 3)
+        assert len(candidates) == 3
+        assert [len(i) for i in candidates] == [1, 1, 1]
+
+    def test_match_full_records_no_vendor_index(self, fake_fetcher, stub_domain_bib):
+        stub_domain_bib.record_type = "cat"
+        service = match_service.BibMatcher(fetcher=fake_fetcher, max_workers=4)
+        with pytest.raises(ValueError) as exc:
+            service.match_full_records([stub_domain_bib, stub_domain_bib])
+        assert str(exc.value) == "Vendor index required for cataloging workflow."
+
+    def test_invalid_max_workers(self, fake_fetcher):
+        with pytest.raises(ValueError) as exc:
+            match_service.BibMatcher(fetcher=fake_fetcher, max_workers=0)
+        assert str(exc.value) == "`max_workers` must be greater than or equal to 1."
+
+    def test_invalid_batch_size(self, fake_fetcher):
+        with pytest.raises(ValueError) as exc:
+            match_service.BibMatcher(fetcher=fake_fetcher, batch_size=0)
+        assert str(exc.value) == "`batch_size` must be greater than or equal to 1."
+
+
+class FakeOrderedFetcher:
+    """Returns a single candidate whose id is the queried value."""
+
+    session = None
+
+    def __init__(self) -> None:
+        self.calls: list[tuple[str, list[str]]] = []
+
+    def get_bibs_by_id(self, value, key):
+        if key == "isbn" and value.startswith("miss"):
+            return []
+        return [{"id": value, "title": key}]
+
+    def get_bibs_by_ids(self, values, key):
+        self.calls.append((key, list(values)))
+        return {i: self.get_bibs_by_id(i, key) for i in values}
+
+
+class TestBibMatcherConcurrency:
+    def make_bib(self, isbn, control_number=None):
+        return bibs.DomainBib(
+            library="nypl",
+            collection="BL",
+            isbn=isbn,
+            title="Foo",
+            record_type="acq",
+            binary_data=b"",
+            control_number=control_number,
+        )
+
+    def test_results_in_record_order(self):
+        records = [self.make_bib(str(i)) for i in range(50)]
+        service = match_service.BibMatcher(fetcher=FakeOrderedFetcher(), max_workers=8)
+        candidates = service.match_order_records(
+            records, matchpoints={"primary_matchpoint": "isbn"}
+        )
+        assert [i[0]["id"] for i in candidates] == [str(i) for i in range(50)]
+
+    def test_matchpoint_fallback_per_record(self):
+        records = [self.make_bib("miss1", "cn1"), self.make_bib("2", "cn2")]
+        fetcher = FakeOrderedFetcher()
+        service = match_service.BibMatcher(fetcher=fetcher, max_workers=2)
+        candidates = service.match_order_records(
+            records,
+            matchpoints={
+                "primary_matchpoint": "isbn",
+                "secondary_matchpoint": "control_number",
+            },
+        )
+        assert candidates[0] == [{"id": "cn1", "title": "control_number"}]
+        assert candidates[1] == [{"id": "2", "title": "isbn"}]
+        assert fetcher.calls == [("isbn", ["miss1", "2"]), ("control_number", ["cn1"])]
+
+    def test_values_grouped_and_chunked(self):
+        records = [self.make_bib(str(i % 12)) for i in range(30)]
+        fetcher = FakeOrderedFetcher()
+        service = match_service.BibMatcher(fetcher=fetcher, batch_size=5)
+        candidates = service.match_order_records(
+            records, matchpoints={"primary_matchpoint": "isbn"}
+        )
+        assert [i[0]["id"] for i in candidates] == [str(i % 12) for i in range(30)]
+        assert [len(i[1]) for i in fetcher.calls] == [5, 5, 2]
+
+    def test_records_without_values_skipped(self):
+        records = [self.make_bib(None), self.make_bib("1")]
+        fetcher = FakeOrderedFetcher()
+        service = match_service.BibMatcher(fetcher=fetcher)
+        candidates = service.match_order_records(
+            records,
+            matchpoints={
+                "primary_matchpoint": "isbn",
+                "secondary_matchpoint": "control_number",
+            },
+        )
+        assert candidates == [[], [{"id": "1", "title": "isbn"}]]
+        assert fetcher.calls == [("isbn", ["1"])]
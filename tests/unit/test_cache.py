@@ -0,0 +1,158 @@
+import pytest
+
+from overload_web.application.services import match_service
+from overload_web.domain.models import bibs
+from overload_web.infrastructure import cache, clients
+
+
+class FakeTimer:
+    def __init__(self) -> None:
+        self.now = 0.0
+
+    def __call__(self) -> float:
+        return self.now
+
+
+@pytest.fixture
+def timer():
+    return FakeTimer()
+
+
+@pytest.fixture
+def cached_fetcher(fake_fetcher, timer, monkeypatch):
+    calls = []
+    get_bibs_by_id = fake_fetcher.get_bibs_by_id
+
+    def counting_get_bibs_by_id(value, key):
+        calls.append((key, value))
+        return get_bibs_by_id(value=value, key=key)
+
+    monkeypatch.setattr(fake_fetcher, "get_bibs_by_id", counting_get_bibs_by_id)
+    fetcher = cache.CachedSierraBibFetcher(
+        fetcher=fake_fetcher, cache=cache.TTLCache(ttl=60, timer=timer), library="nypl"
+    )
+    fetcher.calls = calls
+    return fetcher
+
+
+class TestTTLCache:
+    def test_get_set(self, timer):
+        ttl_cache = cache.TTLCache(timer=timer)
+        ttl_cache.set("foo", [1])
+        assert ttl_cache.get("foo") == [1]
+        assert ttl_cache.get("bar") is None
+        assert ttl_cache.get("bar", []) == []
+        assert "foo" in ttl_cache
+        assert ttl_cache.stats == {"hits": 1, "misses": 2, "size": 1}
+
+    def test_expired(self, timer):
+        ttl_cache = cache.TTLCache(ttl=10, timer=timer)
+        ttl_cache.set("foo", [1])
+        timer.now = 9.9
+        assert ttl_cache.get("foo") == [1]
+        timer.now = 10
+        assert "foo" not in ttl_cache
+        assert ttl_cache.get("foo") is None
+        assert len(ttl_cache) == 0
+
+    def test_lru_eviction(self, timer):
+        ttl_cache = cache.TTLCache(maxsize=2, timer=timer)
+        ttl_cache.set("foo", 1)
+        ttl_cache.set("bar", 2)
+        ttl_cache.get("foo")
+        ttl_cache.set("baz", 3)
+        assert len(ttl_cache) == 2
+        assert "bar" not in ttl_cache
+        assert ttl_cache.get("foo") == 1
+        assert ttl_cache.get("baz") == 3
+
+    def test_invalidate_and_clear(self, timer):
+        ttl_cache = cache.TTLCache(timer=timer)
+        ttl_cache.set("foo", 1)
+        ttl_cache.set("bar", 2)
+        ttl_cache.invalidate("foo")
+        ttl_cache.invalidate("baz")
+        assert "foo" not in ttl_cache
+        assert ttl_cache.get("bar") == 2
+        ttl_cache.clear()
+        assert ttl_cache.stats == {"hits": 0, "misses": 0, "size": 0}
+
+    @pytest.mark.parametrize(
+        "kwargs, msg",
+        [
+            ({"maxsize": 0}, "`maxsize` must be greater than or equal to 1."),
+            ({"ttl": 0}, "`ttl` must be greater than 0."),
+        ],
+    )
+    def test_invalid_args(self, kwargs, msg):
+        with pytest.raises(ValueError) as exc:
+            cache.TTLCache(**kwargs)
+        assert str(exc.value) == msg
+
+
+@pytest.mark.parametrize("library, collection", [("nypl", "BL"), ("bpl", "NONE")])
+class TestCachedSierraBibFetcher:
+    def test_get_bibs_by_id(self, cached_fetcher):
+        first = cached_fetcher.get_bibs_by_id(value="978-1234567890", key="isbn")
+        second = cached_fetcher.get_bibs_by_id(value="9781234567890", key="isbn")
+        assert first == second
+        assert len(first) == 1
+        assert cached_fetcher.calls == [("isbn", "978-1234567890")]
+        assert cached_fetcher.cache.stats == {"hits": 1, "misses": 1, "size": 1}
+
+    def test_get_bibs_by_id_expired(self, cached_fetcher, timer):
+        cached_fetcher.get_bibs_by_id(value="9781234567890", key="isbn")
+        timer.now = 60
+        cached_fetcher.get_bibs_by_id(value="9781234567890", key="isbn")
+        assert len(cached_fetcher.calls) == 2
+
+    def test_get_bibs_by_id_none(self, cached_fetcher):
+        assert cached_fetcher.get_bibs_by_id(value=None, key="isbn") == []
+        assert len(cached_fetcher.cache) == 0
+
+    def test_get_bibs_by_id_keyed_on_matchpoint_and_library(self, cached_fetcher):
+        cached_fetcher.get_bibs_by_id(value="12345", key="isbn")
+        cached_fetcher.get_bibs_by_id(value="12345", key="upc")
+        other_library = cache.CachedSierraBibFetcher(
+            fetcher=cached_fetcher.fetcher, cache=cached_fetcher.cache, library="bpl"
+        )
+        other_library.get_bibs_by_id(value="12345", key="isbn")
+        assert len(cached_fetcher.calls) == 3
+
+    def test_get_bibs_by_ids(self, cached_fetcher):
+        cached_fetcher.get_bibs_by_id(value="1", key="isbn")
+        out = cached_fetcher.get_bibs_by_ids(values=["1", "2", "2", None], key="isbn")
+        assert sorted(out.keys()) == ["1", "2"]
+        assert cached_fetcher.calls == [("isbn", "1"), ("isbn", "2")]
+        cached_fetcher.get_bibs_by_ids(values=["1", "2"], key="isbn")
+        assert len(cached_fetcher.calls) == 2
+
+    def test_invalidate(self, cached_fetcher):
+        cached_fetcher.get_bibs_by_id(value="1", key="isbn")
+        cached_fetcher.invalidate(value="1", key="isbn")
+        cached_fetcher.get_bibs_by_id(value="1", key="isbn")
+        assert len(cached_fetcher.calls) == 2
+
+    def test_invalid_matchpoint(self, cached_fetcher):
+        with pytest.raises(ValueError) as exc:
+            cached_fetcher.get_bibs_by_id(value="1", key="bar")
+        assert "Invalid matchpoint: 'bar'." in str(exc.value)
+
+    def test_session(self, cached_fetcher):
+        assert isinstance(cached_fetcher.session, clients.SierraSessionProtocol)
+
+    def test_bib_matcher_uses_cache(self, cached_fetcher, library, collection):
+        record = bibs.DomainBib(
+            library=library,
+            collection=collection,
+            isbn="9781234567890",
+            title="Foo",
+            record_type="acq",
+            binary_data=b"",
+        )
+        service = match_service.BibMatcher(fetcher=cached_fetcher)
+        service.match_order_records(
+            [record, record], matchpoints={"primary_matchpoint": "isbn"}
+        )
+        service.match_order_record(record, matchpoints={"primary_matchpoint": "isbn"})
+        assert cached_fetcher.calls == [("isbn", "9781234567890")]
@@ -1,5 +1,8 @@
 """Tests parsing of Sierra responses and match analysis logic for different scenarios."""
 
+import dataclasses
+import datetime
+
 import pytest
 
 from overload_web.domain.models import sierra_responses
@@ -19,6 +22,158 @@ def nypl_data():
     }
 
 
+class TestSierraResponses:
+    @pytest.mark.parametrize("library, collection", [("nypl", "BL"), ("nypl", "RL")])
+    def test_nypl_response(self, sierra_response, collection):
+        sierra_response["varFields"].extend(
+            [
+                {"marcTag": None, "fieldTag": "y", "content": "foo"},
+                {"marcTag": "020", "subfields": [{"content": "123", "tag": "a"}]},
+                {"marcTag": "024", "subfields": [{"content": "456", "tag": "a"}]},
+                {"marcTag": "035", "subfields": [{"content": "(OCoLC)1", "tag": "a"}]},
+            ]
+        )
+        response = sierra_responses.NYPLPlatformResponse(data=sierra_response)
+        assert sorted(response.isbn) == ["123", "9781234567890"]
+        assert sorted(response.oclc_number) == ["(OCoLC)1", "ocn123456789"]
+        assert response.upc == ["456"]
+        assert response.cat_source == "inhouse"
+        assert response.collection == collection
+        if collection == "BL":
+            assert response.branch_call_number == "Foo"
+            assert response.research_call_number == []
+        else:
+            assert response.branch_call_number is None
+            assert response.research_call_number == ["Foo"]
+
+    @pytest.mark.parametrize("library, collection", [("bpl", "NONE")])
+    def test_bpl_response(self, sierra_response):
+        sierra_response["sm_bib_varfields"].extend(
+            ["020 || {{a}} 123 || {{q}} pbk", "099 || {{a}} FIC || {{a}} BAR"]
+        )
+        response = sierra_responses.BPLSolrResponse(data=sierra_response)
+        assert sorted(response.isbn) == ["123", "9781234567890"]
+        assert response.oclc_number == ["ocn123456789"]
+        assert response.upc == ["12345"]
+        assert response.barcodes == ["33333123456789"]
+        assert response.branch_call_number in ["FIC BAR", "Foo"]
+        assert [i["marc_tag"] for i in response.var_fields] == ["024", "020", "099"]
+
+    @pytest.mark.parametrize("library, collection", [("nypl", "RL")])
+    def test_to_candidate(self, sierra_response):
+        response = sierra_responses.NYPLPlatformResponse(data=sierra_response)
+        candidate = response.to_candidate()
+        assert candidate == sierra_responses.SierraCandidate(
+            bib_id="12345",
+            branch_call_number=None,
+            cat_source="inhouse",
+            collection="RL",
+            library="nypl",
+            research_call_number=["Foo"],
+            title="Record 1",
+            update_datetime=datetime.datetime(2000, 1, 1, 1, 0, 0),
+        )
+        with pytest.raises(dataclasses.FrozenInstanceError):
+            candidate.bib_id = "23456"  # type: ignore[misc]
+
+    @pytest.mark.parametrize(
+        "library, collection", [("nypl", "BL"), ("nypl", "RL"), ("bpl", "NONE")]
+    )
+    def test_fields_indexed_once(self, sierra_response, library):
+        if library == "bpl":
+            response = sierra_responses.BPLSolrResponse(data=sierra_response)
+        else:
+            response = sierra_responses.NYPLPlatformResponse(data=sierra_response)
+        index = response._fields_by_tag
+        values = (
+            response.isbn,
+            response.upc,
+            response.oclc_number,
+            response.collection,
+        )
+        response._data = {}
+        assert response._fields_by_tag is index
+        assert (
+            response.isbn,
+            response.upc,
+            response.oclc_number,
+            response.collection,
+        ) == values
+
+
+def legacy_nypl_location(loc):
+    if len(loc) < 3:
+        return None
+    if loc == "zzzzz":
+        return "BL"
+    elif loc == "xxx":
+        return "RL"
+    elif loc in ["myd", "myh", "mym", "myt"]:
+        return "RL"
+    elif loc[:2] == "my" and loc not in ["myd", "myh", "mym", "myt"]:
+        return "BL"
+    elif loc[:2] == "sc":
+        return "RL"
+    elif loc[:3] == "maj":
+        return "BL"
+    elif loc[:2] == "ma" and loc[:3] != "maj":
+        return "RL"
+    elif loc[:3] in ["lsx", "lsd"]:
+        return "RL"
+    elif loc[:2] in sierra_responses.NYPL_BRANCHES.keys():
+        return "BL"
+    return None
+
+
+class TestClassifyNYPLLocation:
+    @pytest.mark.parametrize(
+        "code, collection",
+        [
+            ("a", None),
+            ("ag", None),
+            ("agj0n", "BL"),
+            ("zzzzz", "BL"),
+            ("zzzz", None),
+            ("xxx", "RL"),
+            ("myd", "RL"),
+            ("mydx", "BL"),
+            ("myj", "BL"),
+            ("maj", "BL"),
+            ("max", "RL"),
+            ("lsd", "RL"),
+            ("lsa", "BL"),
+            ("scx", "RL"),
+            ("123", None),
+        ],
+    )
+    def test_classify_nypl_location(self, code, collection):
+        assert sierra_responses.classify_nypl_location(code) == collection
+
+    def test_classify_nypl_location_parity(self):
+        letters = "abcdefghijklmnopqrstuvwxyz0123456789"
+        codes = ["zzzzz", "xxxx", "mydx", "majxx", "lsdxx"]
+        codes.extend(a + b + c for a in letters for b in letters for c in "adjmtx ")
+        for code in codes:
+            assert sierra_responses.classify_nypl_location(code) == (
+                legacy_nypl_location(code)
+            ), code
+
+    @pytest.mark.parametrize(
+        "locations, collection",
+        [
+            (["a", "123"], None),
+            (["agj0n", "myj", "zzzzz"], "BL"),
+            (["myd", "scf", "lsd", "xxx"], "RL"),
+            (["mal92", "agj0n"], "MIXED"),
+            (["rc2ma", "maj", "sc"], "BL"),
+        ],
+    )
+    def test_nypl_response_location_collection(self, nypl_data, locations, collection):
+        nypl_data["locations"] = [{"code": i, "name": "Foo"} for i in locations]
+        response = sierra_responses.NYPLPlatformResponse(data=nypl_data)
+        assert response.collection == collection
+
+
 class TestCandidateClassifier:
     @pytest.mark.parametrize(
         "library, collection", [("nypl", "BL"), ("nypl", "RL"), ("bpl", "NONE")]
@@ -27,6 +182,19 @@ class TestCandidateClassifier:
         classified = full_bib.classify_matches([sierra_response, sierra_response])
         assert classified.duplicates == ["12345", "12345"]
 
+    @pytest.mark.parametrize(
+        "library, collection", [("nypl", "BL"), ("nypl", "RL"), ("bpl", "NONE")]
+    )
+    def test_classify_matches_candidates(self, full_bib, sierra_response):
+        classified = full_bib.classify_matches([sierra_response])
+        candidate = classified.matched[0]
+        assert isinstance(candidate, sierra_responses.SierraCandidate)
+        assert candidate.bib_id == "12345"
+        assert candidate.title == "Record 1"
+        assert candidate.cat_source == "inhouse"
+        assert not hasattr(candidate, "_data")
+        assert not hasattr(candidate, "__dict__")
+
     @pytest.mark.parametrize("library, collection", [("nypl", "BL"), ("nypl", "RL")])
     def test_classify_matches_nypl_mixed(self, full_bib, nypl_data):
         nypl_data["varFields"] = [
@@ -1,10 +1,15 @@
 import datetime
+import json
+import mmap
+import pickle
 
 import pytest
 from bookops_marc import Bib
-from pymarc import Field, Indicators, Subfield
+from pymarc import Field, Indicators, Record, Subfield
+from pymarc.exceptions import FieldNotFound
 
-from overload_web.application.services import marc
+from overload_web.application.services import marc, marc_updates
+from overload_web.infrastructure import marc_engine as mrc
 
 
 @pytest.fixture
@@ -91,6 +96,35 @@ class TestParser:
         assert len(caplog.records) == 1
         assert "Vendor record parsed: " in caplog.records[0].msg
 
+    @pytest.mark.parametrize(
+        "library, collection, record_type",
+        [("nypl", "BL", "cat"), ("nypl", "RL", "acq"), ("bpl", "NONE", "sel")],
+    )
+    def test_parse_skips_unreadable_record(self, marc_engine, stub_bib, caplog):
+        errors = []
+        records = marc.BibParser.parse_marc_data(
+            b"00026nam a22abcde   4500\x1e\x1d" + stub_bib.as_marc(),
+            engine=marc_engine,
+            on_error=lambda: errors.append(True),
+        )
+        assert len(records) == 1
+        assert errors == [True]
+        assert "Unable to parse vendor record: " in caplog.text
+
+    @pytest.mark.parametrize(
+        "library, collection, record_type",
+        [("nypl", "BL", "cat"), ("nypl", "RL", "acq"), ("bpl", "NONE", "sel")],
+    )
+    def test_parse_keeps_parsed_record(self, marc_engine, stub_bib):
+        records = marc.BibParser.parse_marc_data(stub_bib.as_marc(), engine=marc_engine)
+        assert marc_engine.create_bib_from_domain(records[0]) is records[0].marc_record
+        assert records[0].binary_data == stub_bib.as_marc()
+        records[0].binary_data = stub_bib.as_marc()
+        assert records[0].marc_record is None
+        assert marc_engine.create_bib_from_domain(records[0]).as_marc() == (
+            stub_bib.as_marc()
+        )
+
     @pytest.mark.parametrize(
         "library, collection, record_type, tag, value",
         [
@@ -140,6 +174,24 @@ class TestParser:
         assert len(caplog.records) == 1
         assert "Vendor record parsed: " in caplog.records[0].msg
 
+    @pytest.mark.parametrize(
+        "library, collection, record_type",
+        [("nypl", "BL", "cat"), ("bpl", "NONE", "acq")],
+    )
+    def test_parse_mapped_file(self, marc_engine, tmp_path):
+        with open(f"tests/data/{marc_engine.library}-sample.mrc", "rb") as fh:
+            marc_data = fh.read()
+        (tmp_path / "foo.mrc").write_bytes(marc_data)
+        with open(tmp_path / "foo.mrc", "rb") as fh:
+            mapped = mmap.mmap(fh.fileno(), 0, access=mmap.ACCESS_READ)
+        mapped.read(10)
+        records = marc.BibParser.parse_marc_data(data=mapped, engine=marc_engine)
+        assert [i.binary_data for i in records] == [
+            i.binary_data
+            for i in marc.BibParser.parse_marc_data(data=marc_data, engine=marc_engine)
+        ]
+        mapped.close()
+
     @pytest.mark.parametrize(
         "library, collection, record_type",
         [
@@ -157,3 +209,538 @@ class TestParser:
         assert len(records) == 1
         assert records[0].update_date == "20200101010000.0"
         assert records[0].update_datetime == datetime.datetime(2020, 1, 1, 1, 0, 0, 0)
+
+
+@pytest.mark.parametrize(
+    "data",
+    [
+        b"0002",
+        b"00030cam  2200025 i 4500\x1e12\x1d",
+        b"00030cam a2200025 i 4500\x1e12345\x1d",
+        b"00032cam a2200025 i 4500\x1e12345\x1d",
+        b"00030cam a2200024 i 4500\x1e1234\x1e\x1d",
+        b"0003xcam a2200025 i 4500\x1e1234\x1d",
+    ],
+)
+def test_locate_records_malformed(data):
+    assert mrc.locate_records(data) is None
+
+
+def test_locate_records():
+    record = b"00030cam a2200025 i 4500\x1e1234\x1d"
+    assert mrc.locate_records(record * 2) == [(0, 30), (30, 60)]
+    assert mrc.locate_records(b"") == []
+
+
+class TestMarcRecordIndexer:
+    @pytest.mark.parametrize(
+        "library, collection, record_type",
+        [("nypl", "BL", "cat"), ("bpl", "NONE", "acq")],
+    )
+    def test_index(self, library, marc_engine):
+        with open(f"tests/data/{library}-sample.mrc", "rb") as fh:
+            marc_data = fh.read()
+        index = mrc.MarcRecordIndexer().index(marc_data)
+        records = list(marc_engine.get_reader(marc_data))
+        assert len(index["records"]) == len(records)
+        for position, record in enumerate(records):
+            offset, length = index["records"][position]
+            assert marc_data[offset : offset + length] == record.as_marc()
+            assert position in index["control_number"][record["001"].data.strip()]
+            for field in record.get_fields("020"):
+                if field.get("a"):
+                    isbn = field["a"].split(" ")[0].replace("-", "")
+                    assert position in index["isbn"][isbn]
+
+    @pytest.mark.parametrize("library, collection", [("nypl", "BL"), ("bpl", "NONE")])
+    def test_index_stub_bib(self, stub_bib):
+        index = mrc.MarcRecordIndexer().index(stub_bib.as_marc() * 2)
+        assert index is not None
+        assert len(index["records"]) == 2
+        assert all(i == [0, 1] for i in index["barcode"].values())
+
+    def test_index_malformed(self, caplog):
+        assert mrc.MarcRecordIndexer().index(b"00030cam a2200025 i 4500") is None
+        assert "Unable to index MARC file" in caplog.text
+
+
+class TestMarcRecordCounter:
+    @pytest.mark.parametrize("library", ["bpl", "nypl"])
+    @pytest.mark.parametrize("chunk_size", [1, 5, 7, 1024, 1024 * 1024])
+    def test_count(self, library, chunk_size):
+        with open(f"tests/data/{library}-sample.mrc", "rb") as fh:
+            marc_data = fh.read()
+        counter = mrc.MarcRecordCounter()
+        for start in range(0, len(marc_data), chunk_size):
+            counter.update(marc_data[start : start + chunk_size])
+        assert counter.count == len(mrc.locate_records(marc_data))
+
+    def test_count_empty(self):
+        counter = mrc.MarcRecordCounter()
+        counter.update(b"")
+        assert counter.count == 0
+
+    @pytest.mark.parametrize(
+        "data",
+        [b"0003", b"00030cam a2200025 i 4500", b"0003xcam a2200025 i 4500", b"00010"],
+    )
+    def test_count_malformed(self, data):
+        counter = mrc.MarcRecordCounter()
+        counter.update(data)
+        assert counter.count is None
+
+
+class TestMarcEngineConfigRegistry:
+    @pytest.mark.parametrize(
+        "library, collection, record_type",
+        [
+            ("nypl", "BL", "acq"),
+            ("nypl", "RL", "cat"),
+            ("bpl", None, "sel"),
+            ("bpl", "NONE", "cat"),
+        ],
+    )
+    def test_get(self, library, collection, record_type, engine_config):
+        registry = mrc.MarcEngineConfigRegistry("overload_web/data/mapping_specs.json")
+        config = registry.get(library, collection, record_type)
+        assert config == engine_config
+        assert registry.get(library, collection, record_type) == config
+
+    def test_get_is_cached(self):
+        registry = mrc.MarcEngineConfigRegistry("overload_web/data/mapping_specs.json")
+        assert registry.get("nypl", "BL", "cat") is registry.get("nypl", "BL", "cat")
+        assert registry.get("bpl", None, "acq") is registry.get("bpl", None, "acq")
+
+    def test_reload(self, tmp_path, get_constants):
+        path = tmp_path / "mapping_specs.json"
+        path.write_text(json.dumps(get_constants))
+        registry = mrc.MarcEngineConfigRegistry(path)
+        assert registry.get("bpl", None, "cat").bib_id_tag == "907"
+        path.write_text(
+            json.dumps({**get_constants, "bib_id_tag": {"nypl": "945", "bpl": "999"}})
+        )
+        assert registry.get("bpl", None, "cat").bib_id_tag == "907"
+        registry.reload()
+        assert registry.get("bpl", None, "cat").bib_id_tag == "999"
+        assert registry.get("nypl", "BL", "cat").bib_id_tag == "945"
+
+    def test_configs_are_read_only(self):
+        registry = mrc.MarcEngineConfigRegistry("overload_web/data/mapping_specs.json")
+        config = registry.get("nypl", "BL", "cat")
+        with pytest.raises(TypeError) as exc:
+            config.parser_vendor_mapping["UNKNOWN"]["name"] = "FOO"
+        assert str(exc.value) == "'FrozenDict' object is read-only"
+        with pytest.raises(TypeError) as exc:
+            config.parser_vendor_mapping["BT SERIES"]["bib_fields"].append({})
+        assert str(exc.value) == "'FrozenList' object is read-only"
+        assert registry.get("nypl", "BL", "cat") == config
+
+    def test_configs_pickle(self):
+        registry = mrc.MarcEngineConfigRegistry("overload_web/data/mapping_specs.json")
+        config = registry.get("bpl", None, "cat")
+        unpickled = pickle.loads(pickle.dumps(config))
+        assert unpickled == config
+        assert isinstance(unpickled.parser_vendor_mapping, mrc.FrozenDict)
+        with pytest.raises(TypeError):
+            unpickled.parser_vendor_mapping.clear()
+
+    def test_engine(self):
+        registry = mrc.MarcEngineConfigRegistry("overload_web/data/mapping_specs.json")
+        engine = registry.engine("nypl", "BL", "cat")
+        other = registry.engine("nypl", "BL", "cat")
+        assert engine is not other
+        assert engine.config is registry.get("nypl", "BL", "cat")
+        assert engine.vendor_identifier is other.vendor_identifier
+        assert engine.bib_plan is other.bib_plan
+        assert engine.order_plan is other.order_plan
+
+    def test_engine_not_prebuilt(self):
+        registry = mrc.MarcEngineConfigRegistry("overload_web/data/mapping_specs.json")
+        engine = registry.engine("nypl", "FOO", "cat")
+        assert engine.collection == "FOO"
+        assert engine.config == registry.get("nypl", "FOO", "cat")
+
+
+def legacy_identify_vendor(engine, record, rules):
+    for info in rules.values():
+        for key in ("primary", "alternate"):
+            tags = info["vendor_tags"].get(key, {})
+            if engine.get_vendor_tags_from_bib(record=record, tags=tags):
+                return info
+    return rules["UNKNOWN"]
+
+
+@pytest.mark.parametrize(
+    "library, collection, record_type", [("nypl", "BL", "cat"), ("bpl", "NONE", "cat")]
+)
+class TestVendorIdentifier:
+    def test_identify_each_vendor(self, marc_engine, stub_bib):
+        rules = marc_engine.config.parser_vendor_mapping
+        for vendor, info in rules.items():
+            for tags in info["vendor_tags"].values():
+                if not tags:
+                    continue
+                bib = Bib()
+                for field in stub_bib.fields:
+                    bib.add_field(field)
+                for tag, data in tags.items():
+                    bib.add_field(
+                        Field(
+                            tag=tag,
+                            indicators=Indicators(" ", " "),
+                            subfields=[
+                                Subfield(code=data["code"], value=data["value"])
+                            ],
+                        )
+                    )
+                identified = marc_engine.identify_vendor(bib, rules=rules)
+                assert identified == legacy_identify_vendor(marc_engine, bib, rules)
+                assert identified["name"] == info["name"]
+
+    def test_identify_sample(self, library, marc_engine):
+        rules = marc_engine.config.parser_vendor_mapping
+        for name in [f"{library}-sample.mrc", f"{library}-dupes-sample.mrc"]:
+            with open(f"tests/data/{name}", "rb") as fh:
+                records = list(marc_engine.get_reader(fh.read()))
+            assert [marc_engine.identify_vendor(i, rules=rules) for i in records] == [
+                legacy_identify_vendor(marc_engine, i, rules) for i in records
+            ]
+
+    def test_identify_partial_match(self, marc_engine, stub_bib):
+        rules = marc_engine.config.parser_vendor_mapping
+        midwest = next(
+            i for i in rules.values() if len(i["vendor_tags"]["primary"]) > 1
+        )
+        tag, data = next(iter(midwest["vendor_tags"]["primary"].items()))
+        stub_bib.add_field(
+            Field(
+                tag=tag,
+                indicators=Indicators(" ", " "),
+                subfields=[Subfield(code=data["code"], value=data["value"])],
+            )
+        )
+        assert marc_engine.identify_vendor(stub_bib, rules=rules)["name"] == "UNKNOWN"
+
+    def test_identify_first_subfield(self, marc_engine, stub_bib):
+        rules = marc_engine.config.parser_vendor_mapping
+        tag, data = next(iter(rules["INGRAM"]["vendor_tags"]["primary"].items()))
+        stub_bib.add_field(
+            Field(
+                tag=tag,
+                indicators=Indicators(" ", " "),
+                subfields=[
+                    Subfield(code=data["code"], value="foo"),
+                    Subfield(code=data["code"], value=data["value"]),
+                ],
+            )
+        )
+        assert marc_engine.identify_vendor(stub_bib, rules=rules)["name"] == "UNKNOWN"
+        assert legacy_identify_vendor(marc_engine, stub_bib, rules)["name"] == "UNKNOWN"
+
+    def test_identify_other_rules(self, marc_engine, stub_bib):
+        rules = {
+            "FOO": {
+                "name": "FOO",
+                "vendor_tags": {
+                    "primary": {"949": {"code": "i", "value": "333331234567890"}}
+                },
+            },
+            "UNKNOWN": {"name": "UNKNOWN", "vendor_tags": {"primary": {}}},
+        }
+        assert marc_engine.identify_vendor(stub_bib, rules=rules)["name"] == "FOO"
+        assert (
+            marc_engine.identify_vendor(stub_bib, rules={"UNKNOWN": rules["UNKNOWN"]})
+            == (rules["UNKNOWN"])
+        )
+
+
+def legacy_map_data(obj, rules):
+    out = {}
+    if isinstance(obj, Bib):
+        obj.normalize_oclc_control_number()
+    for k, v in rules.items():
+        if v == "oclc_nos":
+            out[k] = list(set(getattr(obj, v).values()))
+        elif isinstance(v, str):
+            out[k] = getattr(obj, v)
+        elif isinstance(v, dict) and "tag" in v:
+            field = obj.get(v["tag"])
+            if field is not None:
+                out[k] = str(field.data)
+        else:
+            field = getattr(obj, k)
+            for code, attr in v.items():
+                out[attr] = field.get(code) if field else None
+    return out
+
+
+@pytest.mark.parametrize(
+    "library, collection, record_type",
+    [("nypl", "BL", "cat"), ("nypl", "RL", "acq"), ("bpl", "NONE", "sel")],
+)
+class TestMappingPlan:
+    def test_map_data(self, library, marc_engine):
+        bib_rules = marc_engine.config.parser_bib_mapping
+        order_rules = marc_engine.config.parser_order_mapping
+        for name in [f"{library}-sample.mrc", f"{library}-dupes-sample.mrc"]:
+            with open(f"tests/data/{name}", "rb") as fh:
+                records = list(marc_engine.get_reader(fh.read()))
+            for record in records:
+                assert marc_engine.map_data(record, rules=bib_rules) == (
+                    legacy_map_data(record, bib_rules)
+                )
+                for order in record.orders:
+                    assert marc_engine.map_data(order, rules=order_rules) == (
+                        legacy_map_data(order, order_rules)
+                    )
+
+    def test_map_data_stub_bib(self, marc_engine, stub_bib):
+        stub_bib.add_field(Field(tag="005", data="20200101010000.0"))
+        rules = marc_engine.config.parser_bib_mapping
+        out = marc_engine.map_data(stub_bib, rules=rules)
+        assert out == legacy_map_data(stub_bib, rules)
+        assert out["update_date"] == "20200101010000.0"
+
+    def test_map_data_other_rules(self, marc_engine, stub_bib):
+        assert marc_engine.map_data(stub_bib, rules={"title": "title"}) == {
+            "title": stub_bib.title
+        }
+        assert marc_engine.map_data(stub_bib, rules={}) == {}
+        assert isinstance(marc_engine.bib_plan, mrc.MappingPlan)
+
+
+@pytest.mark.parametrize(
+    "library, collection, record_type",
+    [("nypl", "BL", "cat"), ("nypl", "RL", "acq"), ("bpl", "NONE", "sel")],
+)
+class TestExtract:
+    def test_extract(self, library, marc_engine):
+        bib_rules = marc_engine.config.parser_bib_mapping
+        order_rules = marc_engine.config.parser_order_mapping
+        for name in [f"{library}-sample.mrc", f"{library}-dupes-sample.mrc"]:
+            with open(f"tests/data/{name}", "rb") as fh:
+                marc_data = fh.read()
+            records = marc_engine.get_reader(marc_data)
+            for record, expected in zip(records, marc_engine.get_reader(marc_data)):
+                bib, orders = marc_engine.extract(record)
+                assert bib == legacy_map_data(expected, bib_rules)
+                assert orders == [
+                    legacy_map_data(i, order_rules) for i in expected.orders
+                ]
+                assert record.as_marc() == expected.as_marc()
+                assert "get_fields" not in vars(record)
+                assert "get" not in vars(record)
+
+    def test_parse_uses_extract(self, library, marc_engine, mocker):
+        with open(f"tests/data/{library}-sample.mrc", "rb") as fh:
+            marc_data = fh.read()
+        extract = mocker.spy(marc_engine, "extract")
+        records = marc.BibParser.parse_marc_data(marc_data, engine=marc_engine)
+        assert extract.call_count == len(records)
+
+
+class TestFieldIndex:
+    @pytest.mark.parametrize("library", ["nypl", "bpl"])
+    def test_field_index(self, library):
+        with open(f"tests/data/{library}-sample.mrc", "rb") as fh:
+            marc_data = fh.read()
+        engine = mrc.MarcEngine(
+            rules=mrc.MarcEngineConfigRegistry(
+                "overload_web/data/mapping_specs.json"
+            ).get(library, None, "cat")
+        )
+        for record in engine.get_reader(marc_data):
+            index = mrc.FieldIndex(record)
+            for tag in {i.tag for i in record.fields} | {"999"}:
+                assert index.get_fields(tag) == record.get_fields(tag)
+                assert index.get(tag) == record.get(tag)
+            assert index.get_fields("245", "020", "960") == record.get_fields(
+                "245", "020", "960"
+            )
+
+    @pytest.mark.parametrize("library, collection", [("nypl", "BL"), ("bpl", "NONE")])
+    def test_indexed_bib(self, stub_bib):
+        index = mrc.FieldIndex(stub_bib)
+        assert isinstance(index.bib, mrc.IndexedBib)
+        assert index.bib.get_fields("949") == stub_bib.get_fields("949")
+        assert index.bib.get("960") is index.tags["960"][0]
+        assert index.bib.title == stub_bib.title
+        assert index.bib.library == stub_bib.library
+        assert "get_fields" not in vars(stub_bib)
+        assert "_index" not in vars(stub_bib)
+        assert not isinstance(index.bib, Bib)
+
+    @pytest.mark.parametrize("library, collection", [("nypl", "BL"), ("bpl", "NONE")])
+    def test_indexed_bib_update(self, stub_bib):
+        index = mrc.FieldIndex(stub_bib)
+        field = Field(
+            tag="500",
+            indicators=Indicators(" ", " "),
+            subfields=[Subfield(code="a", value="Note.")],
+        )
+        index.bib.add_ordered_field(field)
+        index.bib.remove_fields("960")
+        index.bib.leader = "00000nam  2200517 i 4500"
+        assert index.bib.get_fields("500") == [field]
+        assert "960" not in index.bib
+        assert index.bib["500"] is field
+        assert list(index.bib) == stub_bib.fields
+        assert vars(index.bib) == {"_index": index}
+        record = Record(data=stub_bib.as_marc())
+        assert str(record.leader)[5:8] == "nam"
+        assert record.get_fields("500")[0].value() == "Note."
+        assert record.get_fields("960") == []
+        assert index.bib.as_marc() == stub_bib.as_marc()
+
+    @pytest.mark.parametrize("library, collection", [("nypl", "BL"), ("bpl", "NONE")])
+    def test_mapping_plan_index(self, stub_bib):
+        plan = mrc.MappingPlan({"title": "title", "update_date": {"tag": "001"}})
+        index = mrc.FieldIndex(stub_bib)
+        assert plan.apply(stub_bib, index=index) == plan.apply(stub_bib)
+
+
+def legacy_update_fields(field_updates, bib):
+    for update in field_updates:
+        if update.delete:
+            bib.remove_fields(update.tag)
+        if update.original:
+            bib.remove_field(update.original)
+        bib.add_ordered_field(
+            Field(
+                tag=update.tag,
+                indicators=Indicators(update.ind1, update.ind1),
+                subfields=[
+                    Subfield(code=i["code"], value=i["value"]) for i in update.subfields
+                ],
+            )
+        )
+
+
+def field_update(tag, value="foo", delete=False, original=None):
+    return marc_updates.MarcFieldUpdateValues(
+        tag=tag,
+        ind1=" ",
+        ind2=" ",
+        subfields=[{"code": "a", "value": value}],
+        delete=delete,
+        original=original,
+    )
+
+
+def make_bib(*tags) -> Bib:
+    bib = Bib()
+    bib.leader = "00000cam  2200517 i 4500"
+    for tag in tags:
+        bib.add_field(
+            Field(
+                tag=tag,
+                indicators=Indicators(" ", " "),
+                subfields=[Subfield(code="a", value=tag)],
+            )
+        )
+    return bib
+
+
+@pytest.mark.parametrize(
+    "library, collection, record_type", [("nypl", "BL", "cat"), ("bpl", "NONE", "cat")]
+)
+class TestUpdateFields:
+    @pytest.mark.parametrize(
+        "tags, updates",
+        [
+            ([], [field_update("949"), field_update("910", delete=True)]),
+            (["245", "020", "500", "100"], [field_update("300")]),
+            (
+                ["010", "500", "300"],
+                [
+                    field_update("400"),
+                    field_update("500", delete=True),
+                    field_update("350"),
+                ],
+            ),
+            (
+                ["020", "SRC", "245", "910", "949"],
+                [
+                    field_update("910", delete=True),
+                    field_update("910", value="bar", delete=True),
+                    field_update("091"),
+                    field_update("LOC"),
+                    field_update("949"),
+                ],
+            ),
+            (["245"], [field_update("999", delete=True), field_update("001")]),
+        ],
+    )
+    def test_update_fields(self, marc_engine, tags, updates):
+        bib = make_bib(*tags)
+        expected = make_bib(*tags)
+        marc_engine.update_fields(field_updates=updates, bib=bib)
+        legacy_update_fields(updates, expected)
+        assert [str(i) for i in bib.fields] == [str(i) for i in expected.fields]
+
+    def test_update_fields_original(self, marc_engine):
+        bib = make_bib("020", "245", "949", "949", "960")
+        expected = make_bib("020", "245", "949", "949", "960")
+        marc_engine.update_fields(
+            field_updates=[field_update("949", original=bib.get_fields("949")[1])],
+            bib=bib,
+        )
+        legacy_update_fields(
+            [field_update("949", original=expected.get_fields("949")[1])], expected
+        )
+        assert [str(i) for i in bib.fields] == [str(i) for i in expected.fields]
+        assert bib.get_fields("949")[0] is not expected.get_fields("949")[0]
+
+    def test_update_fields_original_not_found(self, marc_engine):
+        bib = make_bib("020", "245", "949")
+        original = bib.get("949")
+        with pytest.raises(FieldNotFound):
+            marc_engine.update_fields(
+                field_updates=[
+                    field_update("949", delete=True),
+                    field_update("949", original=original),
+                ],
+                bib=bib,
+            )
+
+    def test_update_fields_sample(self, library, marc_engine):
+        with open(f"tests/data/{library}-sample.mrc", "rb") as fh:
+            marc_data = fh.read()
+        records = marc_engine.get_reader(marc_data)
+        for record, expected in zip(records, marc_engine.get_reader(marc_data)):
+            updates = [
+                field_update("910", value="RL", delete=True),
+                field_update("091", value="FIC", delete=True),
+                field_update("907", value=".b123456789"),
+                field_update("949", value="*b2=a;"),
+                field_update("960", value="bar"),
+            ]
+            marc_engine.update_fields(field_updates=updates, bib=record)
+            legacy_update_fields(updates, expected)
+            assert record.as_marc() == expected.as_marc()
+
+
+@pytest.mark.parametrize(
+    "library, collection, record_type", [("nypl", "BL", "cat"), ("bpl", "NONE", "acq")]
+)
+class TestWrite:
+    def test_write(self, library, marc_engine):
+        with open(f"tests/data/{library}-sample.mrc", "rb") as fh:
+            marc_data = fh.read()
+        records = marc.BibParser.parse_marc_data(marc_data, engine=marc_engine)
+        out = marc_engine.write(records)
+        assert isinstance(out, bytes)
+        assert out == b"".join(i.as_marc() for i in marc_engine.get_reader(marc_data))
+
+    def test_write_empty(self, marc_engine):
+        assert marc_engine.write([]) == b""
+
+    def test_write_to(self, library, marc_engine, tmp_path):
+        with open(f"tests/data/{library}-sample.mrc", "rb") as fh:
+            marc_data = fh.read()
+        records = marc.BibParser.parse_marc_data(marc_data, engine=marc_engine)
+        expected = marc_engine.write(records)
+        with open(tmp_path / "out.mrc", "wb") as fh:
+            written = marc_engine.write_to(records, fh)
+        assert written == len(expected)
+        assert (tmp_path / "out.mrc").read_bytes() == expected
@@ -0,0 +1,135 @@
+import asyncio
+import threading
+
+import pytest
+
+from overload_web.infrastructure import progress
+
+
+class FakeClock:
+    def __init__(self) -> None:
+        self.now = 100.0
+
+    def __call__(self) -> float:
+        return self.now
+
+
+@pytest.fixture
+def clock(monkeypatch):
+    fake_clock = FakeClock()
+    monkeypatch.setattr(progress.time, "monotonic", fake_clock)
+    return fake_clock
+
+
+class TestProgressStore:
+    def test_publish(self):
+        store = progress.ProgressStore()
+        store.publish("1", {"parsed": 2})
+        store.publish("1", {"parsed": 4})
+        assert store.get("1") == {
+            "parsed": 4,
+            "status": "running",
+            "done": False,
+            "version": 2,
+        }
+        assert store.get("2") is None
+
+    @pytest.mark.parametrize("status", ["complete", "failed"])
+    def test_publish_done(self, status):
+        store = progress.ProgressStore()
+        store.publish("1", {"parsed": 2}, status=status)
+        assert store.get("1")["done"] is True
+
+    def test_publish_expires_finished_jobs(self, clock):
+        store = progress.ProgressStore(ttl=60)
+        store.publish("1", {}, status="complete")
+        store.publish("2", {})
+        clock.now += 61
+        store.publish("3", {})
+        assert store.get("1") is None
+        assert store.get("2") is not None
+
+    def test_wait(self):
+        store = progress.ProgressStore()
+        store.publish("1", {"parsed": 1})
+        timer = threading.Timer(0.05, store.publish, args=("1", {"parsed": 2}))
+        timer.start()
+        out = store.wait("1", version=1, timeout=5)
+        timer.join()
+        assert out["version"] == 2
+        assert out["parsed"] == 2
+
+    def test_wait_timeout(self):
+        store = progress.ProgressStore()
+        store.publish("1", {"parsed": 1})
+        assert store.wait("1", version=1, timeout=0.01)["version"] == 1
+
+    def test_wait_not_found(self):
+        store = progress.ProgressStore()
+        assert store.wait("1", version=0, timeout=5) is None
+
+    def test_await_change(self):
+        store = progress.ProgressStore()
+        store.publish("1", {"parsed": 1})
+
+        async def wait():
+            return await store.await_change("1", version=1, timeout=5)
+
+        timer = threading.Timer(0.05, store.publish, args=("1", {"parsed": 2}))
+        timer.start()
+        out = asyncio.run(wait())
+        timer.join()
+        assert out["version"] == 2
+        assert out["parsed"] == 2
+        assert store._waiters == set()
+
+    def test_await_change_timeout(self):
+        store = progress.ProgressStore()
+        store.publish("1", {"parsed": 1})
+        out = asyncio.run(store.await_change("1", version=1, timeout=0.01))
+        assert out["version"] == 1
+        assert store._waiters == set()
+
+    def test_await_change_not_found(self):
+        store = progress.ProgressStore()
+        assert asyncio.run(store.await_change("1", version=0, timeout=5)) is None
+
+
+class TestThrottledProgressReporter:
+    def test_reporter(self, clock):
+        store = progress.ProgressStore()
+        reporter = store.reporter("1", interval=1)
+        assert store.get("1")["status"] == "queued"
+        assert store.get("1")["parsed"] == 0
+        reporter.advance("parsed", 10)
+        assert store.get("1")["parsed"] == 10
+        for _ in range(5):
+            reporter.advance("updated")
+        assert store.get("1")["updated"] == 0
+        assert store.get("1")["version"] == 2
+        clock.now += 1
+        reporter.advance("updated")
+        assert store.get("1")["updated"] == 6
+        assert store.get("1")["status"] == "running"
+
+    def test_reporter_finish(self, clock):
+        store = progress.ProgressStore()
+        reporter = store.reporter("1", interval=1)
+        reporter.advance("parsed", 10)
+        reporter.advance("written", 10)
+        reporter.finish("complete")
+        assert store.get("1") == {
+            "parsed": 10,
+            "matched": 0,
+            "updated": 0,
+            "written": 10,
+            "errors": 0,
+            "status": "complete",
+            "done": True,
+            "version": 3,
+        }
+
+    def test_reporter_unknown_stage(self):
+        reporter = progress.ProgressStore().reporter("1")
+        with pytest.raises(KeyError):
+            reporter.advance("foo")
@@ -125,7 +125,36 @@ class TestReviewer:
         )
         assert len(deduped_bibs["NEW"]) == 0
         assert len(deduped_bibs["DUP"]) == 3
-        assert len(deduped_bibs["DEDUPED"]) == 3
+        assert len(deduped_bibs["DEDUPED"]) == 2
+        assert deduped_bibs["DEDUPED"].count(other_rec) == 1
+
+    @pytest.mark.parametrize(
+        "library, collection, record_type",
+        [("nypl", "BL", "cat"), ("bpl", "NONE", "cat")],
+    )
+    def test_dedupe_groups(
+        self, library, full_bib, full_bib_add_barcodes, marc_engine, mocker
+    ):
+        other_rec = copy.deepcopy(full_bib)
+        other_rec.control_number = "123456789"
+        dupe_rec = copy.deepcopy(full_bib_add_barcodes)
+        for record in [full_bib, full_bib_add_barcodes, other_rec, dupe_rec]:
+            record.action = bibs.CatalogAction.INSERT
+        parse = mocker.spy(marc_engine, "create_bib_from_domain")
+        deduped_bibs = marc.BibDeduplicator.deduplicate(
+            records=[full_bib, other_rec, full_bib_add_barcodes, dupe_rec],
+            engine=marc_engine,
+        )
+        assert deduped_bibs["DEDUPED"] == [full_bib, other_rec]
+        assert parse.call_count == 3
+        assert full_bib.marc_record is not None
+        assert other_rec.marc_record is None
+        tag, ind2 = ("960", " ") if library == "bpl" else ("949", "1")
+        assert [
+            i.value()
+            for i in full_bib.marc_record.get_fields(tag)
+            if i.indicator2 == ind2
+        ] == ["333331234567890", "333331111111111", "333331111111111"]
 
     @pytest.mark.parametrize(
         "library, collection, record_type",
@@ -166,3 +195,27 @@ class TestReviewer:
             == "Integrity validation: False, missing_barcodes: ['333330987654321']"
         )
         assert caplog.records[1].msg == "Barcodes integrity error: ['333330987654321']"
+
+    def test_validate_unique_barcodes(self):
+        bib_processing.validate_unique_barcodes(["333331234567890", "333330987654321"])
+
+    def test_validate_unique_barcodes_dupes(self):
+        with pytest.raises(ValueError) as exc:
+            bib_processing.validate_unique_barcodes(["333331234567890"] * 2)
+        assert str(exc.value) == (
+            "Duplicate barcodes found in file: ['333331234567890']"
+        )
+
+    def test_validate_unique_barcodes_chunks(self):
+        seen: set[str] = set()
+        bib_processing.validate_unique_barcodes(["333331234567890"], seen=seen)
+        bib_processing.validate_unique_barcodes(["333330987654321"], seen=seen)
+        assert seen == {"333331234567890", "333330987654321"}
+        with pytest.raises(ValueError) as exc:
+            bib_processing.validate_unique_barcodes(
+                ["333331111111111", "333331234567890"], seen=seen
+            )
+        assert str(exc.value) == (
+            "Duplicate barcodes found in file: ['333331234567890']"
+        )
+        assert "333331111111111" not in seen
@@ -0,0 +1,214 @@
+import asyncio
+from types import SimpleNamespace
+
+import pytest
+
+from overload_web.infrastructure import throttling
+
+
+class FakeClock:
+    def __init__(self) -> None:
+        self.now = 0.0
+        self.sleeps: list[float] = []
+
+    def __call__(self) -> float:
+        return self.now
+
+    def sleep(self, seconds: float) -> None:
+        self.sleeps.append(seconds)
+        self.now += seconds
+
+
+def response(status_code, headers=None):
+    return SimpleNamespace(status_code=status_code, headers=headers or {})
+
+
+class FakeTransportError(Exception):
+    pass
+
+
+class FakeStatusError(Exception):
+    def __init__(self, status_code):
+        self.response = response(status_code)
+
+
+class FakeServiceError(Exception):
+    pass
+
+
+@pytest.fixture
+def clock():
+    return FakeClock()
+
+
+@pytest.fixture
+def throttle(clock):
+    return throttling.Throttle(
+        name="nypl",
+        limiter=throttling.AdaptiveRateLimiter(rate=10, clock=clock),
+        backoff=throttling.ExponentialBackoff(base=1, jitter=lambda a, b: b),
+        retry_exceptions=(FakeTransportError,),
+        sleep=clock.sleep,
+    )
+
+
+def responses(*items):
+    items = list(items)
+
+    def send():
+        item = items.pop(0)
+        if isinstance(item, Exception):
+            raise item
+        return item
+
+    return send
+
+
+class TestAdaptiveRateLimiter:
+    def test_reserve(self, clock):
+        limiter = throttling.AdaptiveRateLimiter(rate=10, clock=clock)
+        assert limiter.reserve() == 0
+        assert limiter.reserve() == pytest.approx(0.1)
+        assert limiter.reserve() == pytest.approx(0.2)
+        clock.now = 1
+        assert limiter.reserve() == 0
+
+    def test_rate_adapts(self, clock):
+        limiter = throttling.AdaptiveRateLimiter(
+            rate=10, min_rate=4, max_rate=11, clock=clock
+        )
+        limiter.on_success()
+        limiter.on_success()
+        limiter.on_success()
+        assert limiter.rate == 11
+        limiter.on_throttle()
+        assert limiter.rate == 5.5
+        limiter.on_throttle()
+        assert limiter.rate == 4
+
+    @pytest.mark.parametrize(
+        "kwargs",
+        [{"rate": 0, "min_rate": 0}, {"rate": 100}, {"rate": 1, "min_rate": 2}],
+    )
+    def test_invalid_rates(self, kwargs):
+        with pytest.raises(ValueError) as exc:
+            throttling.AdaptiveRateLimiter(**kwargs)
+        assert str(exc.value) == "Rates must satisfy 0 < min_rate <= rate <= max_rate."
+
+
+class TestBackoffAndBudget:
+    def test_backoff(self):
+        backoff = throttling.ExponentialBackoff(base=1, cap=5, jitter=lambda a, b: b)
+        assert [backoff.delay(i) for i in range(5)] == [1, 2, 4, 5, 5]
+
+    def test_backoff_jitter(self):
+        backoff = throttling.ExponentialBackoff(base=1, cap=5)
+        assert all(0 <= backoff.delay(3) <= 5 for _ in range(100))
+
+    def test_budget(self):
+        budget = throttling.RetryBudget(ratio=0.5, max_tokens=2)
+        assert budget.withdraw() is True
+        assert budget.withdraw() is True
+        assert budget.withdraw() is False
+        budget.deposit()
+        budget.deposit()
+        assert budget.tokens == 1
+        assert budget.withdraw() is True
+
+
+class TestThrottle:
+    def test_call_success(self, throttle, clock):
+        assert throttle.call(responses(response(200))).status_code == 200
+        assert throttle.limiter.rate == 10.5
+        assert clock.sleeps == [0]
+
+    @pytest.mark.parametrize("status_code", [429, 500, 502, 503, 504])
+    def test_call_retry_status(self, throttle, clock, status_code, caplog):
+        send = responses(response(status_code), response(200))
+        assert throttle.call(send).status_code == 200
+        assert clock.sleeps[1] == 1
+        assert f"Retrying nypl Sierra request after {status_code}" in caplog.text
+
+    def test_call_throttled_decreases_rate(self, throttle):
+        throttle.call(responses(response(429), response(429), response(200)))
+        assert throttle.limiter.rate == 3.0
+
+    def test_call_retry_after(self, throttle, clock):
+        throttle.call(responses(response(429, {"Retry-After": "7"}), response(200)))
+        assert 7 in clock.sleeps
+
+    def test_call_retry_exception(self, throttle):
+        send = responses(FakeTransportError(), FakeStatusError(503), response(200))
+        assert throttle.call(send).status_code == 200
+
+    @pytest.mark.parametrize("status_code", [400, 401, 403, 404])
+    def test_call_exception_not_retryable_status(self, throttle, status_code):
+        send = responses(FakeStatusError(status_code), response(200))
+        with pytest.raises(FakeStatusError):
+            throttle.call(send)
+        assert throttle.budget.tokens == 10
+
+    def test_call_wrapped_transport_error(self, throttle):
+        errors = [FakeTransportError()]
+
+        def send():
+            if errors:
+                raise FakeServiceError("timeout") from errors.pop()
+            return response(200)
+
+        assert throttle.call(send).status_code == 200
+
+    def test_call_service_error_not_retried(self, throttle):
+        send = responses(FakeServiceError("400 Bad Request"), response(200))
+        with pytest.raises(FakeServiceError):
+            throttle.call(send)
+
+    def test_call_none_response(self, throttle):
+        assert throttle.call(responses(None)) is None
+
+    def test_call_other_exception(self, throttle):
+        with pytest.raises(KeyError):
+            throttle.call(responses(KeyError("foo")))
+
+    def test_call_max_attempts(self, throttle, clock):
+        with pytest.raises(throttling.RetryError) as exc:
+            throttle.call(responses(*[response(503)] * 4))
+        assert str(exc.value) == (
+            "Request failed with status code 503 after 4 attempts."
+        )
+        assert [i for i in clock.sleeps if i >= 1] == [1, 2, 4]
+
+    def test_call_max_attempts_exception(self, throttle):
+        with pytest.raises(FakeTransportError):
+            throttle.call(responses(*[FakeTransportError()] * 4))
+
+    def test_call_budget_exhausted(self, throttle):
+        throttle.budget = throttling.RetryBudget(ratio=0, max_tokens=1)
+        throttle.call(responses(response(503), response(200)))
+        with pytest.raises(throttling.RetryError) as exc:
+            throttle.call(responses(response(503), response(200)))
+        assert exc.value.attempts == 1
+
+    def test_acall(self, throttle, monkeypatch):
+        sleeps = []
+
+        async def fake_sleep(seconds):
+            sleeps.append(seconds)
+
+        monkeypatch.setattr(throttling.asyncio, "sleep", fake_sleep)
+        items = [FakeStatusError(429), response(503), response(200)]
+
+        async def send():
+            item = items.pop(0)
+            if isinstance(item, Exception):
+                raise item
+            return item
+
+        out = asyncio.run(throttle.acall(send))
+        assert out.status_code == 200
+        assert [i for i in sleeps if i >= 1] == [1, 2]
+
+    def test_invalid_max_attempts(self):
+        with pytest.raises(ValueError) as exc:
+            throttling.Throttle(name="bpl", max_attempts=0)
+        assert str(exc.value) == "`max_attempts` must be greater than or equal to 1."
@@ -121,6 +121,19 @@ class TestUpdaterCatRecords:
         assert len(original_bib.get_fields(tag)) == 0
         assert len(updated_bib.get_fields(tag)) == 1
 
+    @pytest.mark.parametrize(
+        "library, collection, record_type",
+        [("bpl", "NONE", "cat"), ("nypl", "BL", "cat"), ("nypl", "RL", "cat")],
+    )
+    def test_update_reuses_parsed_record(self, full_bib, marc_engine):
+        full_bib.bib_id = "12345"
+        marc.BibUpdater.update_cataloging_record(record=full_bib, engine=marc_engine)
+        parsed = full_bib.marc_record
+        assert isinstance(parsed, Bib)
+        marc.BibUpdater.update_cataloging_record(record=full_bib, engine=marc_engine)
+        assert full_bib.marc_record is parsed
+        assert full_bib.binary_data == parsed.as_marc()
+
     @pytest.mark.parametrize(
         "library, collection, record_type",
         [("nypl", "BL", "cat"), ("nypl", "RL", "cat")],
@@ -72,3 +72,67 @@ class TestFileWriterServices:
             file=b"", file_name="foo.mrc", dir="bar", writer=self.writer
         )
         assert out_file == "foo.mrc"
+
+
+class TestVendorFile:
+    def test_vendor_file_lazy(self):
+        calls = []
+
+        def opener():
+            calls.append(1)
+            return b"foo"
+
+        file = files.VendorFile(file_name="foo.mrc", opener=opener)
+        assert file.loaded is False
+        assert repr(file) == "VendorFile(file_name='foo.mrc', loaded=False)"
+        assert file.content == b"foo"
+        assert file.content == b"foo"
+        assert file.loaded is True
+        assert len(calls) == 1
+        file.close()
+        assert file.loaded is False
+        assert file == files.VendorFile(file_name="foo.mrc", content=b"foo")
+        assert len(calls) == 2
+
+    def test_vendor_file_close_content(self):
+        file = files.VendorFile(file_name="foo.mrc", content=b"foo")
+        file.close()
+        assert file.loaded is True
+        assert file.content == b"foo"
+
+    def test_vendor_file_source(self):
+        def opener():
+            return b"foo"
+
+        file = files.VendorFile(file_name="foo.mrc", opener=opener)
+        assert file.source is opener
+        assert file.loaded is False
+        batch = files.VendorFileBatch(
+            [file, files.VendorFile(file_name="bar.mrc", content=b"bar")]
+        )
+        assert batch.source("foo.mrc") is opener
+        assert batch.source("bar.mrc") == b"bar"
+        assert file.loaded is False
+
+    def test_vendor_file_batch(self):
+        loaded = []
+
+        def opener(name):
+            loaded.append(name)
+            return name.encode()
+
+        batch = files.VendorFileBatch(
+            [
+                files.VendorFile(file_name=i, opener=lambda i=i: opener(i))
+                for i in ["foo.mrc", "bar.mrc"]
+            ]
+        )
+        assert list(batch) == ["foo.mrc", "bar.mrc"]
+        assert len(batch) == 2
+        assert loaded == []
+        for name, content in batch.items():
+            assert loaded[-1] == name
+            assert content == name.encode()
+        assert loaded == ["foo.mrc", "bar.mrc"]
+        batch.close()
+        assert batch["foo.mrc"] == b"foo.mrc"